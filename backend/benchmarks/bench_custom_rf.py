@@ -0,0 +1,181 @@
+"""
+Training and inference benchmarks for custom_rf.
+
+Times RandomForest.fit / predict / predict_proba (exact and histogram
+mode), best_split and gini on the shipped train/test CSVs at several row
+counts, with sklearn's RandomForestClassifier as a reference, and writes
+the results as JSON so runs can be diffed to catch regressions.
+
+    python benchmarks/bench_custom_rf.py --rows 2000,10000,all --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from custom_rf import FlatForest, RandomForest, best_split, gini  # noqa: E402
+from utils.columnar import read_columns  # noqa: E402
+
+DATASET_DIR = os.path.join(BACKEND_DIR, "..", "jupter notebooks", "Dataset")
+TRAIN_CSV = os.path.join(DATASET_DIR, "train_data.csv")
+TEST_CSV = os.path.join(DATASET_DIR, "test_data.csv")
+LABEL = "fire_occurred"
+
+
+def load_split(path):
+    df = read_columns(path)
+    X = df.drop(columns=[LABEL]).to_numpy(dtype=np.float64)
+    y = df[LABEL].to_numpy(dtype=np.int64)
+    return X, y, list(df.columns.drop(LABEL))
+
+
+def time_call(fn, repeats):
+    """
+    Run fn repeats times; returns (per-run seconds, last result).
+    """
+    timings, result = [], None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def record(results, name, rows, timings, **extra):
+    entry = {
+        "name": name,
+        "rows": rows,
+        "median_s": float(np.median(timings)),
+        "min_s": float(np.min(timings)),
+        "runs_s": [round(t, 6) for t in timings],
+    }
+    entry.update(extra)
+    results.append(entry)
+    print(f"{name:<32} rows={rows:<7} median={entry['median_s']:.4f}s", file=sys.stderr)
+
+
+def bench_micro(results, X, y, rows, repeats):
+    features = np.arange(X.shape[1])
+    timings, _ = time_call(lambda: best_split(X, y, features), repeats)
+    record(results, "best_split", rows, timings)
+    timings, _ = time_call(lambda: gini(y), repeats)
+    record(results, "gini", rows, timings)
+
+
+def bench_custom(results, name, X, y, X_test, y_test, rows, repeats, **params):
+    forest = None
+    fit_timings = []
+    for _ in range(repeats):
+        forest = RandomForest(**params)
+        start = time.perf_counter()
+        forest.fit(X, y)
+        fit_timings.append(time.perf_counter() - start)
+    record(results, f"{name}.fit", rows, fit_timings, params=params,
+           oob_score=getattr(forest, "oob_score_", None))
+
+    # The compile itself; forest.flatten() would return its cached result
+    timings, _ = time_call(lambda: FlatForest.from_trees(forest.trees), repeats)
+    record(results, f"{name}.flatten", rows, timings)
+    timings, labels = time_call(lambda: forest.predict(X_test), repeats)
+    record(results, f"{name}.predict", len(X_test), timings,
+           accuracy=float(np.mean(np.asarray(labels) == y_test)))
+    timings, _ = time_call(lambda: forest.predict_proba(X_test), repeats)
+    record(results, f"{name}.predict_proba", len(X_test), timings)
+
+
+def bench_sklearn(results, X, y, X_test, y_test, rows, repeats, n_trees, max_depth, min_samples, n_jobs,
+                  random_state):
+    try:
+        from sklearn.ensemble import RandomForestClassifier
+    except ImportError:
+        print("scikit-learn not installed, skipping reference", file=sys.stderr)
+        return
+    params = dict(n_estimators=n_trees, max_depth=max_depth, min_samples_split=min_samples,
+                  max_features="sqrt", n_jobs=n_jobs, random_state=random_state)
+    model = None
+    fit_timings = []
+    for _ in range(repeats):
+        model = RandomForestClassifier(**params)
+        start = time.perf_counter()
+        model.fit(X, y)
+        fit_timings.append(time.perf_counter() - start)
+    record(results, "sklearn.fit", rows, fit_timings, params=params)
+    timings, labels = time_call(lambda: model.predict(X_test), repeats)
+    record(results, "sklearn.predict", len(X_test), timings,
+           accuracy=float(np.mean(labels == y_test)))
+    timings, _ = time_call(lambda: model.predict_proba(X_test), repeats)
+    record(results, "sklearn.predict_proba", len(X_test), timings)
+
+
+def parse_rows(value, n_available):
+    sizes = []
+    for part in value.split(","):
+        part = part.strip()
+        sizes.append(n_available if part == "all" else min(int(part), n_available))
+    return sorted(set(sizes))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="1000,5000,all", help="comma separated training row counts, 'all' for every row")
+    parser.add_argument("--trees", type=int, default=20)
+    parser.add_argument("--max-depth", type=int, default=10)
+    parser.add_argument("--min-samples", type=int, default=5)
+    parser.add_argument("--max-bins", type=int, default=64, help="bins for the histogram-mode run, 0 to skip it")
+    parser.add_argument("--n-jobs", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-sklearn", action="store_true", help="skip the scikit-learn reference")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    X_train, y_train, features = load_split(TRAIN_CSV)
+    X_test, y_test, _ = load_split(TEST_CSV)
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(X_train))
+
+    results = []
+    for rows in parse_rows(args.rows, len(X_train)):
+        X, y = X_train[order[:rows]], y_train[order[:rows]]
+        bench_micro(results, X, y, rows, args.repeats)
+        params = dict(n_trees=args.trees, max_depth=args.max_depth, min_samples=args.min_samples,
+                      n_jobs=args.n_jobs, random_state=args.seed)
+        bench_custom(results, "custom_rf", X, y, X_test, y_test, rows, args.repeats, **params)
+        if args.max_bins:
+            bench_custom(results, "custom_rf.hist", X, y, X_test, y_test, rows, args.repeats,
+                         max_bins=args.max_bins, **params)
+        if not args.no_sklearn:
+            bench_sklearn(results, X, y, X_test, y_test, rows, args.repeats, args.trees, args.max_depth,
+                          args.min_samples, args.n_jobs, args.seed)
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": vars(args),
+        "datasets": {"train": os.path.relpath(TRAIN_CSV, BACKEND_DIR), "test": os.path.relpath(TEST_CSV, BACKEND_DIR),
+                     "features": features, "test_rows": len(X_test)},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
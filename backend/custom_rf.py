@@ -1,42 +1,89 @@
+import json
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
-from collections import Counter
+
+from utils.hashing import file_sha256
 
 # Gini Impurity Function
 def gini(y):
-    counts = Counter(y)
-    impurity = 1 - sum((c / len(y))**2 for c in counts.values())
-    return impurity
+    _, counts = np.unique(y, return_counts=True)
+    return _gini_from_counts(counts, len(y))
+
+def _gini_from_counts(counts, n):
+    # Works on a single count vector or on a (splits, classes) matrix of them
+    return 1 - np.sum((counts / n) ** 2, axis=-1)
+
+# Most common label, ties broken by first occurrence (same as Counter.most_common)
+def most_common_label(y):
+    labels, first, counts = np.unique(y, return_index=True, return_counts=True)
+    tied = counts == counts.max()
+    return y[first[tied].min()]
 
 # Dataset Split
 def split_dataset(X, y, feature_index, threshold):
-    left_indices = [i for i in range(len(X)) if X[i][feature_index] <= threshold]
-    right_indices = [i for i in range(len(X)) if X[i][feature_index] > threshold]
-    return (X[left_indices], y[left_indices]), (X[right_indices], y[right_indices])
+    left_mask = X[:, feature_index] <= threshold
+    right_mask = X[:, feature_index] > threshold
+    return (X[left_mask], y[left_mask]), (X[right_mask], y[right_mask])
+
+# Best split of a single feature: sort once, then score every threshold
+# from cumulative class counts instead of re-partitioning the rows
+def _best_split_for_feature(column, y_codes, n_classes, current_gini):
+    n = len(column)
+    order = np.argsort(column, kind="stable")
+    xs = column[order]
+
+    # Thresholds are the distinct values; splitting after position i puts
+    # rows 0..i on the left, so only positions where the value changes count
+    valid = xs[:-1] < xs[1:]
+    nan_mask = np.isnan(xs)
+    if nan_mask.any():
+        # x <= t is False for NaN, so the last finite value still splits off the NaNs
+        valid |= ~nan_mask[:-1] & nan_mask[1:]
+    if not valid.any():
+        return -np.inf, None
+
+    one_hot = np.zeros((n, n_classes), dtype=np.int64)
+    one_hot[np.arange(n), y_codes[order]] = 1
+    left_counts = np.cumsum(one_hot, axis=0)[:-1]
+    right_counts = left_counts[-1] + one_hot[-1] - left_counts
+
+    n_left = np.arange(1, n)
+    n_right = n - n_left
+    gain = current_gini - (
+        (n_left / n) * _gini_from_counts(left_counts, n_left[:, None]) +
+        (n_right / n) * _gini_from_counts(right_counts, n_right[:, None])
+    )
+    gain[~valid] = -np.inf
+
+    # argmax keeps the smallest threshold among equal gains
+    i = int(np.argmax(gain))
+    return gain[i], xs[i]
 
 # Best Split Calculation
 def best_split(X, y, features):
+    best_feature, best_threshold, _ = best_split_with_gain(X, y, features)
+    return best_feature, best_threshold
+
+def best_split_with_gain(X, y, features):
     best_gain = 0
     best_feature, best_threshold = None, None
-    current_gini = gini(y)
+    if len(y) < 2:
+        return best_feature, best_threshold, best_gain
+
+    _, y_codes = np.unique(y, return_inverse=True)
+    n_classes = int(y_codes.max()) + 1
+    current_gini = _gini_from_counts(np.bincount(y_codes, minlength=n_classes), len(y))
 
     for feature_idx in features:
-        thresholds = np.unique(X[:, feature_idx])
-        for t in thresholds:
-            (X_left, y_left), (X_right, y_right) = split_dataset(X, y, feature_idx, t)
-            
-            if len(y_left) == 0 or len(y_right) == 0:
-                continue
-            
-            gain = current_gini - (
-                (len(y_left)/len(y)) * gini(y_left) +
-                (len(y_right)/len(y)) * gini(y_right)
-            )
-            
-            if gain > best_gain:
-                best_gain = gain
-                best_feature = feature_idx
-                best_threshold = t
-    return best_feature, best_threshold
+        gain, t = _best_split_for_feature(X[:, feature_idx], y_codes, n_classes, current_gini)
+        if gain > best_gain:
+            best_gain = gain
+            best_feature = feature_idx
+            best_threshold = t
+    return best_feature, best_threshold, best_gain
 
 # Tree Node Class
 class TreeNode:
@@ -51,37 +98,176 @@ class TreeNode:
         return self.value is not None
 
 # Build Decision Tree
-def build_tree(X, y, depth=0, max_depth=10, min_samples=5, num_features=None):
+def build_tree(X, y, depth=0, max_depth=10, min_samples=5, num_features=None, rng=None,
+               importances=None):
     # Stop splitting if conditions are met
     if len(y) == 0:
         # Return a leaf node with a default value (e.g., 0)
         return TreeNode(value=0)
-    if len(set(y)) == 1 or len(y) < min_samples or depth >= max_depth:
+    if np.all(y == y[0]) or len(y) < min_samples or depth >= max_depth:
         # Return leaf node with most common class
-        return TreeNode(value=Counter(y).most_common(1)[0][0])
+        return TreeNode(value=most_common_label(y))
 
     n_features = X.shape[1]
     # Select a subset of features for Random Forest (feature bagging)
-    features_to_consider = np.random.choice(n_features, num_features or n_features, replace=False)
+    # rng is the tree's own Generator; without one the global NumPy state is used
+    features_to_consider = (rng or np.random).choice(n_features, num_features or n_features, replace=False)
     
-    best_feat, best_thresh = best_split(X, y, features_to_consider)
+    best_feat, best_thresh, best_gain = best_split_with_gain(X, y, features_to_consider)
 
     # If no split improves Gini impurity, make it a leaf node
     if best_feat is None:
-        return TreeNode(value=Counter(y).most_common(1)[0][0])
+        return TreeNode(value=most_common_label(y))
 
     (X_left, y_left), (X_right, y_right) = split_dataset(X, y, best_feat, best_thresh)
     
     # If either split is empty, return a leaf node with the most common class
     if len(y_left) == 0 or len(y_right) == 0:
-        return TreeNode(value=Counter(y).most_common(1)[0][0])
+        return TreeNode(value=most_common_label(y))
+
+    if importances is not None:
+        # Gini decrease weighted by the rows reaching this node
+        importances[best_feat] += len(y) * best_gain
 
     # Recursively build left and right sub-trees
-    left_branch = build_tree(X_left, y_left, depth + 1, max_depth, min_samples, num_features)
-    right_branch = build_tree(X_right, y_right, depth + 1, max_depth, min_samples, num_features)
+    left_branch = build_tree(X_left, y_left, depth + 1, max_depth, min_samples, num_features, rng,
+                             importances)
+    right_branch = build_tree(X_right, y_right, depth + 1, max_depth, min_samples, num_features, rng,
+                              importances)
 
     return TreeNode(feature=best_feat, threshold=best_thresh, left=left_branch, right=right_branch)
 
+# Histogram (Binned) Training
+def compute_bin_edges(X, max_bins=256):
+    """
+    Cut points per feature; a value goes to bin k when edges[k-1] < x <= edges[k].
+    Cut points are actual data values (quantiles when there are more distinct
+    values than bins), so binned splits use the same thresholds as exact ones.
+    """
+    if not 2 <= max_bins <= 256:
+        raise ValueError("max_bins must be between 2 and 256 to fit uint8 codes")
+    edges = []
+    for column in np.asarray(X, dtype=np.float64).T:
+        values = np.unique(column[~np.isnan(column)])
+        if len(values) > max_bins:
+            quantiles = np.linspace(0, 1, max_bins + 1)[1:-1]
+            values = np.unique(np.quantile(column[~np.isnan(column)], quantiles, method="inverted_cdf"))
+        # A cut at the largest value would leave nothing on its right
+        edges.append(values[values < np.nanmax(column)] if len(values) else values)
+    return edges
+
+def bin_data(X, bin_edges):
+    """
+    Integer bin codes, one uint8 row per feature (shape n_features x n_rows).
+    NaN lands in the last bin, so it always goes right like in predict_tree.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    codes = np.empty((X.shape[1], X.shape[0]), dtype=np.uint8)
+    for f, edges in enumerate(bin_edges):
+        codes[f] = np.searchsorted(edges, X[:, f], side="left")
+    return codes
+
+class _HistogramTreeBuilder:
+    def __init__(self, codes, y, bin_edges, max_depth, min_samples, num_features, rng,
+                 importances=None):
+        self.codes = codes
+        self.importances = importances
+        self.y = y
+        self.bin_edges = bin_edges
+        self.max_depth = max_depth
+        self.min_samples = min_samples
+        self.num_features = num_features
+        self.rng = rng or np.random
+        _, y_codes = np.unique(y, return_inverse=True)
+        self.y_codes = y_codes.astype(np.intp)
+        self.n_classes = int(self.y_codes.max()) + 1 if len(y) else 1
+        self.n_bins = max(len(edges) for edges in bin_edges) + 1
+
+    def histogram(self, idx):
+        # Class counts per (feature, bin) for the rows in idx
+        y_codes = self.y_codes.take(idx)
+        size = self.n_bins * self.n_classes
+        return np.stack([
+            np.bincount(self.codes[f].take(idx) * self.n_classes + y_codes, minlength=size)
+            .reshape(self.n_bins, self.n_classes)
+            for f in range(len(self.codes))
+        ])
+
+    def best_split(self, hist, features, n):
+        best_gain = 0
+        best_feature, best_bin = None, None
+        total = hist[0].sum(axis=0)
+        current_gini = _gini_from_counts(total, n)
+        for f in features:
+            n_cuts = len(self.bin_edges[f])
+            if n_cuts == 0:
+                continue
+            # Splitting at bin b sends bins 0..b left
+            left_counts = np.cumsum(hist[f, :n_cuts], axis=0)
+            right_counts = total - left_counts
+            n_left = left_counts.sum(axis=1)
+            n_right = n - n_left
+            valid = (n_left > 0) & (n_right > 0)
+            if not valid.any():
+                continue
+            with np.errstate(invalid="ignore", divide="ignore"):
+                gain = current_gini - (
+                    (n_left / n) * _gini_from_counts(left_counts, n_left[:, None]) +
+                    (n_right / n) * _gini_from_counts(right_counts, n_right[:, None])
+                )
+            gain[~valid] = -np.inf
+            b = int(np.argmax(gain))
+            if gain[b] > best_gain:
+                best_gain = gain[b]
+                best_feature, best_bin = f, b
+        return best_feature, best_bin, best_gain
+
+    def build(self, idx, hist=None, depth=0):
+        if len(idx) == 0:
+            return TreeNode(value=0)
+        y = self.y.take(idx)
+        if np.all(y == y[0]) or len(y) < self.min_samples or depth >= self.max_depth:
+            return TreeNode(value=most_common_label(y))
+        if hist is None:
+            hist = self.histogram(idx)
+
+        n_features = len(self.codes)
+        features_to_consider = self.rng.choice(n_features, self.num_features or n_features, replace=False)
+        best_feat, best_bin, best_gain = self.best_split(hist, features_to_consider, len(idx))
+        if best_feat is None:
+            return TreeNode(value=most_common_label(y))
+        if self.importances is not None:
+            self.importances[best_feat] += len(idx) * best_gain
+
+        go_left = self.codes[best_feat].take(idx) <= best_bin
+        left_idx, right_idx = idx[go_left], idx[~go_left]
+
+        # Histogram subtraction: only the smaller child is counted, the
+        # sibling is whatever is left of the parent
+        if len(left_idx) <= len(right_idx):
+            left_hist = self.histogram(left_idx)
+            right_hist = hist - left_hist
+        else:
+            right_hist = self.histogram(right_idx)
+            left_hist = hist - right_hist
+
+        left_branch = self.build(left_idx, left_hist, depth + 1)
+        right_branch = self.build(right_idx, right_hist, depth + 1)
+        return TreeNode(feature=best_feat, threshold=self.bin_edges[best_feat][best_bin],
+                        left=left_branch, right=right_branch)
+
+def build_hist_tree(codes, y, bin_edges, indices=None, max_depth=10, min_samples=5,
+                    num_features=None, rng=None, importances=None):
+    """
+    build_tree on pre-binned data: codes/bin_edges come from bin_data and
+    compute_bin_edges, indices selects (possibly repeated) training rows.
+    """
+    if indices is None:
+        indices = np.arange(codes.shape[1])
+    builder = _HistogramTreeBuilder(codes, y, bin_edges, max_depth, min_samples, num_features, rng,
+                                    importances)
+    return builder.build(np.asarray(indices, dtype=np.intp))
+
 # Tree Prediction
 def predict_tree(x, tree):
     if tree.is_leaf():
@@ -97,50 +283,568 @@ def predict_tree(x, tree):
     else:
         return predict_tree(x, tree.right)
 
+# Flat Tree Layout
+class FlatForest:
+    """
+    All trees of a forest compiled into parallel node arrays.
+    Node i tests X[:, feature[i]] <= threshold[i] and moves to left[i] or
+    right[i]; the two children of a node are always adjacent, so
+    right[i] == left[i] + 1. Leaves hold their class in value[i], have
+    feature -1 and threshold +inf and point back to themselves, so a batch
+    of rows can be advanced a fixed number of levels without tracking which
+    rows already reached a leaf.
+    """
+    def __init__(self, feature, threshold, left, right, value, roots, depth,
+                 feature_names=None, scaler_mean=None, scaler_scale=None, metadata=None,
+                 first_tree_id=0):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots # Index of each tree's root node
+        self.depth = depth # Deepest root-to-leaf path over all trees
+        # Filled in by load_forest from the model file
+        self.feature_names = feature_names
+        self.scaler_mean = scaler_mean
+        self.scaler_scale = scaler_scale
+        self.metadata = metadata or {}
+        # Trees are numbered in the order they were grown; warm-started forests
+        # drop their oldest trees, so the first one kept isn't always tree 0
+        self.first_tree_id = first_tree_id
+        self._walk_cache = {}
+
+    @classmethod
+    def from_trees(cls, trees):
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        depth = 0
+
+        def alloc():
+            for column in (feature, threshold, left, right, value):
+                column.append(None)
+            return len(feature) - 1
+
+        for tree in trees:
+            roots.append(alloc())
+            stack = [(tree, roots[-1], 0)]
+            while stack:
+                node, idx, level = stack.pop()
+                depth = max(depth, level)
+                if node.is_leaf():
+                    feature[idx], threshold[idx], value[idx] = -1, np.inf, node.value
+                    left[idx] = right[idx] = idx
+                else:
+                    child = alloc()
+                    alloc()
+                    feature[idx], threshold[idx], value[idx] = node.feature, node.threshold, 0
+                    left[idx], right[idx] = child, child + 1
+                    stack.append((node.right, child + 1, level + 1))
+                    stack.append((node.left, child, level + 1))
+        return cls(
+            feature=np.asarray(feature, dtype=np.int32),
+            threshold=np.asarray(threshold, dtype=np.float64),
+            left=np.asarray(left, dtype=np.int32),
+            right=np.asarray(right, dtype=np.int32),
+            value=np.asarray(value),
+            roots=np.asarray(roots, dtype=np.int32),
+            depth=depth,
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def _with_nodes(self, arrays, **overrides):
+        attrs = {
+            "depth": self.depth, "feature_names": self.feature_names,
+            "scaler_mean": self.scaler_mean, "scaler_scale": self.scaler_scale,
+            "metadata": self.metadata, "first_tree_id": self.first_tree_id,
+        }
+        attrs.update(overrides)
+        return FlatForest(**arrays, **attrs)
+
+    def select_trees(self, start, stop=None):
+        """
+        Forest made of trees start..stop-1. Each tree's nodes are contiguous
+        from its root, so this is a slice plus an index shift.
+        """
+        stop = self.n_trees if stop is None else stop
+        ends = list(self.roots[1:]) + [len(self.feature)]
+        lo = int(self.roots[start]) if start < self.n_trees else len(self.feature)
+        hi = int(ends[stop - 1]) if stop > start else lo
+        arrays = {
+            "feature": np.asarray(self.feature[lo:hi]),
+            "threshold": np.asarray(self.threshold[lo:hi]),
+            "left": np.asarray(self.left[lo:hi]) - lo,
+            "right": np.asarray(self.right[lo:hi]) - lo,
+            "value": np.asarray(self.value[lo:hi]),
+            "roots": np.asarray(self.roots[start:stop]) - lo,
+        }
+        return self._with_nodes(arrays, first_tree_id=self.first_tree_id + start)
+
+    @staticmethod
+    def concatenate(forests):
+        """
+        One forest holding the trees of all given forests, in order. Depth,
+        names and scaler come from the deepest / first forest that has them.
+        """
+        arrays = {name: [] for name in ("feature", "threshold", "left", "right", "value", "roots")}
+        offset = 0
+        for forest in forests:
+            arrays["feature"].append(np.asarray(forest.feature))
+            arrays["threshold"].append(np.asarray(forest.threshold))
+            arrays["value"].append(np.asarray(forest.value))
+            for name in ("left", "right", "roots"):
+                arrays[name].append(np.asarray(getattr(forest, name)) + offset)
+            offset += len(forest.feature)
+        arrays = {name: np.concatenate(parts) for name, parts in arrays.items()}
+        first = forests[0]
+        named = next((f for f in forests if f.feature_names), first)
+        scaled = next((f for f in forests if f.scaler_mean is not None), first)
+        return first._with_nodes(
+            arrays,
+            depth=max(f.depth for f in forests),
+            feature_names=named.feature_names,
+            scaler_mean=scaled.scaler_mean,
+            scaler_scale=scaled.scaler_scale,
+        )
+
+    def _walk_arrays(self, n_columns):
+        cache = self.__dict__.setdefault("_walk_cache", {})
+        if n_columns not in cache:
+            cache[n_columns] = self._build_walk_arrays(n_columns)
+        return cache[n_columns]
+
+    def _build_walk_arrays(self, n_columns):
+        feature = np.asarray(self.feature, dtype=np.intp)
+        threshold = np.asarray(self.threshold)
+        left = np.asarray(self.left, dtype=np.intp)
+        value = np.asarray(self.value)
+        missing = feature >= n_columns
+        if missing.any():
+            # Same fallback as predict_tree: a split on a feature the input
+            # doesn't have ends the walk with class 0
+            feature = np.where(missing, -1, feature)
+            threshold = np.where(missing, np.inf, threshold)
+            left = np.where(missing, np.arange(len(left)), left)
+            value = np.where(missing, 0, value)
+        return np.maximum(feature, 0), threshold, left, value
+
+    def apply(self, X, chunk_rows=None):
+        """
+        Leaf value reached by every row in every tree, shape (n_rows, n_trees).
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1) if X.size else X.reshape(0, 0)
+        n_rows, n_columns = X.shape
+        nan_mask = np.isnan(X)
+        if nan_mask.any():
+            # x <= t is False for NaN, i.e. NaN always goes right, like +inf
+            X = np.where(nan_mask, np.inf, X)
+        X = np.ascontiguousarray(X)
+
+        feature, threshold, left, value = self._walk_arrays(n_columns)
+        roots = np.asarray(self.roots, dtype=np.intp)
+        # Keep the (rows x trees) working set small enough to stay in cache
+        chunk_rows = chunk_rows or max(1, 32768 // max(self.n_trees, 1))
+
+        out = np.empty((n_rows, self.n_trees), dtype=value.dtype)
+        if n_rows == 0:
+            return out
+        for start in range(0, n_rows, chunk_rows):
+            chunk = X[start:start + chunk_rows]
+            flat_chunk = chunk.ravel()
+            row_offset = (np.arange(len(chunk)) * n_columns)[:, None]
+            node = np.broadcast_to(roots, (len(chunk), self.n_trees)).copy()
+            for _ in range(self.depth):
+                # Going right is left + 1; leaves never move since x > inf is False
+                x = flat_chunk.take(row_offset + feature.take(node))
+                node = left.take(node) + (x > threshold.take(node))
+            out[start:start + chunk_rows] = value.take(node)
+        return out
+
+    def predict(self, X):
+        # Get predictions from all trees
+        tree_preds = self.apply(X)
+        if len(tree_preds) == 0:
+            return []
+        # Majority vote for final prediction
+        return list(_majority_vote(tree_preds))
+
+    def predict_proba(self, X):
+        """
+        Predict class probabilities for X.
+        Returns a list of arrays where each array contains [prob_class_0, prob_class_1]
+        """
+        # Get predictions from all trees
+        tree_preds = self.apply(X)
+        total = tree_preds.shape[1]
+        # Ensure we have probabilities for both classes (0 and 1)
+        prob_0 = (tree_preds == 0).sum(axis=1) / total
+        prob_1 = (tree_preds == 1).sum(axis=1) / total
+        return np.column_stack([prob_0, prob_1])
+
+def _majority_vote(votes):
+    # Row-wise Counter(row).most_common(1): ties go to the label seen first
+    labels, codes = np.unique(votes, return_inverse=True)
+    codes = codes.reshape(votes.shape)
+    n_trees = votes.shape[1]
+    counts = np.empty((len(votes), len(labels)), dtype=np.int64)
+    first = np.empty((len(votes), len(labels)), dtype=np.int64)
+    for k in range(len(labels)):
+        hit = codes == k
+        counts[:, k] = hit.sum(axis=1)
+        first[:, k] = np.where(hit.any(axis=1), hit.argmax(axis=1), n_trees)
+    first[counts < counts.max(axis=1, keepdims=True)] = n_trees + 1
+    return labels[first.argmin(axis=1)]
+
+# Parallel Tree Construction
+# Training data handed to each pool worker once, instead of once per tree
+_worker_data = {}
+
+def _init_worker(data):
+    _worker_data.update(data)
+
+def _bootstrap_indices(rng, n_rows):
+    # Always the first draw from a tree's generator, so fit can replay it
+    # from the seed to find the tree's out-of-bag rows
+    return rng.integers(0, n_rows, size=n_rows)
+
+def _fit_tree(seed, max_depth, min_samples, num_features):
+    y = _worker_data["y"]
+    # Everything random about a tree comes from its own seed, so the result
+    # doesn't depend on which worker builds it or in what order
+    rng = np.random.default_rng(seed)
+    # Bootstrap sampling
+    indices = _bootstrap_indices(rng, len(y))
+    if "codes" in _worker_data:
+        codes = _worker_data["codes"]
+        importances = np.zeros(len(codes))
+        tree = build_hist_tree(codes, y, _worker_data["bin_edges"], indices,
+                               max_depth=max_depth, min_samples=min_samples,
+                               num_features=num_features, rng=rng, importances=importances)
+    else:
+        X = _worker_data["X"]
+        importances = np.zeros(X.shape[1])
+        tree = build_tree(X[indices], y[indices], max_depth=max_depth,
+                          min_samples=min_samples, num_features=num_features, rng=rng,
+                          importances=importances)
+    return tree, importances
+
+def _effective_n_jobs(n_jobs):
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return max(1, n_jobs)
+
+def _seed_sequence(random_state):
+    if isinstance(random_state, np.random.SeedSequence):
+        return random_state
+    if random_state is None:
+        # Draw the base seed from the global state so np.random.seed() still
+        # makes an unseeded forest repeatable
+        random_state = [int(v) for v in np.random.randint(0, 2**32, size=4, dtype=np.uint64)]
+    return np.random.SeedSequence(random_state)
+
+def _mean_importances(per_tree):
+    # Each tree's decreases sum to 1, then the forest average is renormalised
+    normalised = [imp / imp.sum() if imp.sum() > 0 else imp for imp in per_tree]
+    mean = np.mean(normalised, axis=0)
+    return mean / mean.sum() if mean.sum() > 0 else mean
+
 # Random Forest Class
 class RandomForest:
-    def __init__(self, n_trees=100, max_depth=10, min_samples=5):
+    def __init__(self, n_trees=100, max_depth=10, min_samples=5, n_jobs=None, random_state=None,
+                 max_bins=None, oob_score=False):
         self.n_trees = n_trees
         self.max_depth = max_depth
         self.min_samples = min_samples
+        self.n_jobs = n_jobs # Worker processes for fit; -1 uses every core
+        self.random_state = random_state
+        self.max_bins = max_bins # Train on quantile-binned features (<= 256 bins) when set
+        self.oob_score = oob_score # Score every row with the trees that didn't see it
         self.trees = []
+        self._flat = None
 
     def fit(self, X, y):
         self.trees = []
+        self._flat = None
+        # Kept so partial_fit can keep spawning fresh, reproducible tree seeds
+        self._seed_seq = _seed_sequence(self.random_state)
+        # One independent child seed per tree
+        seeds = self._seed_seq.spawn(self.n_trees)
+        results = self._grow_trees(X, y, seeds)
+
+        self.trees = [tree for tree, _ in results]
+        self._tree_importances = [imp for _, imp in results]
+        self.n_trees_built_ = len(self.trees)
+        self.feature_importances_ = _mean_importances(self._tree_importances)
+        if getattr(self, "oob_score", False):
+            self._compute_oob(X, y, seeds)
+        return self
+
+    def partial_fit(self, X, y, n_new_trees, max_trees=None):
+        """
+        Warm start: grow n_new_trees on (X, y), typically the newest data
+        window, and append them to the fitted trees. With max_trees the
+        oldest trees are retired until at most max_trees remain.
+        Use save_forest_delta to store only what changed since the last file.
+        """
+        seed_seq = getattr(self, "_seed_seq", None)
+        if seed_seq is None:
+            # Forest pickled before warm starts existed
+            seed_seq = _seed_sequence(getattr(self, "random_state", None))
+        seeds = seed_seq.spawn(n_new_trees)
+        self._seed_seq = seed_seq
+        results = self._grow_trees(X, y, seeds)
+
+        n_old = len(self.trees)
+        importances = getattr(self, "_tree_importances", None) or [None] * n_old
+        self.trees = self.trees + [tree for tree, _ in results]
+        self._tree_importances = importances + [imp for _, imp in results]
+        self.n_trees_built_ = getattr(self, "n_trees_built_", n_old) + n_new_trees
+        tree_seeds = [None] * n_old + list(seeds)
+
+        if max_trees is not None and len(self.trees) > max_trees:
+            retire = len(self.trees) - max_trees
+            self.trees = self.trees[retire:]
+            self._tree_importances = self._tree_importances[retire:]
+            tree_seeds = tree_seeds[retire:]
+        self._flat = None
+
+        known = [imp for imp in self._tree_importances if imp is not None]
+        if known:
+            self.feature_importances_ = _mean_importances(known)
+        if getattr(self, "oob_score", False):
+            # Older trees never saw the new window, so they count as out of bag
+            self._compute_oob(X, y, tree_seeds)
+        return self
+
+    def _grow_trees(self, X, y, seeds):
         n_features_sqrt = int(np.sqrt(X.shape[1])) # Features to consider at each split
-        for _ in range(self.n_trees):
-            # Bootstrap sampling
-            indices = np.random.choice(len(X), len(X), replace=True)
-            X_sample = X[indices]
-            y_sample = y[indices]
-            
-            # Build a tree
-            tree = build_tree(X_sample, y_sample, max_depth=self.max_depth, 
-                              min_samples=self.min_samples, num_features=n_features_sqrt)
-            self.trees.append(tree)
+        params = (self.max_depth, self.min_samples, n_features_sqrt)
+
+        max_bins = getattr(self, "max_bins", None)
+        if max_bins:
+            # Binned once up front; trees only ever see the uint8 codes
+            bin_edges = compute_bin_edges(X, max_bins)
+            data = {"codes": bin_data(X, bin_edges), "bin_edges": bin_edges, "y": y}
+        else:
+            data = {"X": X, "y": y}
+
+        n_jobs = min(_effective_n_jobs(getattr(self, "n_jobs", None)), max(len(seeds), 1))
+        if n_jobs == 1:
+            _init_worker(data)
+            try:
+                return [_fit_tree(seed, *params) for seed in seeds]
+            finally:
+                _worker_data.clear()
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(data,)) as pool:
+            futures = [pool.submit(_fit_tree, seed, *params) for seed in seeds]
+            return [f.result() for f in futures]
+
+    def _compute_oob(self, X, y, seeds):
+        """
+        Sets oob_decision_function_ (vote share per class from the trees whose
+        bootstrap missed the row, NaN if every tree saw it) and oob_score_
+        (accuracy over rows that were out of bag at least once).
+        seeds lines up with self.trees; None marks a tree not trained on X.
+        """
+        n_rows = len(y)
+        out_of_bag = np.ones((n_rows, len(seeds)), dtype=bool)
+        for t, seed in enumerate(seeds):
+            if seed is not None:
+                indices = _bootstrap_indices(np.random.default_rng(seed), n_rows)
+                out_of_bag[:, t] = np.bincount(indices, minlength=n_rows) == 0
+
+        votes = self.flatten().apply(X)
+        self.classes_ = np.unique(y)
+        n_oob = out_of_bag.sum(axis=1)
+        decision = np.full((n_rows, len(self.classes_)), np.nan)
+        seen = n_oob > 0
+        for k, label in enumerate(self.classes_):
+            decision[seen, k] = ((votes == label) & out_of_bag).sum(axis=1)[seen] / n_oob[seen]
+        self.oob_decision_function_ = decision
+
+        predicted = self.classes_[np.argmax(np.nan_to_num(decision[seen]), axis=1)]
+        self.oob_score_ = float(np.mean(predicted == y[seen])) if seen.any() else float("nan")
+
+    def flatten(self):
+        """
+        Compile the fitted trees into a FlatForest (cached until the next fit).
+        """
+        # Pickles from before the flat layout have no _flat attribute
+        if getattr(self, "_flat", None) is None or self._flat.n_trees != len(self.trees):
+            self._flat = FlatForest.from_trees(self.trees)
+            self._flat.first_tree_id = getattr(self, "n_trees_built_", len(self.trees)) - len(self.trees)
+        return self._flat
 
     def predict(self, X):
-        # Get predictions from all trees
-        tree_preds = np.array([[predict_tree(x, tree) for tree in self.trees] for x in X])
-        # Majority vote for final prediction
-        return [Counter(row).most_common(1)[0][0] for row in tree_preds]
-    
+        return self.flatten().predict(X)
+
     def predict_proba(self, X):
         """
         Predict class probabilities for X.
         Returns a list of arrays where each array contains [prob_class_0, prob_class_1]
         """
-        # Get predictions from all trees
-        tree_preds = np.array([[predict_tree(x, tree) for tree in self.trees] for x in X])
-        
-        # Calculate probabilities
-        probabilities = []
-        for row in tree_preds:
-            counts = Counter(row)
-            total = len(row)
-            # Ensure we have probabilities for both classes (0 and 1)
-            prob_0 = counts.get(0, 0) / total
-            prob_1 = counts.get(1, 0) / total
-            probabilities.append([prob_0, prob_1])
-        
-        return np.array(probabilities)
\ No newline at end of file
+        return self.flatten().predict_proba(X)
+
+# Model File Format
+# [magic][version u32][header length u32][JSON header][padding][arrays...]
+# Every array starts on a 64-byte boundary and is described in the header by
+# dtype, shape and absolute offset, so it can be mapped straight from disk.
+FOREST_MAGIC = b"NWWRFF\x00\x00"
+FOREST_FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGN = 64
+_FOREST_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+def _aligned(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+def _write_forest_file(path, flat, header, scaler=None):
+    arrays = {name: np.ascontiguousarray(getattr(flat, name)) for name in _FOREST_ARRAYS}
+    arrays["value"] = arrays["value"].astype(np.int64)
+    if scaler is not None:
+        arrays["scaler_mean"] = np.asarray(scaler.mean_, dtype=np.float64)
+        arrays["scaler_scale"] = np.asarray(scaler.scale_, dtype=np.float64)
+    elif flat.scaler_mean is not None:
+        arrays["scaler_mean"] = np.asarray(flat.scaler_mean, dtype=np.float64)
+        arrays["scaler_scale"] = np.asarray(flat.scaler_scale, dtype=np.float64)
+
+    header = dict(header, n_trees=int(flat.n_trees), depth=int(flat.depth),
+                  first_tree_id=int(flat.first_tree_id), arrays={})
+    # Offsets depend on the header size, which depends on the offsets;
+    # reserve room for them first, then lay the arrays out after the header
+    layout = [(name, arr) for name, arr in arrays.items()]
+    for name, arr in layout:
+        header["arrays"][name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": 0}
+    header_size = len(json.dumps(header).encode()) + 32 * len(layout)
+    offset = _aligned(_PREAMBLE.size + header_size)
+    for name, arr in layout:
+        header["arrays"][name]["offset"] = offset
+        offset = _aligned(offset + arr.nbytes)
+    header_bytes = json.dumps(header).encode().ljust(header_size)
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as fh:
+        fh.write(_PREAMBLE.pack(FOREST_MAGIC, FOREST_FORMAT_VERSION, len(header_bytes)))
+        fh.write(header_bytes)
+        for name, arr in layout:
+            fh.seek(header["arrays"][name]["offset"])
+            fh.write(arr.tobytes())
+        fh.truncate(offset)
+    os.replace(tmp_path, path)
+
+def save_forest(path, forest, feature_names=None, scaler=None, metadata=None):
+    """
+    Write a RandomForest or FlatForest to path in the flat model format.
+    scaler is an optional fitted StandardScaler whose mean_/scale_ are stored
+    with the trees. The file is written next to path and renamed into place.
+    """
+    flat = forest.flatten() if isinstance(forest, RandomForest) else forest
+    header = {
+        "feature_names": list(feature_names if feature_names is not None else flat.feature_names or []),
+        "metadata": metadata if metadata is not None else flat.metadata,
+    }
+    _write_forest_file(path, flat, header, scaler)
+
+def save_forest_delta(path, forest, base_path, metadata=None):
+    """
+    Store a warm-started forest as a delta on top of the model file at
+    base_path: only the trees grown since that file plus how many of its
+    oldest trees were retired. load_forest(path) rebuilds the full forest;
+    deltas can be stacked, and save_forest(new_path, load_forest(path))
+    compacts a chain back into one file.
+    """
+    flat = forest.flatten() if isinstance(forest, RandomForest) else forest
+    base = load_forest(base_path)
+    base_first, base_end = base.first_tree_id, base.first_tree_id + base.n_trees
+    first, end = flat.first_tree_id, flat.first_tree_id + flat.n_trees
+    if first < base_first or end < base_end:
+        raise ValueError("Forest is older than the base model file; save it with save_forest instead")
+
+    # Trees [first, base_end) are still in the base file, the rest are new
+    keep_from = min(first, base_end)
+    new_trees = flat.select_trees(max(base_end, first) - first)
+    header = {
+        "feature_names": [],
+        "metadata": metadata or {},
+        "base": os.path.relpath(os.path.abspath(base_path), os.path.dirname(os.path.abspath(path))),
+        "base_sha256": file_sha256(base_path),
+        "retire": int(keep_from - base_first),
+    }
+    new_trees.scaler_mean = new_trees.scaler_scale = None
+    _write_forest_file(path, new_trees, header)
+
+def read_forest_header(path):
+    with open(path, "rb") as fh:
+        magic, version, header_len = _PREAMBLE.unpack(fh.read(_PREAMBLE.size))
+        if magic != FOREST_MAGIC:
+            raise ValueError(f"{path} is not a forest model file")
+        if version > FOREST_FORMAT_VERSION:
+            raise ValueError(f"{path} uses format version {version}, newest supported is {FOREST_FORMAT_VERSION}")
+        header = json.loads(fh.read(header_len))
+    header["version"] = version
+    return header
+
+def load_forest(path, mmap=True):
+    """
+    Load a model file as a FlatForest. With mmap the node arrays are
+    read-only views of the file, so processes loading the same file share
+    its pages through the OS cache. Delta files (save_forest_delta) are
+    resolved against their base file; the stitched forest lives in memory.
+    """
+    header = read_forest_header(path)
+    forest = _read_forest_arrays(path, header, mmap)
+    if "base" not in header:
+        return forest
+
+    base_path = os.path.join(os.path.dirname(os.path.abspath(path)), header["base"])
+    if file_sha256(base_path) != header["base_sha256"]:
+        raise ValueError(f"{base_path} changed since the delta {path} was written")
+    base = load_forest(base_path, mmap=mmap)
+    kept = base.select_trees(header["retire"])
+    combined = FlatForest.concatenate([kept, forest])
+    # Counted back from the delta's own trees: when every base tree was
+    # retired, the delta may start past the end of the base
+    combined.first_tree_id = forest.first_tree_id - kept.n_trees
+    combined.metadata = dict(base.metadata, **forest.metadata)
+    return combined
+
+def _read_forest_arrays(path, header, mmap):
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+        if int(np.prod(shape)) == 0:
+            arrays[name] = np.empty(shape, dtype=dtype)
+        elif mmap:
+            arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=spec["offset"], shape=shape)
+        else:
+            with open(path, "rb") as fh:
+                fh.seek(spec["offset"])
+                arrays[name] = np.fromfile(fh, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+    return FlatForest(
+        **{name: arrays[name] for name in _FOREST_ARRAYS},
+        depth=header["depth"],
+        feature_names=header["feature_names"] or None,
+        scaler_mean=arrays.get("scaler_mean"),
+        scaler_scale=arrays.get("scaler_scale"),
+        metadata=header.get("metadata") or {},
+        first_tree_id=header.get("first_tree_id", 0),
+    )
+
+def convert_pickle(model_path, out_path, scaler_path=None, feature_names=None):
+    """
+    Convert a joblib-pickled RandomForest (and its scaler) to the flat model format.
+    """
+    import joblib
+
+    forest = joblib.load(model_path)
+    scaler = joblib.load(scaler_path) if scaler_path else None
+    save_forest(out_path, forest, feature_names=feature_names, scaler=scaler,
+                metadata={"source": os.path.basename(model_path)})
+    return out_path
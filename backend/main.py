@@ -1,9 +1,7 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Query, Request
 from pydantic import BaseModel
-from fastapi.responses import JSONResponse
+from typing import Dict, List, Optional
 from fastapi.middleware.cors import CORSMiddleware
-import joblib
-import pandas as pd
 import math
 from dotenv import load_dotenv
 import os
@@ -11,9 +9,14 @@ from fastapi_jwt_auth import AuthJWT
 from routes import contact_routes, fire_report_routes, fire_routes, admin_routes, auth_routes
 from models.admin import ensure_admin_exists
 import numpy as np
-import sys
-from custom_rf import RandomForest
-_ = RandomForest
+from services.inference_batcher import InferenceBatcher
+from services.model_registry import RF_FEATURES, registry as model_registry
+from services.prediction_cache import PredictionCache, parse_precision
+from services.firms_client import firms
+from services.forest_scan import ForestScanCache, iter_scan_frames
+from utils.streaming import ndjson_frames, ndjson_response, wants_ndjson
+from utils.http_cache import cached_response
+from utils.wire import wire_format
 
 load_dotenv()
 
@@ -48,28 +51,14 @@ app.include_router(contact_routes.router)
 app.include_router(fire_report_routes.router)
 
 # ---------------- MODEL LOADING ---------------- #
-rf_model = None
-scaler = None
-nb_model = None
-
-try:
-    rf_model = joblib.load("./model/random_forest_final_model.pkl")
-    scaler = joblib.load("./model/scaler.pkl")
-    print(" Random Forest model loaded.")
-except Exception as e:
-    print(f"[ERROR] Could not load RandomForest or scaler: {e}")
-
-try:
-    nb_model = joblib.load("./model/naive_bayes.pkl")
-    print(" Naïve Bayes model loaded.")
-except Exception as e:
-    print(f"[ERROR] Could not load Naïve Bayes model: {e}")
-
-# Feature list expected by RandomForest
-rf_features = [
-    'latitude', 'longitude', 'temperature', 'humidity',
-    'wind_speed', 'precipitation', 'elevation', 'vpd'
-]
+# Resolved from this file so the app also starts outside backend/ (tests, benchmarks)
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model")
+
+# Models are owned by services/model_registry: loaded on first use and hot-swapped
+# by POST /admin/models/reload or the file watcher (MODEL_WATCH_INTERVAL seconds)
+rf_features = RF_FEATURES
+
+forest_scan = ForestScanCache(os.path.join(MODEL_DIR, "forest_dataset.csv"))
 
 # ---------------- SCHEMAS ---------------- #
 class ManualInput(BaseModel):
@@ -81,6 +70,12 @@ class ManualInput(BaseModel):
     precipitation: float
     elevation: float
 
+class BatchInput(BaseModel):
+    # Either one object per point, or the compact columnar form
+    # {"columns": {"latitude": [...], "longitude": [...], ...}}
+    inputs: Optional[List[ManualInput]] = None
+    columns: Optional[Dict[str, List[float]]] = None
+
 class Settings(BaseModel):
     authjwt_secret_key: str = os.getenv("SECRET_KEY")
 
@@ -96,20 +91,137 @@ async def root():
 @app.on_event("startup")
 async def init_app():
     await ensure_admin_exists()
+    if os.getenv("MODEL_PRELOAD", "0") == "1":
+        model_registry.get_or_none("rf")
+        model_registry.get_or_none("nb")
+    watch_interval = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
+    if watch_interval > 0:
+        model_registry.start_watching(watch_interval)
+
+@app.on_event("shutdown")
+async def stop_model_watch():
+    model_registry.stop_watching()
+    await firms.aclose()
+
+# ---------------- RISK LABELS ---------------- #
+RISK_MESSAGES = {
+    "High": (
+        "High Fire Risk Detected! The environmental conditions are highly favorable for wildfire occurrence. "
+        "We strongly recommend taking immediate precautionary measures: avoid any open flames or outdoor burning, "
+        "ensure fire safety equipment is readily accessible, and monitor local fire advisories closely. "
+        "Stay alert and be prepared to evacuate if authorities issue warnings."
+    ),
+    "Moderate": (
+        "Moderate Fire Risk - Stay Alert! Current weather and terrain conditions suggest an elevated fire risk. "
+        "While not critical, it's important to exercise caution. Avoid lighting fires outdoors, be mindful of activities "
+        "that could generate sparks, and keep emergency contacts handy. Monitor weather updates and be prepared "
+        "to take action if conditions worsen."
+    ),
+    "Low": (
+        "Low Fire Risk - Conditions are Favorable! The current environmental factors indicate a low likelihood of fire occurrence. "
+        "Weather conditions appear safe with adequate humidity and limited fire-promoting factors. However, always practice "
+        "responsible fire safety: properly extinguish any fires, follow local regulations, and remain aware of your surroundings. "
+        "Safe conditions today don't guarantee safety tomorrow - stay informed!"
+    ),
+}
+
+def risk_level_for(proba):
+    return "High" if proba >= 0.75 else "Moderate" if proba >= 0.40 else "Low"
+
+def confidence_for(proba):
+    return (
+        "High confidence" if proba > 0.75 else
+        "Moderate confidence" if proba > 0.40 else
+        "Low confidence" if proba > 0.25 else
+        "Very low confidence"
+    )
+
+def compute_vpd(temperature, humidity):
+    """
+    Vapour pressure deficit (kPa) for temperature (°C) and relative humidity
+    (%), scalars or arrays. NaN or inf where it is undefined.
+    """
+    temperature = np.asarray(temperature, dtype=np.float64)
+    humidity = np.asarray(humidity, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        # At -237.3 °C the exponent is ±inf, which exp would turn into 0 or inf
+        denominator = np.where(temperature + 237.3 == 0, np.nan, temperature + 237.3)
+        es = 0.6108 * np.exp((17.27 * temperature) / denominator)
+        ea = (humidity / 100) * es
+        return np.round(es - ea, 3)
+
+def current_rf():
+    rf = model_registry.get_or_none("rf")
+    if rf is None:
+        raise HTTPException(status_code=500, detail="Model not loaded")
+    return rf
+
+def score_features(X, rf):
+    """
+    Fire probability for each row of raw rf_features values, scored with
+    the given registry model.
+    """
+    if len(X) == 1:
+        return np.array([rf.fused.predict_proba_one(X[0])[1]])
+    return rf.fused.predict_proba(X)[:, 1]
+
+# Concurrent /predict-manual calls are queued for a couple of milliseconds and
+# scored together; PREDICT_BATCHING=0 scores each request on its own
+predict_batcher = None
+if os.getenv("PREDICT_BATCHING", "1") != "0":
+    predict_batcher = InferenceBatcher(
+        score_features,
+        window_ms=float(os.getenv("PREDICT_QUEUE_WINDOW_MS", "2")),
+        max_rows=int(os.getenv("PREDICT_QUEUE_MAX_ROWS", "256")),
+    )
+
+# Optional cache for /predict-manual: inputs are snapped to a per-feature grid
+# (PREDICTION_CACHE_PRECISION, e.g. "latitude=0.01,temperature=0.1") and repeats skip the model
+prediction_cache = None
+if os.getenv("PREDICTION_CACHE", "0") == "1":
+    precision = parse_precision(os.getenv("PREDICTION_CACHE_PRECISION"))
+    prediction_cache = PredictionCache(
+        list(ManualInput.__fields__),
+        precision=precision or None,
+        max_entries=int(os.getenv("PREDICTION_CACHE_SIZE", "4096")),
+        ttl=float(os.getenv("PREDICTION_CACHE_TTL", "300")),
+    )
+    # Stored predictions belong to one model version; a hot swap drops them
+    model_registry.add_listener(
+        lambda name, old, new: name == "rf" and prediction_cache.set_model_version(new.version)
+    )
+
+@app.get("/metrics/inference")
+def inference_metrics():
+    metrics = {"batching": predict_batcher is not None}
+    if predict_batcher is not None:
+        metrics.update(predict_batcher.stats())
+    if prediction_cache is not None:
+        metrics["cache"] = prediction_cache.stats()
+    return metrics
+
+def _finite_or_none(value):
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+def score_manual(values, rf):
+    """
+    Fire probability for one set of raw inputs (ManualInput fields plus vpd).
+    """
+    # None (VPD failed) becomes NaN, which the forest sends right like the scaler's NaN did
+    row = [np.nan if values[f] is None else float(values[f]) for f in rf_features]
+    if predict_batcher is not None:
+        return predict_batcher.predict(row, context=rf)
+    return rf.fused.predict_proba_one(row)[1]
 
 # ---------------- USER PREDICTION ---------------- #
 @app.post("/predict-manual")
 def predict_manual(data: ManualInput):
-    if rf_model is None or scaler is None:
-        raise HTTPException(status_code=500, detail="Model not loaded")
+    # Held for the whole request, so a hot swap mid-request doesn't mix models
+    rf = current_rf()
 
     # Calculate VPD
-    try:
-        es = 0.6108 * math.exp((17.27 * data.temperature) / (data.temperature + 237.3))
-        ea = (data.humidity / 100) * es
-        vpd = round(es - ea, 3)
-    except Exception:
-        vpd = None
+    vpd = _finite_or_none(compute_vpd(data.temperature, data.humidity))
 
     enriched = {
         "latitude": data.latitude,
@@ -122,47 +234,24 @@ def predict_manual(data: ManualInput):
         "vpd": vpd
     }
 
-    X_input = pd.DataFrame([enriched], columns=rf_features)
-
     try:
-        X_scaled = scaler.transform(X_input)
+        if prediction_cache is not None:
+            key = prediction_cache.key(enriched)
+            proba = prediction_cache.get(key) if prediction_cache.model_version == rf.version else None
+            if proba is None:
+                snapped = prediction_cache.snap(enriched)
+                snapped["vpd"] = _finite_or_none(compute_vpd(snapped["temperature"], snapped["humidity"]))
+                proba = score_manual(snapped, rf)
+                prediction_cache.put(key, proba, model_version=rf.version)
+        else:
+            proba = score_manual(enriched, rf)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error scaling input: {e}")
+        raise HTTPException(status_code=500, detail=f"Error scoring input: {e}")
 
-    proba = rf_model.predict_proba(X_scaled)[0][1]
     fire_flag = int(proba >= 0.5)
-
-    if proba >= 0.75:
-        risk_level = "High"
-        risk_message = (
-            "High Fire Risk Detected! The environmental conditions are highly favorable for wildfire occurrence. "
-            "We strongly recommend taking immediate precautionary measures: avoid any open flames or outdoor burning, "
-            "ensure fire safety equipment is readily accessible, and monitor local fire advisories closely. "
-            "Stay alert and be prepared to evacuate if authorities issue warnings."
-        )
-    elif proba >= 0.40:
-        risk_level = "Moderate"
-        risk_message = (
-            "Moderate Fire Risk - Stay Alert! Current weather and terrain conditions suggest an elevated fire risk. "
-            "While not critical, it's important to exercise caution. Avoid lighting fires outdoors, be mindful of activities "
-            "that could generate sparks, and keep emergency contacts handy. Monitor weather updates and be prepared "
-            "to take action if conditions worsen."
-        )
-    else:
-        risk_level = "Low"
-        risk_message = (
-            "Low Fire Risk - Conditions are Favorable! The current environmental factors indicate a low likelihood of fire occurrence. "
-            "Weather conditions appear safe with adequate humidity and limited fire-promoting factors. However, always practice "
-            "responsible fire safety: properly extinguish any fires, follow local regulations, and remain aware of your surroundings. "
-            "Safe conditions today don't guarantee safety tomorrow - stay informed!"
-        )
-
-    confidence = (
-        "High confidence" if proba > 0.75 else
-        "Moderate confidence" if proba > 0.40 else
-        "Low confidence" if proba > 0.25 else
-        "Very low confidence"
-    )
+    risk_level = risk_level_for(proba)
+    risk_message = RISK_MESSAGES[risk_level]
+    confidence = confidence_for(proba)
 
     return {
         "fire_occurred": fire_flag,
@@ -173,27 +262,86 @@ def predict_manual(data: ManualInput):
         "risk_message": risk_message
     }
 
+# Upper bound on rows per /predict-batch call
+PREDICT_BATCH_MAX_ROWS = int(os.getenv("PREDICT_BATCH_MAX_ROWS", "10000"))
+MANUAL_FIELDS = list(ManualInput.__fields__)
+
+def _batch_matrix(data: BatchInput):
+    """
+    Raw input columns as one float matrix (rows x MANUAL_FIELDS).
+    """
+    if data.columns is not None:
+        missing = [f for f in MANUAL_FIELDS if f not in data.columns]
+        if missing:
+            raise HTTPException(status_code=422, detail=f"Missing columns: {', '.join(missing)}")
+        lengths = {len(data.columns[f]) for f in MANUAL_FIELDS}
+        if len(lengths) > 1:
+            raise HTTPException(status_code=422, detail="All columns must have the same length")
+        return np.column_stack([np.asarray(data.columns[f], dtype=np.float64) for f in MANUAL_FIELDS]) \
+            if lengths != {0} else np.empty((0, len(MANUAL_FIELDS)))
+    if data.inputs is not None:
+        return np.array([[getattr(row, f) for f in MANUAL_FIELDS] for row in data.inputs],
+                        dtype=np.float64).reshape(-1, len(MANUAL_FIELDS))
+    raise HTTPException(status_code=422, detail="Provide either 'inputs' or 'columns'")
+
+@app.post("/predict-batch")
+def predict_batch(data: BatchInput):
+    rf = current_rf()
+
+    raw = _batch_matrix(data)
+    if len(raw) > PREDICT_BATCH_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {PREDICT_BATCH_MAX_ROWS} rows per batch")
+    if len(raw) == 0:
+        return {"count": 0, "results": [], "risk_messages": RISK_MESSAGES}
+
+    columns = dict(zip(MANUAL_FIELDS, raw.T))
+    vpd = compute_vpd(columns["temperature"], columns["humidity"])
+    columns["vpd"] = vpd
+    try:
+        # Whole batch in one pass through the forest
+        proba = score_features(np.column_stack([columns[f] for f in rf_features]), rf)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error scoring input: {e}")
+
+    risk_level = np.select([proba >= 0.75, proba >= 0.40], ["High", "Moderate"], "Low")
+    confidence = np.select(
+        [proba > 0.75, proba > 0.40, proba > 0.25],
+        ["High confidence", "Moderate confidence", "Low confidence"],
+        "Very low confidence",
+    )
+    vpd = [_finite_or_none(v) for v in vpd.tolist()]
+    results = [
+        {"fire_occurred": int(p >= 0.5), "risk_level": r, "confidence": c, "probability": p, "vpd": v}
+        for p, r, c, v in zip(proba.tolist(), risk_level.tolist(), confidence.tolist(), vpd)
+    ]
+    return {"count": len(results), "results": results, "risk_messages": RISK_MESSAGES}
+
 # ---------------- ADMIN FULL SCAN ---------------- #
+# Changes only with the forest dataset or the model, so clients may reuse a
+# scan for a minute and keep showing it while they revalidate
+SCAN_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=600"
+
 @app.get("/scan-forests")
-def scan_forests():
-    if nb_model is None:
+def scan_forests(request: Request, stream: bool = False,
+                 fmt: Optional[str] = Query(default=None, alias="format", description="json, columns or binary")):
+    try:
+        fmt = wire_format(request, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    nb = model_registry.get_or_none("nb")
+    if nb is None:
         raise HTTPException(status_code=500, detail="Naïve Bayes model not loaded")
 
-    try:
-        df = pd.read_csv("./model/forest_dataset.csv")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Could not load dataset: {e}")
+    # NDJSON: the dataset is read and scored a chunk at a time as the client reads
+    if fmt == "json" and wants_ndjson(request, stream):
+        if not os.path.exists(forest_scan.dataset_path):
+            raise HTTPException(status_code=500, detail="Could not load dataset: file not found")
+        return ndjson_response(ndjson_frames(iter_scan_frames(forest_scan.dataset_path, nb)))
 
-    # Load the Naive Bayes scaler
+    # Scored once per dataset/model version and kept as JSON bytes
     try:
-        nb_scaler = joblib.load("./model/naive_bayes_scaler.pkl")
+        result = forest_scan.get(nb)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Could not load Naive Bayes scaler: {e}")
-
-    X = df[["temperature", "humidity", "rainfall", "wind_speed"]]
-    X_scaled = nb_scaler.transform(X)
-    preds = nb_model.predict(X_scaled)
-    df["predicted_risk"] = preds
+        raise HTTPException(status_code=500, detail=f"Could not load dataset: {e}")
 
-    results = df[["forest_name", "district", "latitude", "longitude", "predicted_risk"]].to_dict(orient="records")
-    return JSONResponse(content=results)
+    return cached_response(request, result.cached(fmt), SCAN_CACHE_CONTROL, vary="Accept")
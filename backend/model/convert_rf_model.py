@@ -0,0 +1,23 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from custom_rf import convert_pickle, load_forest
+
+# Feature order the scaler and the forest were trained with (see main.rf_features)
+RF_FEATURES = [
+    'latitude', 'longitude', 'temperature', 'humidity',
+    'wind_speed', 'precipitation', 'elevation', 'vpd'
+]
+
+# Convert the pickled custom RandomForest + scaler into the flat model file
+convert_pickle(
+    "model/random_forest_final_model.pkl",
+    "model/random_forest_final_model.rff",
+    scaler_path="model/scaler.pkl",
+    feature_names=RF_FEATURES,
+)
+
+forest = load_forest("model/random_forest_final_model.rff")
+print(f"Converted {forest.n_trees} trees ({len(forest.feature)} nodes) to model/random_forest_final_model.rff")
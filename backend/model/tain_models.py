@@ -1,13 +1,17 @@
-import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.naive_bayes import GaussianNB
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report, confusion_matrix
 import joblib
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.columnar import read_columns
 
 # Load dataset (with weather features + fire_risk column)
-df = pd.read_csv("model/forest_dataset.csv")
+# Only the columns used below are read from the dataset's columnar sidecar
+df = read_columns("model/forest_dataset.csv", ["temperature", "humidity", "rainfall", "wind_speed", "fire_risk"])
 
 # Features and label
 X = df[["temperature", "humidity", "rainfall", "wind_speed"]]
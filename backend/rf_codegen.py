@@ -0,0 +1,174 @@
+import hashlib
+import importlib.util
+import math
+import os
+
+import numpy as np
+
+from custom_rf import RandomForest
+
+# Bump when the generated code changes shape, so stale cached modules aren't reused
+CODEGEN_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model", ".compiled")
+
+
+def _literal(value):
+    # repr() of a float round-trips exactly; inf/nan need an expression
+    value = float(value)
+    if math.isfinite(value):
+        return repr(value)
+    return f"float({str(value)!r})"
+
+
+def _label(value):
+    return repr(value.item() if hasattr(value, "item") else value)
+
+
+def _tree_lines(flat, root, n_features):
+    lines = []
+    stack = [(int(root), 1, None)]
+    while stack:
+        node, indent, prefix = stack.pop()
+        pad = "    " * indent
+        if prefix is not None:
+            lines.append(prefix)
+        feature = int(flat.feature[node])
+        if feature < 0 or feature >= n_features:
+            # Leaf (or the predict_tree fallback for a feature the model doesn't have)
+            value = flat.value[node] if feature < 0 else 0
+            lines.append(f"{pad}return {_label(value)}")
+            continue
+        left = int(flat.left[node])
+        lines.append(f"{pad}if x{feature} <= {_literal(flat.threshold[node])}:")
+        # Pushed in reverse so the if-body is emitted before the else
+        stack.append((left + 1, indent + 1, f"{pad}else:"))
+        stack.append((left, indent + 1, None))
+    return lines
+
+
+def generate_source(forest, n_features=None):
+    """
+    Python source for a fitted forest: one function per tree made of nested
+    comparisons with every threshold inlined, plus predict_proba_row(x) for
+    one sample and predict_proba(X) for a batch, both matching
+    RandomForest.predict_proba.
+    """
+    flat = forest.flatten() if isinstance(forest, RandomForest) else forest
+    if n_features is None and flat.feature_names:
+        n_features = len(flat.feature_names)
+    if n_features is None:
+        # Only a lower bound: pass n_features when the last features may never be split on
+        n_features = int(np.max(flat.feature)) + 1 if flat.n_trees else 0
+    args = ", ".join(f"x{i}" for i in range(n_features))
+
+    out = [
+        f"# Generated by rf_codegen (version {CODEGEN_VERSION}); do not edit.",
+        "import numpy as np",
+        "",
+        f"N_FEATURES = {n_features}",
+        f"N_TREES = {flat.n_trees}",
+        "",
+    ]
+    for t, root in enumerate(flat.roots):
+        out.append(f"def tree_{t}({args}):")
+        out.extend(_tree_lines(flat, root, n_features))
+        out.append("")
+
+    calls = ",\n        ".join(f"tree_{t}({args})" for t in range(flat.n_trees))
+    out += [
+        "def predict_proba_row(x):",
+        f"    {args}{',' if n_features == 1 else ''} = x" if n_features else "    pass",
+        "    votes = (",
+        f"        {calls},",
+        "    )",
+        "    return [votes.count(0) / N_TREES, votes.count(1) / N_TREES]",
+        "",
+        "def predict_proba(X):",
+        "    X = np.asarray(X, dtype=np.float64)",
+        "    if X.ndim == 1:",
+        "        X = X.reshape(1, -1)",
+        "    rows = X[:, :N_FEATURES].tolist()",
+        "    return np.array([predict_proba_row(row) for row in rows]).reshape(len(rows), 2)",
+        "",
+    ]
+    return "\n".join(out)
+
+
+def forest_fingerprint(forest):
+    flat = forest.flatten() if isinstance(forest, RandomForest) else forest
+    digest = hashlib.sha256(f"codegen-v{CODEGEN_VERSION}".encode())
+    for name in ("feature", "threshold", "left", "value", "roots"):
+        digest.update(np.ascontiguousarray(getattr(flat, name)).tobytes())
+    return digest.hexdigest()[:20]
+
+
+def _probe_rows(flat, n_features, n_random=2000, seed=0):
+    # Random rows across the threshold range plus rows sitting exactly on
+    # thresholds, where a wrong <= vs < would show up
+    rng = np.random.default_rng(seed)
+    internal = flat.feature >= 0
+    lo = np.zeros(n_features)
+    hi = np.ones(n_features)
+    for f in range(n_features):
+        thresholds = np.asarray(flat.threshold)[internal & (np.asarray(flat.feature) == f)]
+        if len(thresholds):
+            lo[f], hi[f] = thresholds.min(), thresholds.max()
+    span = np.where(hi > lo, hi - lo, 1.0)
+    rows = rng.uniform(lo - 0.1 * span, hi + 0.1 * span, size=(n_random, n_features))
+    split_nodes = np.flatnonzero(internal)
+    picks = rng.choice(split_nodes, size=min(len(split_nodes), n_random), replace=False) if len(split_nodes) else []
+    on_threshold = rows[:len(picks)].copy()
+    on_threshold[np.arange(len(picks)), np.asarray(flat.feature)[picks]] = np.asarray(flat.threshold)[picks]
+    return np.vstack([rows, on_threshold])
+
+
+def verify_compiled(module, forest, X=None):
+    """
+    Raise ValueError unless the generated module scores exactly like the
+    interpreted forest on X (or on generated probe rows).
+    """
+    flat = forest.flatten() if isinstance(forest, RandomForest) else forest
+    if X is None:
+        X = _probe_rows(flat, module.N_FEATURES)
+    X = np.asarray(X, dtype=np.float64)
+    expected = flat.predict_proba(X)
+    actual = module.predict_proba(X)
+    mismatched = np.flatnonzero(np.any(expected != actual, axis=1))
+    if len(mismatched):
+        raise ValueError(f"Generated forest disagrees with the interpreted one on {len(mismatched)} rows, "
+                         f"first at row {mismatched[0]}")
+    return True
+
+
+def compile_forest(forest, cache_dir=None, n_features=None, verify=True):
+    """
+    Import the generated module for forest, writing it to cache_dir first
+    if this exact forest hasn't been compiled before. Cached modules are
+    keyed by a hash of the node arrays; a fresh module is verified against
+    the interpreted forest before it is used.
+    """
+    flat = forest.flatten() if isinstance(forest, RandomForest) else forest
+    if n_features is None and flat.feature_names:
+        n_features = len(flat.feature_names)
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    name = f"rf_{forest_fingerprint(flat)}_{n_features or 'auto'}"
+    path = os.path.join(cache_dir, f"{name}.py")
+
+    fresh = not os.path.exists(path)
+    if fresh:
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, "w") as fh:
+            fh.write(generate_source(flat, n_features))
+        os.replace(tmp_path, path)
+
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if verify and fresh:
+        try:
+            verify_compiled(module, flat)
+        except ValueError:
+            os.remove(path)
+            raise
+    return module
@@ -3,9 +3,7 @@ import math
 import os
 import smtplib
 from typing import List, Dict
-import joblib
 import numpy as np
-import pandas as pd
 import requests
 try:
     from bson import ObjectId
@@ -17,7 +15,9 @@ except ImportError:
         def __str__(self):
             return str(self.value)
 from email.mime.text import MIMEText
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from fastapi_jwt_auth import AuthJWT
 from pydantic import BaseModel, EmailStr
 
@@ -25,12 +25,28 @@ from auth.dependencies import admin_required
 from database.mongo import db, alerts_collection
 
 from models.fire_report import UpdateReportStatus
+from services.model_registry import NB_FEATURES, registry as model_registry
+from utils.http_cache import ResponseCache, cached_response
 
 # --------------------------------------------------
 # Router
 # --------------------------------------------------
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
+# --------------------------------------------------
+# Public alerts cache
+# --------------------------------------------------
+# Writes through this router bump the version; the TTL bounds how long a
+# write from anywhere else (another worker, the database shell) goes unseen
+ALERTS_CACHE_TTL = float(os.getenv("ALERTS_CACHE_TTL", "30"))
+ALERTS_CACHE_CONTROL = "public, max-age=15, stale-while-revalidate=60"
+public_alerts = ResponseCache(ttl=ALERTS_CACHE_TTL, max_entries=1)
+_alerts_version = 0
+
+def _alerts_changed():
+    global _alerts_version
+    _alerts_version += 1
+
 # --------------------------------------------------
 # Email Models
 # --------------------------------------------------
@@ -112,20 +128,22 @@ async def send_report_reply(payload: ReportEmailReply, user=Depends(admin_requir
         raise HTTPException(500, detail=f"Failed to send email: {str(e)}")
 
 # --------------------------------------------------
-# Load Model (Naïve Bayes)
+# Models (owned by services/model_registry)
 # --------------------------------------------------
-try:
-    model = joblib.load("model/naive_bayes.pkl")
-    scaler = joblib.load("model/naive_bayes_scaler.pkl")
-    print("Naïve Bayes model + scaler loaded")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model, scaler = None, None
-
 # Features for Naive Bayes model 
-nb_features = [
-    'temperature', 'humidity', 'rainfall', 'wind_speed'
-]
+nb_features = NB_FEATURES
+
+@router.get("/models")
+def model_status(user=Depends(admin_required)):
+    return model_registry.status()
+
+@router.post("/models/reload")
+def reload_models(force: bool = False, user=Depends(admin_required)):
+    """Re-read changed model files and swap them in; requests already running keep their model"""
+    report = model_registry.reload(force=force)
+    if any(r["status"] == "failed" for r in report.values()):
+        raise HTTPException(500, detail=report)
+    return report
 
 # --------------------------------------------------
 # Nepal Districts 
@@ -159,22 +177,17 @@ def calculate_vpd(temperature, humidity):
     except:
         return 1.5
 
-def predict_fire_risk(lat, lng, elevation, temperature, humidity, wind_speed, precipitation):
-    if model is None or scaler is None:
+def predict_fire_risk(lat, lng, elevation, temperature, humidity, wind_speed, precipitation, nb=None):
+    nb = nb or model_registry.get_or_none("nb")
+    if nb is None:
         return {"error": "Model not loaded"}
     try:
         # Use precipitation as rainfall for the Naive Bayes model
         rainfall = precipitation
         
-        input_data = pd.DataFrame([{
-            'temperature': temperature,
-            'humidity': humidity,
-            'rainfall': rainfall,
-            'wind_speed': wind_speed
-        }], columns=nb_features)
-
-        X_scaled = scaler.transform(input_data)
-        proba = model.predict_proba(X_scaled)[0][1]
+        # Same order as nb_features
+        # Scaler is folded into the Gaussian parameters: raw inputs, no pandas/sklearn
+        proba = nb.fused.predict_proba_one([temperature, humidity, rainfall, wind_speed])[1]
 
         return {
             "probability": float(proba),
@@ -214,7 +227,8 @@ def get_simulated_weather_data(lat, lng):
 # --------------------------------------------------
 @router.post("/scan-nepal")
 async def scan_nepal_fire_risk(user=Depends(admin_required)):
-    if model is None or scaler is None:
+    nb = model_registry.get_or_none("nb")
+    if nb is None:
         raise HTTPException(500, "Model not loaded")
 
     results = []
@@ -224,7 +238,7 @@ async def scan_nepal_fire_risk(user=Depends(admin_required)):
     for district in NEPAL_DISTRICTS:
         w = get_real_weather_data(district["lat"], district["lng"])
         pred = predict_fire_risk(district["lat"], district["lng"], district["elevation"],
-                                 w["temperature"], w["humidity"], w["wind_speed"], w["precipitation"])
+                                 w["temperature"], w["humidity"], w["wind_speed"], w["precipitation"], nb=nb)
         if "error" not in pred:
             result = {
                 "forest": district.get("forest", "Unknown"),
@@ -254,6 +268,7 @@ async def scan_nepal_fire_risk(user=Depends(admin_required)):
                     "expires_at": now + datetime.timedelta(days=3)
                 }
                 await alerts_collection.insert_one(alert_doc)
+                _alerts_changed()
                 alerts_created += 1
 
     # Sort all results by probability (highest risk first)
@@ -273,7 +288,8 @@ async def scan_nepal_fire_risk(user=Depends(admin_required)):
 @router.post("/test-scan-nepal")
 async def test_scan_nepal_fire_risk():
     """Test endpoint for scanning Nepal without authentication"""
-    if model is None or scaler is None:
+    nb = model_registry.get_or_none("nb")
+    if nb is None:
         raise HTTPException(500, "Model not loaded")
 
     results = []
@@ -283,7 +299,7 @@ async def test_scan_nepal_fire_risk():
     for district in NEPAL_DISTRICTS:
         w = get_real_weather_data(district["lat"], district["lng"])
         pred = predict_fire_risk(district["lat"], district["lng"], district["elevation"],
-                                 w["temperature"], w["humidity"], w["wind_speed"], w["precipitation"])
+                                 w["temperature"], w["humidity"], w["wind_speed"], w["precipitation"], nb=nb)
         if "error" not in pred:
             result = {
                 "forest": district.get("forest", "Unknown"),
@@ -340,6 +356,7 @@ async def create_test_alert(alert_data: dict):
         doc["expires_at"] = now + datetime.timedelta(days=doc["duration_days"])
 
         result = await alerts_collection.insert_one(doc)
+        _alerts_changed()
         doc["id"] = str(result.inserted_id)
         return _jsonify(doc)
     except Exception as e:
@@ -361,10 +378,19 @@ async def get_alert(alert_id: str, user=Depends(admin_required)):
     return _jsonify(doc)
 
 @router.get("/public/alerts")
-async def get_public_alerts():
-    alerts = await alerts_collection.find({"status": "active"}).sort("created_at", -1).to_list(100)
-    for a in alerts: a["id"] = str(a.pop("_id"))
-    return alerts
+async def get_public_alerts(request: Request):
+    """
+    Active alerts, newest first. Served from the last rendering until an
+    alert is written here or ALERTS_CACHE_TTL passes, with 304s for clients
+    that already have it.
+    """
+    cached = public_alerts.get("active", _alerts_version)
+    if cached is None:
+        version = _alerts_version
+        alerts = await alerts_collection.find({"status": "active"}).sort("created_at", -1).to_list(100)
+        for a in alerts: a["id"] = str(a.pop("_id"))
+        cached = public_alerts.put("active", version, JSONResponse(content=jsonable_encoder(_jsonify(alerts))).body)
+    return cached_response(request, cached, ALERTS_CACHE_CONTROL)
 
 
 @router.delete("/alerts/{alert_id}")
@@ -372,6 +398,7 @@ async def delete_alert(alert_id: str, user=Depends(admin_required)):
     result = await alerts_collection.delete_one({"_id": ObjectId(alert_id)})
     if result.deleted_count == 0:
         raise HTTPException(404, "Alert not found")
+    _alerts_changed()
     return {"message": "Alert deleted"}
 
 @router.post("/alerts/bulk")
@@ -405,6 +432,7 @@ async def create_bulk_alerts(alerts_data: List[dict], user=Depends(admin_require
             }
             
             result = await alerts_collection.insert_one(alert_doc)
+            _alerts_changed()
             alert_doc["id"] = str(result.inserted_id)
             created_alerts.append(alert_doc)
         
@@ -443,6 +471,7 @@ async def create_alert(alert_data: dict, user=Depends(admin_required)):
         }
 
         result = await alerts_collection.insert_one(alert_doc)
+        _alerts_changed()
         alert_doc["id"] = str(result.inserted_id)
         return _jsonify(alert_doc)
     except Exception as e:
@@ -458,6 +487,7 @@ async def update_alert(alert_id: str, data: dict, user=Depends(admin_required)):
             raise HTTPException(400, "No fields to update")
 
         result = await alerts_collection.update_one({"_id": ObjectId(alert_id)}, {"$set": update_fields})
+        _alerts_changed()
         if getattr(result, "modified_count", 0) == 0:
             # Could be that nothing changed; still try to read it back
             doc = await alerts_collection.find_one({"_id": ObjectId(alert_id)})
@@ -482,6 +512,7 @@ async def cleanup_expired_alerts(user=Depends(admin_required)):
             {"status": "active", "expires_at": {"$lt": now}},
             {"$set": {"status": "expired"}}
         )
+        _alerts_changed()
         return {"updated": getattr(result, "modified_count", 0)}
     except Exception as e:
         raise HTTPException(500, f"Failed to cleanup alerts: {str(e)}")
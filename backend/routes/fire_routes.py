@@ -1,7 +1,6 @@
 
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
-import requests
 import csv
 import io
 
@@ -18,14 +17,18 @@ from services.fire_stats import (
 
 router = APIRouter()
 
-from fastapi import APIRouter, Query
-from fastapi.responses import JSONResponse
-import requests
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
 import csv
 import io
-import os
+from datetime import date
+from typing import List, Optional
 from dotenv import load_dotenv
 
+from services.fire_cube import DIMENSIONS, elevation_labels_between
+from services.firms_cache import firms_cache
+from services.firms_client import FirmsError
 from services.fire_stats import (
     get_confidence_level_counts,
     get_elevation_fire_counts,
@@ -33,9 +36,17 @@ from services.fire_stats import (
     get_monthly_fire_counts,
     get_top_districts,
     get_year_month_matrix,
+    get_fire_counts,
+    get_fire_tile,
     get_geo_sample,
-  
+    geo_sample_frame,
+    dataset_version,
+    fire_data,
 )
+from utils.http_cache import ResponseCache, cached_response
+from utils.streaming import CHUNK_RECORDS, frame_chunks, ndjson_frames, ndjson_records, ndjson_response, wants_ndjson
+from utils.wire import FORMATS, encode_frame, wire_format, wire_response
+import pandas as pd
 
 load_dotenv()
 
@@ -43,12 +54,17 @@ router = APIRouter()
 
 # Nepal bounding box coordinates
 NEPAL_BBOX = "80,26,88.2,30.4"  # west,south,east,north
+# FIRMS columns kept as text in the typed formats: acq_time is zero-padded HHMM
+FIRMS_TEXT_COLUMNS = {"acq_time": str}
 
 #  Live NASA FIRMS API (real-time fires) - Updated to use AREA endpoint
 @router.get("/fires")
-def get_fires(
+async def get_fires(
+    request: Request,
     sensor: str = Query(default="MODIS_NRT", description="Sensor type"),
-    days: int = Query(default=1, ge=1, le=10, description="Number of days (1-10)")
+    days: int = Query(default=1, ge=1, le=10, description="Number of days (1-10)"),
+    stream: bool = Query(default=False, description="Stream fires as NDJSON"),
+    fmt: Optional[str] = Query(default=None, alias="format", description="json, columns or binary"),
 ):
     """
     Fetch live fire data from NASA FIRMS API using Area endpoint.
@@ -59,87 +75,247 @@ def get_fires(
     - VIIRS_SNPP_NRT: VIIRS Suomi-NPP
     - VIIRS_NOAA20_NRT: VIIRS NOAA-20
     - VIIRS_NOAA21_NRT: VIIRS NOAA-21
+
+    With ?stream=1 or Accept: application/x-ndjson, fires are streamed one
+    JSON object per line as FIRMS sends them. ?format=columns or binary
+    (or the matching Accept type, see utils/wire.py) returns one typed
+    array per field instead of one object per fire.
+
+    FIRMS is called through the shared async client in
+    services/firms_client.py, so a slow upstream doesn't hold a worker thread,
+    and its answers are cached per sensor and days (services/firms_cache.py).
+    X-Fires-Cache says how this one was served.
     """
-    
-    # Get MAP_KEY from environment variable
-    map_key = os.getenv("FIRMS_MAP_KEY", "afb7fe414fb31747d4bc922176e7f96d")
-    
-    # Construct URL using AREA endpoint
-    url = f"https://firms.modaps.eosdis.nasa.gov/api/area/csv/{map_key}/{sensor}/{NEPAL_BBOX}/{days}"
-    
     try:
-        response = requests.get(url, timeout=30)
-        
-        if response.status_code != 200:
-            return JSONResponse(
-                status_code=response.status_code,
-                content={"error": f"FIRMS API returned status {response.status_code}", "details": response.text}
-            )
-        
-        # Parse CSV response
-        csv_text = response.text
-        
-        if not csv_text or csv_text.strip() == "":
-            return {"fires": [], "count": 0, "message": "No fire data available"}
-        
-        lines = csv_text.strip().split('\n')
-        
-        # Check if we have data beyond header
-        if len(lines) < 2:
-            return {"fires": [], "count": 0, "message": "No active fires detected"}
-        
-        # Parse CSV
-        reader = csv.DictReader(io.StringIO(csv_text))
-        data = list(reader)
-        
-        return {
-            "fires": data,
-            "count": len(data),
-            "sensor": sensor,
-            "days": days,
-            "bbox": NEPAL_BBOX
-        }
-        
-    except requests.exceptions.Timeout:
-        return JSONResponse(
-            status_code=504,
-            content={"error": "Request to NASA FIRMS API timed out"}
-        )
+        fmt = wire_format(request, fmt)
+    except ValueError as e:
+        return JSONResponse(status_code=422, content={"error": str(e)})
+
+    if fmt == "json" and wants_ndjson(request, stream):
+        return await stream_fires(sensor, days)
+
+    try:
+        csv_text, served = await firms_cache.area_csv(sensor, NEPAL_BBOX, days)
+    except FirmsError as e:
+        return JSONResponse(status_code=e.status_code, content=e.content())
     except Exception as e:
         return JSONResponse(
             status_code=500,
             content={"error": "Failed to fetch fire data", "details": str(e)}
         )
+    headers = {"X-Fires-Cache": served}
+
+    if fmt != "json":
+        fires = pd.read_csv(io.StringIO(csv_text), dtype=FIRMS_TEXT_COLUMNS) if csv_text.strip() else pd.DataFrame()
+        return wire_response(fires, fmt, headers=headers, sensor=sensor, days=days, bbox=NEPAL_BBOX)
+
+    if not csv_text or csv_text.strip() == "":
+        return JSONResponse(content={"fires": [], "count": 0, "message": "No fire data available"}, headers=headers)
+    
+    lines = csv_text.strip().split('\n')
+    
+    # Check if we have data beyond header
+    if len(lines) < 2:
+        return JSONResponse(content={"fires": [], "count": 0, "message": "No active fires detected"}, headers=headers)
+    
+    # Parse CSV
+    reader = csv.DictReader(io.StringIO(csv_text))
+    data = list(reader)
+    
+    return JSONResponse(content={
+        "fires": data,
+        "count": len(data),
+        "sensor": sensor,
+        "days": days,
+        "bbox": NEPAL_BBOX
+    }, headers=headers)
+
+
+async def _text_lines(text):
+    for line in text.splitlines():
+        yield line
+
+
+async def stream_fires(sensor, days):
+    # A cached CSV is streamed from memory; otherwise straight from FIRMS as it arrives
+    cached = firms_cache.peek(sensor, NEPAL_BBOX, days)
+    if cached is not None:
+        lines = _text_lines(cached)
+    else:
+        try:
+            lines = await firms_cache.client.area_lines(sensor, NEPAL_BBOX, days)
+        except FirmsError as e:
+            return JSONResponse(status_code=e.status_code, content=e.content())
+        except Exception as e:
+            return JSONResponse(status_code=500, content={"error": "Failed to fetch fire data", "details": str(e)})
+
+    async def chunks():
+        # Rows are parsed as the CSV arrives, never holding the whole body
+        header, records = None, []
+        async for line in lines:
+            if not line:
+                continue
+            if header is None:
+                header = next(csv.reader([line]))
+                continue
+            records.append(next(csv.DictReader([line], fieldnames=header)))
+            if len(records) >= CHUNK_RECORDS:
+                yield b"".join(ndjson_records(records))
+                records = []
+        if records:
+            yield b"".join(ndjson_records(records))
+
+    headers = {"X-Fires-Sensor": sensor, "X-Fires-Days": str(days), "X-Fires-Bbox": NEPAL_BBOX,
+               "X-Fires-Cache": "hit" if cached is not None else "miss"}
+    return ndjson_response(chunks(), headers=headers)
+
+
+@router.get("/fires/live-cache")
+def firms_cache_stats():
+    """
+    Hit, miss and coalescing counters of the cache in front of FIRMS.
+    """
+    return firms_cache.stats()
 
 
 #  Local CSV-based Historical Stats
+def fire_filters(
+    start: Optional[date] = Query(default=None, description="First acquisition date (inclusive)"),
+    end: Optional[date] = Query(default=None, description="Last acquisition date (inclusive)"),
+    bbox: Optional[str] = Query(default=None, description="west,south,east,north"),
+    district: Optional[List[str]] = Query(default=None, description="Repeat to allow several districts"),
+    min_confidence: Optional[str] = Query(default=None, description="l, n or h, or a number for numeric confidence"),
+):
+    """
+    Row filters shared by the historical stats endpoints.
+    """
+    return {"start": start, "end": end, "bbox": bbox, "district": district, "min_confidence": min_confidence}
+
+def _filtered(fn, *args, **kwargs):
+    try:
+        return fn(*args, **kwargs)
+    except ValueError as e:
+        return JSONResponse(status_code=422, content={"error": str(e)})
+
+# The historical dataset changes rarely; clients reuse a stat for five
+# minutes and keep showing it for an hour while they revalidate
+STATS_CACHE_CONTROL = "public, max-age=300, stale-while-revalidate=3600"
+stats_responses = ResponseCache(max_entries=2048)
+
+def _cached(request, compute, media_type="application/json", vary=None, variant=None):
+    """
+    compute()'s response, rendered once per dataset version and query and
+    answered with 304 when the client already has it. compute returns the
+    content, ready body bytes, or a Response that is sent uncached.
+    """
+    try:
+        version = dataset_version()
+    except FileNotFoundError:
+        # No dataset: whatever compute makes of that, uncached
+        return compute()
+    key = (request.url.path, request.url.query, variant)
+    cached = stats_responses.get(key, version)
+    if cached is None:
+        content = compute()
+        if isinstance(content, Response):
+            return content
+        if not isinstance(content, bytes):
+            content = JSONResponse(content=jsonable_encoder(content)).body
+        cached = stats_responses.put(key, version, content, media_type)
+    return cached_response(request, cached, STATS_CACHE_CONTROL, vary=vary)
+
 @router.get("/fires/yearly")
-def yearly_fire_counts():
-    return get_yearly_fire_counts()
+def yearly_fire_counts(request: Request, filters: dict = Depends(fire_filters)):
+    return _cached(request, lambda: _filtered(get_yearly_fire_counts, **filters))
 
 @router.get("/fires/monthly")
-def monthly_fire_counts():
-    return get_monthly_fire_counts()
+def monthly_fire_counts(request: Request, filters: dict = Depends(fire_filters)):
+    return _cached(request, lambda: _filtered(get_monthly_fire_counts, **filters))
 
 @router.get("/fires/confidence")
-def confidence():
-    return get_confidence_level_counts()
+def confidence(request: Request, filters: dict = Depends(fire_filters)):
+    return _cached(request, lambda: _filtered(get_confidence_level_counts, **filters))
 
 @router.get("/fires/elevation")
-def get_fire_counts_by_elevation():
-    try:
-        return get_elevation_fire_counts()
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
+def get_fire_counts_by_elevation(request: Request, filters: dict = Depends(fire_filters)):
+    def compute():
+        try:
+            return _filtered(get_elevation_fire_counts, **filters)
+        except Exception as e:
+            return JSONResponse(status_code=500, content={"error": str(e)})
+    return _cached(request, compute)
 
 @router.get("/fires/top-districts")
-def top_districts():
-    return get_top_districts()
+def top_districts(request: Request, filters: dict = Depends(fire_filters)):
+    return _cached(request, lambda: _filtered(get_top_districts, **filters))
 
 @router.get("/fires/heatmap")
-def year_month_heatmap():
-    return get_year_month_matrix()
+def year_month_heatmap(request: Request, filters: dict = Depends(fire_filters)):
+    return _cached(request, lambda: _filtered(get_year_month_matrix, **filters))
+
+@router.get("/fires/counts")
+def fire_counts(
+    request: Request,
+    by: str = Query(default="month", description="Dimension to group by: " + ", ".join(DIMENSIONS)),
+    year: Optional[List[str]] = Query(default=None),
+    month: Optional[List[str]] = Query(default=None),
+    confidence: Optional[List[str]] = Query(default=None),
+    elevation_bin: Optional[List[str]] = Query(default=None),
+    min_elevation: Optional[float] = Query(default=None, description="Only elevation bins starting at or above this"),
+    max_elevation: Optional[float] = Query(default=None, description="Only elevation bins ending at or below this"),
+    filters: dict = Depends(fire_filters),
+):
+    """
+    Cross-filtered fire counts from the precomputed cube, e.g.
+    /fires/counts?by=month&district=Kaski&min_elevation=2000.
+    Repeat a filter to allow several values.
+    """
+    if by not in DIMENSIONS:
+        return JSONResponse(status_code=422, content={"error": f"by must be one of {DIMENSIONS}"})
+    if min_elevation is not None or max_elevation is not None:
+        bins = elevation_labels_between(min_elevation, max_elevation)
+        elevation_bin = [b for b in bins if elevation_bin is None or b in elevation_bin]
+    levels = {"year": year, "month": month, "confidence": confidence, "elevation_bin": elevation_bin}
+
+    def compute():
+        result = _filtered(get_fire_counts, by, **levels, **filters)
+        if isinstance(result, JSONResponse):
+            return result
+        return {**result, "filters": {k: v for k, v in {**filters, **levels}.items() if v is not None}}
+    return _cached(request, compute)
+
+@router.get("/fires/tiles/{z}/{x}/{y}")
+def fire_tile(request: Request, z: int, x: int, y: int):
+    """
+    Map tile of the historical fires: per-cell counts at low zoom, the
+    fires themselves once a tile holds few enough of them.
+    """
+    def compute():
+        try:
+            return get_fire_tile(z, x, y)
+        except ValueError as e:
+            return JSONResponse(status_code=404, content={"error": str(e)})
+    return _cached(request, compute)
+
+@router.get("/fires/dataset-stats")
+def fire_dataset_stats():
+    return {**fire_data.stats(), "responses": stats_responses.stats()}
 
 @router.get("/fires/geo-sample")
-def fires_geo_sample():
-    return get_geo_sample()
+def fires_geo_sample(request: Request, stream: bool = False, filters: dict = Depends(fire_filters),
+                     fmt: Optional[str] = Query(default=None, alias="format", description="json, columns or binary")):
+    try:
+        fmt = wire_format(request, fmt)
+    except ValueError as e:
+        return JSONResponse(status_code=422, content={"error": str(e)})
+    if fmt != "json":
+        def compute():
+            frame = _filtered(geo_sample_frame, **filters)
+            return frame if isinstance(frame, JSONResponse) else encode_frame(frame, fmt)
+        return _cached(request, compute, FORMATS[fmt], vary="Accept", variant=fmt)
+    if wants_ndjson(request, stream):
+        frame = _filtered(geo_sample_frame, **filters)
+        if isinstance(frame, JSONResponse):
+            return frame
+        return ndjson_response(ndjson_frames(frame_chunks(frame)))
+    return _cached(request, lambda: _filtered(get_geo_sample, **filters), vary="Accept", variant=fmt)
@@ -0,0 +1,165 @@
+import math
+
+import numpy as np
+
+from custom_rf import RandomForest
+
+
+def _scaler_params(scaler, n_features):
+    # StandardScaler leaves mean_/scale_ as None when with_mean/with_std is off
+    mean = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    mean = np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64)
+    scale = np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64)
+    return mean, scale
+
+
+_SIGN = np.int64(-0x8000000000000000)
+
+
+def _float_key(x):
+    # Integer key with the same order as the floats it came from
+    bits = np.asarray(x, dtype=np.float64).view(np.int64)
+    return np.where(bits >= 0, bits, _SIGN - bits)
+
+
+def _key_float(key):
+    return np.where(key >= 0, key, _SIGN - key).view(np.float64)
+
+
+def fold_thresholds(feature, threshold, mean, scale):
+    """
+    Thresholds on raw inputs equivalent to the given thresholds on scaled
+    inputs: for every node, (x - mean) / scale <= t exactly when x <= t'.
+
+    t * scale + mean is only right to within rounding (and far off when
+    x - mean absorbs x), so t' is found by bisecting over all floats for the
+    largest raw value whose scaled value, computed the way
+    StandardScaler.transform does it, still passes the original test.
+    """
+    feature = np.asarray(feature)
+    threshold = np.asarray(threshold, dtype=np.float64)
+    folded = threshold.copy()
+    split = (feature >= 0) & (feature < len(mean)) & np.isfinite(threshold)
+    f = feature[split]
+    t = threshold[split]
+    m, s = mean[f], scale[f]
+
+    def passes(key):
+        with np.errstate(over="ignore", invalid="ignore"):
+            return (_key_float(key) - m) / s <= t
+
+    # Scaling is monotone in x: -inf always passes a finite test, +inf never does
+    lo = np.full(len(t), _float_key(-np.inf))
+    hi = np.full(len(t), _float_key(np.inf))
+    while True:
+        open_ = hi - 1 > lo
+        if not open_.any():
+            break
+        mid = lo // 2 + hi // 2 + (lo % 2 + hi % 2) // 2
+        ok = passes(mid)
+        lo = np.where(open_ & ok, mid, lo)
+        hi = np.where(open_ & ~ok, mid, hi)
+    folded[split] = _key_float(lo)
+    return folded
+
+
+# Random Forest
+def _n_features(flat, scaler):
+    # The trees alone can't tell: a feature the forest never splits on
+    # leaves no trace in flat.feature
+    if flat.feature_names:
+        return len(flat.feature_names)
+    if getattr(scaler, "n_features_in_", None) is not None:
+        return int(scaler.n_features_in_)
+    if flat.scaler_mean is not None:
+        return len(flat.scaler_mean)
+    return int(np.max(flat.feature)) + 1
+
+
+class FusedForest:
+    """
+    A forest whose split thresholds have the scaler folded in, so it scores
+    raw feature vectors directly. Matches scaler.transform followed by the
+    original forest's predict_proba. n_features defaults to the forest's
+    feature names, else the scaler's width.
+    """
+    def __init__(self, forest, scaler=None, n_features=None):
+        flat = forest.flatten() if isinstance(forest, RandomForest) else forest
+        if n_features is None:
+            n_features = _n_features(flat, scaler)
+        if scaler is not None:
+            mean, scale = _scaler_params(scaler, n_features)
+        elif flat.scaler_mean is not None:
+            mean = np.asarray(flat.scaler_mean, dtype=np.float64)
+            scale = np.asarray(flat.scaler_scale, dtype=np.float64)
+        else:
+            mean, scale = np.zeros(n_features), np.ones(n_features)
+
+        arrays = {name: np.asarray(getattr(flat, name))
+                  for name in ("feature", "left", "right", "value", "roots")}
+        arrays["threshold"] = fold_thresholds(flat.feature, flat.threshold, mean, scale)
+        self.flat = flat._with_nodes(arrays, scaler_mean=None, scaler_scale=None)
+        self.n_features = n_features
+        self.compiled = None
+
+    def compile(self, **kwargs):
+        """
+        Generate straight-line Python for the folded forest (see rf_codegen)
+        and use it for single rows.
+        """
+        from rf_codegen import compile_forest
+        self.compiled = compile_forest(self.flat, n_features=self.n_features, **kwargs)
+        return self
+
+    def predict_proba_one(self, x):
+        """
+        [P(class 0), P(class 1)] for one raw feature vector.
+        """
+        if self.compiled is not None:
+            return self.compiled.predict_proba_row([float(v) for v in x])
+        return self.flat.predict_proba(np.asarray(x, dtype=np.float64).reshape(1, -1))[0].tolist()
+
+    def predict_proba(self, X):
+        return self.flat.predict_proba(X)
+
+
+# Gaussian Naive Bayes
+class FusedGaussianNB:
+    """
+    GaussianNB with a StandardScaler folded into its class means and
+    variances: with z = (x - m) / s, (z - theta)^2 / var equals
+    (x - (m + s * theta))^2 / (s^2 * var), so raw inputs are scored directly.
+    The normalising term keeps the fitted var so log-likelihoods match
+    GaussianNB's own.
+    """
+    def __init__(self, model, scaler=None):
+        theta = np.asarray(model.theta_, dtype=np.float64)
+        var = np.asarray(model.var_, dtype=np.float64)
+        n_features = theta.shape[1]
+        mean, scale = _scaler_params(scaler, n_features) if scaler is not None \
+            else (np.zeros(n_features), np.ones(n_features))
+
+        self.classes_ = model.classes_
+        self.theta = mean + scale * theta
+        self.var = scale ** 2 * var
+        self.log_norm = np.log(model.class_prior_) - 0.5 * np.sum(np.log(2.0 * np.pi * var), axis=1)
+        self.n_features = n_features
+        # Plain lists for the single-row path, where numpy's per-call cost dominates
+        self._rows = [(float(c), list(map(float, th)), [1.0 / (2.0 * v) for v in va])
+                      for c, th, va in zip(self.log_norm, self.theta, self.var)]
+
+    def predict_proba_one(self, x):
+        x = [float(v) for v in x]
+        jll = [c - sum((xi - ti) ** 2 * wi for xi, ti, wi in zip(x, th, w)) for c, th, w in self._rows]
+        top = max(jll)
+        weights = [math.exp(j - top) for j in jll]
+        total = sum(weights)
+        return [w / total for w in weights]
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.n_features)
+        jll = self.log_norm - 0.5 * (((X[:, None, :] - self.theta) ** 2) / self.var).sum(axis=2)
+        jll -= jll.max(axis=1, keepdims=True)
+        proba = np.exp(jll)
+        return proba / proba.sum(axis=1, keepdims=True)
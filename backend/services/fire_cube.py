@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+
+ELEVATION_BINS = [0, 500, 1000, 2000, 3000, 4000, 9000]
+ELEVATION_LABELS = ["0-500m", "500-1000m", "1000-2000m", "2000-3000m", "3000-4000m", "4000m+"]
+DIMENSIONS = ["year", "month", "district", "elevation_bin", "confidence"]
+
+
+def elevation_labels_between(min_elevation=None, max_elevation=None):
+    """
+    Elevation bins lying entirely within [min_elevation, max_elevation].
+    The cube only knows which bin a fire fell in, so that's the resolution.
+    """
+    lo = -np.inf if min_elevation is None else min_elevation
+    hi = np.inf if max_elevation is None else max_elevation
+    return [label for label, low, high in zip(ELEVATION_LABELS, ELEVATION_BINS, ELEVATION_BINS[1:])
+            if low >= lo and high <= hi]
+
+
+class Dimension:
+    """
+    One axis of the cube. Slot i holds levels[i]; the extra last slot counts
+    rows where the value is missing (or the column doesn't exist).
+    first_row[i] is the first row with that value, so counts can be ordered
+    the way value_counts breaks ties.
+    """
+
+    def __init__(self, name, levels, codes, present=True):
+        self.name = name
+        self.levels = levels
+        self.present = present
+        n = len(codes)
+        codes = np.where(codes < 0, len(levels), codes)
+        self.first_row = np.full(len(levels) + 1, n, dtype=np.int64)
+        np.minimum.at(self.first_row, codes, np.arange(n, dtype=np.int64))
+        self.codes = codes
+        self._lookup = {self._key(v): i for i, v in enumerate(levels.tolist())}
+
+    @property
+    def size(self):
+        return len(self.levels) + 1
+
+    def _key(self, value):
+        if self.levels.dtype.kind in "iuf":
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return None
+        return str(value)
+
+    def slots(self, values):
+        """
+        Slots of the given level values; values not in the data match nothing.
+        """
+        keys = (self._key(v) for v in values)
+        return sorted({self._lookup[k] for k in keys if k in self._lookup})
+
+
+def _factorized(name, series, sort, n):
+    if series is None:
+        return Dimension(name, np.empty(0), np.full(n, -1), present=False)
+    codes, uniques = pd.factorize(series, sort=sort)
+    return Dimension(name, np.asarray(uniques), codes)
+
+
+class FireCube:
+    """
+    Fire counts over year x month x district x elevation bin x confidence,
+    built from the raw rows once. Every statistic is a sum over a slice of
+    it, so queries cost the size of the cube, not of the dataset.
+    """
+
+    def __init__(self, dimensions, counts, rows):
+        self.dimensions = {d.name: d for d in dimensions}
+        self.counts = counts
+        self.rows = rows
+        # Unfiltered totals, which the stats endpoints ask for every time
+        self._margins = {}
+
+    @classmethod
+    def from_frame(cls, df, columns=None):
+        """
+        columns maps each dimension to the column it is read from (default:
+        the dimension's own name); dimensions without a column stay empty.
+        """
+        columns = {name: name for name in DIMENSIONS} | dict(columns or {})
+        source = {name: df[col] if col in df.columns else None for name, col in columns.items()}
+        dims = [
+            _factorized("year", source["year"], True, len(df)),
+            _factorized("month", source["month"], True, len(df)),
+            _factorized("district", source["district"], False, len(df)),
+            _elevation_dimension(source["elevation_bin"], len(df)),
+            _factorized("confidence", source["confidence"], False, len(df)),
+        ]
+        shape = tuple(d.size for d in dims)
+        flat = np.ravel_multi_index(tuple(d.codes for d in dims), shape)
+        counts = np.bincount(flat, minlength=int(np.prod(shape)))
+        counts = counts.astype(np.min_scalar_type(int(counts.max(initial=0)))).reshape(shape)
+        for d in dims:
+            # Kept per row for queries over a subset of rows
+            d.codes = d.codes.astype(np.min_scalar_type(d.size))
+        return cls(dims, counts, len(df))
+
+    # ---------------- QUERIES ---------------- #
+    def totals(self, *by, rows=None, **filters):
+        """
+        Counts along the dimensions in by (missing-value slot last), over
+        the rows whose values are in filters[dimension] for every filter.
+        With rows (sorted row ids) only those rows are counted, at a cost
+        proportional to their number.
+        """
+        if rows is not None:
+            return self._row_totals(by, rows, filters)
+        if all(values is None for values in filters.values()):
+            margin = self._margins.get(by)
+            if margin is None:
+                margin = self._margins[by] = self._totals(by, {})
+            return margin
+        return self._totals(by, filters)
+
+    def _totals(self, by, filters):
+        cube = self.counts
+        kept = {}
+        for name, values in filters.items():
+            if values is None:
+                continue
+            kept[name] = self.dimensions[name].slots(values)
+            cube = np.take(cube, kept[name], axis=DIMENSIONS.index(name))
+        axes = [DIMENSIONS.index(name) for name in by]
+        other = tuple(i for i in range(cube.ndim) if i not in axes)
+        totals = cube.sum(axis=other, dtype=np.int64)
+        # sum keeps the remaining axes in cube order; put them in the order asked
+        if len(axes) > 1:
+            totals = np.moveaxis(totals, np.argsort(np.argsort(axes)), range(len(axes)))
+        # A filtered axis in the result goes back to one entry per slot
+        for i, name in enumerate(by):
+            if name in kept:
+                full = np.zeros(totals.shape[:i] + (self.dimensions[name].size,) + totals.shape[i + 1:], np.int64)
+                full[(slice(None),) * i + (kept[name],)] = totals
+                totals = full
+        return totals
+
+    def _row_totals(self, by, rows, filters):
+        for name, values in filters.items():
+            if values is not None:
+                dim = self.dimensions[name]
+                rows = rows[np.isin(dim.codes[rows], dim.slots(values))]
+        shape = tuple(self.dimensions[name].size for name in by)
+        flat = np.ravel_multi_index(tuple(self.dimensions[name].codes[rows].astype(np.intp) for name in by), shape)
+        return np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+
+    def group_counts(self, by, rows=None, **filters):
+        """
+        [{by: level, "count": n}] in level order, like df.groupby(by).size()
+        over the filtered rows; missing values and empty groups are left out.
+        """
+        dim = self.dimensions[by]
+        totals = self.totals(by, rows=rows, **filters)[:-1]
+        order = range(len(dim.levels)) if by == "elevation_bin" else np.argsort(dim.levels, kind="stable")
+        levels = dim.levels.tolist()
+        return [{by: levels[i], "count": int(totals[i])} for i in order if totals[i]]
+
+    def value_counts(self, by, fill=None, rows=None, **filters):
+        """
+        (level, count) pairs ordered like series.value_counts(), with
+        missing values counted as fill (or dropped when fill is None).
+        """
+        dim = self.dimensions[by]
+        totals = self.totals(by, rows=rows, **filters)
+        first_row = dim.first_row
+        if rows is not None:
+            # Ties go by first occurrence among the selected rows
+            first_row = np.full(dim.size, self.rows, dtype=np.int64)
+            slots, first = np.unique(dim.codes[rows], return_index=True)
+            first_row[slots] = rows[first]
+        labels = dim.levels.tolist() + [fill]
+        merged = {}
+        for slot in np.argsort(first_row, kind="stable"):
+            if labels[slot] is None or not totals[slot]:
+                continue
+            merged[labels[slot]] = merged.get(labels[slot], 0) + int(totals[slot])
+        # value_counts sorts first-seen order by count with a stable sort
+        counts = pd.Series(list(merged.values()), index=pd.Index(list(merged), dtype=object), dtype=np.int64)
+        counts = counts.sort_values(ascending=False, kind="stable")
+        return list(zip(counts.index.tolist(), counts.tolist()))
+
+    def stats(self):
+        return {
+            "rows": self.rows,
+            "shape": {name: d.size for name, d in self.dimensions.items()},
+            "cells": int(self.counts.size),
+            "bytes": int(self.counts.nbytes),
+            "dtype": str(self.counts.dtype),
+        }
+
+
+def _elevation_dimension(elevation, n):
+    levels = np.array(ELEVATION_LABELS, dtype=object)
+    if elevation is None:
+        return Dimension("elevation_bin", levels, np.full(n, -1), present=False)
+    bins = pd.cut(elevation, bins=ELEVATION_BINS, labels=ELEVATION_LABELS, include_lowest=True)
+    return Dimension("elevation_bin", levels, bins.cat.codes.to_numpy())
@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+
+# Grid cell size for the spatial index, in degrees
+CELL_DEGREES = 0.25
+# FIRMS VIIRS confidence classes, lowest first
+CONFIDENCE_RANKS = {"l": 0, "low": 0, "n": 1, "nominal": 1, "h": 2, "high": 2}
+_NO_DATE = np.iinfo(np.int64).min
+
+
+def parse_bbox(bbox):
+    """
+    "west,south,east,north" -> (west, south, east, north) floats.
+    """
+    try:
+        west, south, east, north = (float(v) for v in bbox.split(","))
+    except (AttributeError, ValueError):
+        raise ValueError("bbox must be west,south,east,north")
+    if west > east or south > north:
+        raise ValueError("bbox must be west,south,east,north with west <= east and south <= north")
+    return west, south, east, north
+
+
+def _day(value):
+    return int(np.datetime64(pd.Timestamp(value).date(), "D").astype(np.int64))
+
+
+class _Groups:
+    """
+    Row ids grouped by an integer key: the rows of key k are
+    order[starts[k]:starts[k + 1]], in row order.
+    """
+
+    def __init__(self, keys, n_keys):
+        self.order = np.argsort(keys, kind="stable")
+        self.starts = np.zeros(n_keys + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=n_keys), out=self.starts[1:])
+
+    def size(self, first, last):
+        return int(self.starts[last + 1] - self.starts[first])
+
+    def rows(self, first, last):
+        return self.order[self.starts[first]:self.starts[last + 1]]
+
+
+class FireIndex:
+    """
+    Row indexes over the cached fire dataset: rows sorted by acquisition
+    day, a CELL_DEGREES grid over the coordinates, rows grouped by
+    district and rows sorted by confidence rank. select() starts from whichever index matches the fewest rows
+    and checks the other filters on those rows only.
+    """
+
+    def __init__(self, df, cube, lat_column=None, lon_column=None):
+        self.rows = len(df)
+        self._cube = cube
+
+        if "acq_date" in df.columns:
+            dates = df["acq_date"]
+            days = dates.to_numpy("datetime64[D]").astype(np.int64)
+            days[dates.isna().to_numpy()] = _NO_DATE
+        else:
+            days = np.full(self.rows, _NO_DATE, dtype=np.int64)
+        self.days = days
+        dated = np.flatnonzero(days != _NO_DATE)
+        self._by_day = dated[np.argsort(days[dated], kind="stable")]
+        self._sorted_days = days[self._by_day]
+
+        self.lat = self.lon = None
+        if lat_column and lon_column:
+            self.lat = df[lat_column].to_numpy(np.float32, na_value=np.nan)
+            self.lon = df[lon_column].to_numpy(np.float32, na_value=np.nan)
+            located = np.isfinite(self.lat) & np.isfinite(self.lon)
+            lat, lon = (self.lat[located], self.lon[located]) if located.any() else (np.zeros(1), np.zeros(1))
+            self._origin = (float(lat.min()), float(lon.min()))
+            top, right = float(lat.max()), float(lon.max())
+            self._grid_rows = int((top - self._origin[0]) // CELL_DEGREES) + 1
+            self._grid_cols = int((right - self._origin[1]) // CELL_DEGREES) + 1
+            cells = np.full(self.rows, self._grid_rows * self._grid_cols, dtype=np.int64)
+            r, c = self._cell(self.lat[located], self.lon[located])
+            cells[located] = r * self._grid_cols + c
+            # The extra last cell holds rows without coordinates
+            self._grid = _Groups(cells, self._grid_rows * self._grid_cols + 1)
+
+        district = cube.dimensions["district"]
+        self._districts = _Groups(district.codes, district.size)
+
+        confidence = cube.dimensions["confidence"]
+        self._confidence_numeric = confidence.levels.dtype.kind in "iuf"
+        if self._confidence_numeric:
+            ranks = confidence.levels.astype(np.float64)
+        else:
+            ranks = np.array([CONFIDENCE_RANKS.get(str(v).strip().lower(), np.nan) for v in confidence.levels],
+                             dtype=np.float64)
+        self.confidence_rank = np.append(ranks, np.nan)[confidence.codes]
+        ranked = np.flatnonzero(~np.isnan(self.confidence_rank))
+        self._by_rank = ranked[np.argsort(self.confidence_rank[ranked], kind="stable")]
+        self._sorted_ranks = self.confidence_rank[self._by_rank]
+
+    def _cell(self, lat, lon):
+        r = np.clip(((lat - self._origin[0]) // CELL_DEGREES).astype(np.int64), 0, self._grid_rows - 1)
+        c = np.clip(((lon - self._origin[1]) // CELL_DEGREES).astype(np.int64), 0, self._grid_cols - 1)
+        return r, c
+
+    def _confidence_floor(self, min_confidence):
+        if self._confidence_numeric:
+            try:
+                return float(min_confidence)
+            except ValueError:
+                pass
+        else:
+            rank = CONFIDENCE_RANKS.get(str(min_confidence).strip().lower())
+            if rank is not None:
+                return float(rank)
+        raise ValueError(f"Unknown confidence level: {min_confidence}")
+
+    # ---------------- CANDIDATES ---------------- #
+    def _date_candidates(self, start, end):
+        lo = 0 if start is None else np.searchsorted(self._sorted_days, _day(start), "left")
+        hi = len(self._sorted_days) if end is None else np.searchsorted(self._sorted_days, _day(end), "right")
+        return hi - lo, lambda: self._by_day[lo:hi]
+
+    def _bbox_candidates(self, bbox):
+        west, south, east, north = bbox
+        if self.lat is None:
+            return 0, lambda: np.empty(0, dtype=np.int64)
+        # One cell of margin, so rounding at cell borders can't drop a row
+        r0, c0 = self._cell(np.float64(south - CELL_DEGREES), np.float64(west - CELL_DEGREES))
+        r1, c1 = self._cell(np.float64(north + CELL_DEGREES), np.float64(east + CELL_DEGREES))
+        # Cells of one grid row are contiguous in the index
+        spans = [(r * self._grid_cols + c0, r * self._grid_cols + c1) for r in range(int(r0), int(r1) + 1)]
+        size = sum(self._grid.size(a, b) for a, b in spans)
+        return size, lambda: np.concatenate([self._grid.rows(a, b) for a, b in spans] or [np.empty(0, np.int64)])
+
+    def _district_candidates(self, slots):
+        size = sum(self._districts.size(s, s) for s in slots)
+        return size, lambda: np.concatenate([self._districts.rows(s, s) for s in slots] or [np.empty(0, np.int64)])
+
+    def _confidence_candidates(self, floor):
+        lo = np.searchsorted(self._sorted_ranks, floor, "left")
+        return len(self._sorted_ranks) - lo, lambda: self._by_rank[lo:]
+
+    # ---------------- QUERIES ---------------- #
+    def select(self, start=None, end=None, bbox=None, district=None, min_confidence=None):
+        """
+        Sorted ids of the rows matching every given filter, or None when no
+        filter is given. start and end are inclusive dates, bbox is
+        (west, south, east, north), district a list of names and
+        min_confidence a level ("l", "n", "h") or number, by the dataset's
+        confidence scale.
+        """
+        if start is None and end is None and bbox is None and district is None and min_confidence is None:
+            return None
+        bbox = parse_bbox(bbox) if isinstance(bbox, str) else bbox
+        floor = None if min_confidence is None else self._confidence_floor(min_confidence)
+        slots = None if district is None else self._cube.dimensions["district"].slots(district)
+
+        candidates = []
+        if start is not None or end is not None:
+            candidates.append(self._date_candidates(start, end))
+        if bbox is not None:
+            candidates.append(self._bbox_candidates(bbox))
+        if slots is not None:
+            candidates.append(self._district_candidates(slots))
+        if floor is not None:
+            candidates.append(self._confidence_candidates(floor))
+        # Every filter has an index, so this never scans the whole table
+        rows = min(candidates, key=lambda c: c[0])[1]()
+
+        if start is not None:
+            rows = rows[self.days[rows] >= _day(start)]
+        if end is not None:
+            rows = rows[(self.days[rows] <= _day(end)) & (self.days[rows] != _NO_DATE)]
+        if bbox is not None and self.lat is None:
+            rows = rows[:0]
+        elif bbox is not None:
+            west, south, east, north = (np.float32(v) for v in bbox)
+            lat, lon = self.lat[rows], self.lon[rows]
+            rows = rows[(lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)]
+        if slots is not None:
+            rows = rows[np.isin(self._cube.dimensions["district"].codes[rows], slots)]
+        if floor is not None:
+            rows = rows[self.confidence_rank[rows] >= floor]
+        return np.sort(rows)
+
+    def stats(self):
+        return {
+            "rows": self.rows,
+            "dated_rows": int(len(self._by_day)),
+            "grid": None if self.lat is None else {"rows": self._grid_rows, "cols": self._grid_cols,
+                                                   "cell_degrees": CELL_DEGREES},
+            "districts": int(self._cube.dimensions["district"].size - 1),
+        }
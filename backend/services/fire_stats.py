@@ -1,127 +1,311 @@
 import os
+import threading
+import time
+
+import numpy as np
 import pandas as pd
 
+from services.fire_cube import FireCube
+from services.fire_index import FireIndex
+from services.fire_tiles import TilePyramid
+from utils.columnar import read_columns
+
 # Base directory of the backend
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_PATH = os.path.join(BASE_DIR, "data", "nepal_fire_data_cleaned.csv")
 
+CANDIDATE_PATHS = [
+    DATA_PATH,
+    os.path.join(BASE_DIR, "..", "everything else", "nepal_fire_data_cleaned.csv"),
+    os.path.join(BASE_DIR, "..", "everything else", "nepal fire data cleaned.csv"),
+    os.path.join(BASE_DIR, "data", "nepal_fire_data_cleaned.csv"),
+]
+
+# Low-cardinality text columns kept as categoricals
+CATEGORY_COLUMNS = ["district", "province", "confidence", "satellite", "instrument", "daynight"]
+COORDINATE_COLUMNS = ["latitude", "lat", "Latitude", "longitude", "lon", "long", "Longitude"]
+DISTRICT_COLUMNS = ["district", "District", "district_name", "admin1", "province_district", "DISTRICT"]
+LAT_COLUMNS = ["latitude", "lat", "y", "Latitude"]
+LON_COLUMNS = ["longitude", "lon", "x", "Longitude", "long"]
+
+
+def _compact(df):
+    """
+    Dataset with compact dtypes: categoricals for repeated labels, float32
+    coordinates, and acq_date parsed once along with its year and month.
+    """
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and df[col].nunique(dropna=True) <= max(len(df) // 2, 1):
+            df[col] = df[col].astype("category")
+    for col in COORDINATE_COLUMNS:
+        if col in df.columns and df[col].dtype.kind == "f":
+            df[col] = df[col].astype(np.float32)
+    if "acq_date" in df.columns:
+        df["acq_date"] = pd.to_datetime(df["acq_date"], errors="coerce")
+        df["year"] = df["acq_date"].dt.year
+        df["month"] = df["acq_date"].dt.month
+    return df
+
+
+def _first_column(df, names):
+    for c in names:
+        if c in df.columns:
+            return c
+    return None
+
+
+def _indexes(df):
+    cube = FireCube.from_frame(df, {"district": _first_column(df, DISTRICT_COLUMNS), "elevation_bin": "elevation"})
+    index = FireIndex(df, cube, _first_column(df, LAT_COLUMNS), _first_column(df, LON_COLUMNS))
+    return cube, index
+
+
+def _pyramid(df, cube):
+    lat_col, lon_col = _first_column(df, LAT_COLUMNS), _first_column(df, LON_COLUMNS)
+    if not lat_col or not lon_col:
+        return None
+    confidence = cube.dimensions["confidence"]
+    return TilePyramid(df[lat_col].to_numpy(np.float64, na_value=np.nan), df[lon_col].to_numpy(np.float64, na_value=np.nan),
+                       confidence.codes, confidence.levels.tolist())
+
+
+def _plain(series):
+    # Categorical back to the dtype read from the CSV, for results whose
+    # ordering or types depend on it (value_counts ties, to_dict values)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(series.cat.categories.dtype)
+    if series.dtype == np.float32:
+        # Shortest float32 repr recovers the CSV's decimal exactly
+        return series.astype(str).astype(np.float64)
+    return series
+
+
+class FireDataCache:
+    """
+    The historical fire dataset, parsed once per process along with its
+    count cube and row indexes. get() re-reads the file only when its mtime or size changes.
+    The returned frame is shared: callers must not modify it.
+    """
+
+    def __init__(self, candidates):
+        self.candidates = list(candidates)
+        self._df = None
+        self._cube = None
+        self._index = None
+        self._state = None
+        self._tiles = None
+        self._path = None
+        self._stat = None
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+        self.load_seconds = None
+        self.loaded_at = None
+
+    def _resolve(self):
+        if self._path is not None and os.path.exists(self._path):
+            return self._path
+        for path in self.candidates:
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError("Nepal fire data CSV not found in expected locations.")
+
+    def get(self):
+        path = self._resolve()
+        st = os.stat(path)
+        stat = (path, st.st_mtime_ns, st.st_size)
+        if self._stat == stat:
+            self.hits += 1
+            return self._df
+        with self._lock:
+            if self._stat != stat:
+                started = time.perf_counter()
+                df = _compact(read_columns(path))
+                cube, index = _indexes(df)
+                self._df, self._cube, self._index, self._path = df, cube, index, path
+                self._state = (df, cube, index)
+                self._stat = stat
+                self.load_seconds = time.perf_counter() - started
+                self.loaded_at = time.time()
+                self.loads += 1
+            else:
+                self.hits += 1
+            return self._df
+
+    def version(self):
+        """
+        (path, mtime_ns, size) of the loaded file; changes whenever get() reloads.
+        """
+        self.get()
+        return self._stat
+
+    def cube(self):
+        self.get()
+        return self._cube
+
+    def indexed(self):
+        """
+        (frame, cube, index) of the same load.
+        """
+        self.get()
+        return self._state
+
+    def tiles(self):
+        """
+        (frame, tile pyramid) of the current load; the pyramid is built on
+        first use, and is None when the data has no coordinates.
+        """
+        df, cube, _ = self.indexed()
+        with self._lock:
+            if self._tiles is None or self._tiles[0] is not df:
+                self._tiles = (df, _pyramid(df, cube))
+            return self._tiles
+
+    def stats(self):
+        df = self._df
+        return {
+            "path": self._path,
+            "loaded": df is not None,
+            "rows": int(len(df)) if df is not None else 0,
+            "memory_bytes": int(df.memory_usage(deep=True).sum()) if df is not None else 0,
+            "dtypes": {c: str(t) for c, t in df.dtypes.items()} if df is not None else {},
+            "load_seconds": self.load_seconds,
+            "loaded_at": self.loaded_at,
+            "loads": self.loads,
+            "hits": self.hits,
+            "cube": self._cube.stats() if self._cube is not None else None,
+            "index": self._index.stats() if self._index is not None else None,
+            "tiles": self._tiles[1].stats() if self._tiles is not None and self._tiles[1] is not None else None,
+        }
+
+
+fire_data = FireDataCache(CANDIDATE_PATHS)
+
 def load_fire_data():
-    candidates = [
-        DATA_PATH,
-        os.path.join(BASE_DIR, "..", "everything else", "nepal_fire_data_cleaned.csv"),
-        os.path.join(BASE_DIR, "..", "everything else", "nepal fire data cleaned.csv"),
-        os.path.join(BASE_DIR, "data", "nepal_fire_data_cleaned.csv"),
-    ]
-    for path in candidates:
-        if os.path.exists(path):
-            return pd.read_csv(path)
-    raise FileNotFoundError("Nepal fire data CSV not found in expected locations.")
-
-def get_yearly_fire_counts():
-    df = load_fire_data()
-    df['acq_date'] = pd.to_datetime(df['acq_date'], errors='coerce')
-    df['year'] = df['acq_date'].dt.year
-    yearly_counts = df.groupby('year').size().reset_index(name='count')
-
-    return yearly_counts.to_dict(orient='records')
-
-def get_monthly_fire_counts():
-    df = load_fire_data()
-    df['acq_date'] = pd.to_datetime(df['acq_date'], errors='coerce')
-    df['month'] = df['acq_date'].dt.month
-    return df.groupby('month').size().reset_index(name='count').to_dict(orient='records')
-
-def get_confidence_level_counts():
-    df = load_fire_data()
-
-    if 'confidence' not in df.columns:
-        return {"error": "Confidence data not found."}
+    return fire_data.get()
 
-    # Normalize column (if it's numeric, you can bin it instead)
-    return df['confidence'].value_counts().reset_index(name='count') \
-             .rename(columns={'index': 'confidence'}) \
-             .to_dict(orient='records')
+def dataset_version():
+    return fire_data.version()
 
+def _query(filters):
+    """
+    Cube plus the ids of the rows matching the filters (start, end, bbox,
+    district, min_confidence; see FireIndex.select), None for all rows.
+    """
+    df, cube, index = fire_data.indexed()
+    return df, cube, index.select(**filters)
+
+def get_yearly_fire_counts(**filters):
+    _, cube, rows = _query(filters)
+    return cube.group_counts("year", rows=rows)
 
-def get_elevation_fire_counts():
-    df = load_fire_data()
+def get_monthly_fire_counts(**filters):
+    _, cube, rows = _query(filters)
+    return cube.group_counts("month", rows=rows)
+
+def get_confidence_level_counts(**filters):
+    _, cube, rows = _query(filters)
+
+    if not cube.dimensions["confidence"].present:
+        return {"error": "Confidence data not found."}
 
-    bins = [0, 500, 1000, 2000, 3000, 4000, 9000]
-    labels = ["0-500m", "500-1000m", "1000-2000m", "2000-3000m", "3000-4000m", "4000m+"]
+    return [{"confidence": level, "count": count} for level, count in cube.value_counts("confidence", rows=rows)]
 
-    df['elevation_bin'] = pd.cut(df['elevation'], bins=bins, labels=labels, include_lowest=True)
-    result = df.groupby('elevation_bin').size().reset_index(name='count')
 
-    return result.to_dict(orient='records')
+def get_elevation_fire_counts(**filters):
+    _, cube, rows = _query(filters)
+    if not cube.dimensions["elevation_bin"].present:
+        raise KeyError("elevation")
+    return cube.group_counts("elevation_bin", rows=rows)
 
 
-def get_year_month_matrix():
-    df = load_fire_data()
-    if 'acq_date' not in df.columns:
+def get_year_month_matrix(**filters):
+    _, cube, rows = _query(filters)
+    if not cube.dimensions["year"].present:
         return {"labels": [], "series": []}
-    df['acq_date'] = pd.to_datetime(df['acq_date'], errors='coerce')
-    df['year'] = df['acq_date'].dt.year
-    df['month'] = df['acq_date'].dt.month
-    pivot = df.pivot_table(index='year', columns='month', values='acq_date', aggfunc='count', fill_value=0)
-    years = list(map(int, pivot.index.tolist()))
-    # Ensure months 1..12 order
+    counts = cube.totals("year", "month", rows=rows)[:-1, :-1]
+    year_levels = cube.dimensions["year"].levels
+    month_slots = {int(m): i for i, m in enumerate(cube.dimensions["month"].levels.tolist())}
+    years = [int(year_levels[i]) for i in np.argsort(year_levels, kind="stable") if counts[i].sum()]
+    by_year = {int(year_levels[i]): counts[i] for i in range(len(year_levels))}
     months = list(range(1, 13))
-    matrix = []
-    for y in years:
-        row = []
-        for m in months:
-            try:
-                row.append(int(pivot.loc[y, m]))
-            except Exception:
-                row.append(0)
-        matrix.append(row)
+    matrix = [[int(by_year[y][month_slots[m]]) if m in month_slots else 0 for m in months] for y in years]
     return {"years": years, "months": months, "matrix": matrix}
 
 
-def get_geo_sample(limit: int = 3000):
-    df = load_fire_data()
-    lat_col = None
-    lon_col = None
-    for lc in ["latitude", "lat", "y", "Latitude"]:
-        if lc in df.columns:
-            lat_col = lc
-            break
-    for lc in ["longitude", "lon", "x", "Longitude", "long"]:
-        if lc in df.columns:
-            lon_col = lc
-            break
+def get_fire_counts(by, year=None, month=None, confidence=None, elevation_bin=None, **filters):
+    """
+    Fire counts grouped by one cube dimension over the rows matching every
+    filter, e.g. get_fire_counts("month", district=["Kaski"],
+    elevation_bin=["2000-3000m", "3000-4000m", "4000m+"]).
+    """
+    _, cube, rows = _query(filters)
+    levels = {"year": year, "month": month, "confidence": confidence, "elevation_bin": elevation_bin}
+    return {"by": by, "total": int(cube.totals(by, rows=rows, **levels).sum()),
+            "counts": cube.group_counts(by, rows=rows, **levels)}
+
+
+def get_geo_sample(limit: int = 3000, **filters):
+    return geo_sample_frame(limit, **filters).to_dict(orient="records")
+
+def geo_sample_frame(limit: int = 3000, **filters):
+    if any(v is not None for v in filters.values()):
+        df, _, rows = _query(filters)
+        df = df.iloc[rows]
+    else:
+        df = load_fire_data()
+    lat_col = _first_column(df, LAT_COLUMNS)
+    lon_col = _first_column(df, LON_COLUMNS)
     if not lat_col or not lon_col:
-        return []
+        return pd.DataFrame()
     cols = [lat_col, lon_col]
     extras = []
     for c in ["confidence", "acq_date", "district", "province"]:
         if c in df.columns:
             extras.append(c)
     cols = cols + extras
-    df_small = df[cols].dropna().sample(n=min(limit, len(df)), random_state=42)
+    df_small = df[cols].dropna()
+    df_small = df_small.sample(n=min(limit, len(df_small)), random_state=42)
     # Normalize keys
     df_small = df_small.rename(columns={lat_col: "latitude", lon_col: "longitude"})
+    for c in df_small.columns:
+        df_small[c] = _plain(df_small[c])
     if "acq_date" in df_small.columns:
         df_small["acq_date"] = pd.to_datetime(df_small["acq_date"], errors="coerce").dt.strftime("%Y-%m-%d")
-    return df_small.to_dict(orient="records")
+    return df_small
 
 # Added function: top districts by fire count
-def get_top_districts(n: int = 10):
+def get_top_districts(n: int = 10, **filters):
     """
     Return top n districts by number of fire incidents.
     Looks for common district column names and returns error if not found.
     """
-    df = load_fire_data()
-    district_col = None
-    for c in ["district", "District", "district_name", "admin1", "province_district", "DISTRICT"]:
-        if c in df.columns:
-            district_col = c
-            break
-    if not district_col:
+    _, cube, rows = _query(filters)
+    if not cube.dimensions["district"].present:
         return {"error": "District column not found in data."}
 
-    top = df[district_col].fillna("Unknown").value_counts().head(n).reset_index()
-    top.columns = [district_col, "count"]
-    # normalize column name to 'district' in result
-    top = top.rename(columns={district_col: "district"})
-    return top.to_dict(orient="records")
\ No newline at end of file
+    top = cube.value_counts("district", fill="Unknown", rows=rows)[:n]
+    return [{"district": district, "count": count} for district, count in top]
+
+
+def _point_records(df, rows):
+    lat_col, lon_col = _first_column(df, LAT_COLUMNS), _first_column(df, LON_COLUMNS)
+    cols = [lat_col, lon_col] + [c for c in ["confidence", "acq_date", "district", "province"] if c in df.columns]
+    points = df.iloc[rows][cols].rename(columns={lat_col: "latitude", lon_col: "longitude"})
+    for c in points.columns:
+        points[c] = _plain(points[c])
+    if "acq_date" in points.columns:
+        points["acq_date"] = points["acq_date"].dt.strftime("%Y-%m-%d")
+    points = points.astype(object)
+    return points.where(points.notna(), None).to_dict(orient="records")
+
+
+def get_fire_tile(z: int, x: int, y: int):
+    """
+    Fires in map tile z/x/y: counts, mean position and most common
+    confidence per cell at low zoom, the fires themselves at high zoom.
+    """
+    df, pyramid = fire_data.tiles()
+    if pyramid is None:
+        return {"error": "Coordinates not found in data."}
+    return pyramid.tile(z, x, y, points=lambda rows: _point_records(df, rows))
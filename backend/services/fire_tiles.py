@@ -0,0 +1,143 @@
+import numpy as np
+
+# Each tile is split into CELLS x CELLS cells (8 px on a 256 px tile)
+CELL_BITS = 5
+CELLS = 1 << CELL_BITS
+# Cells are precomputed for zoom 0..MAX_CELL_ZOOM
+MAX_CELL_ZOOM = 12
+# From this zoom on a tile returns its fires as points, if there are at most
+# MAX_TILE_POINTS (or past MAX_CELL_ZOOM, the first MAX_TILE_POINTS of them)
+POINTS_ZOOM = 10
+MAX_TILE_POINTS = 2000
+MAX_ZOOM = 22
+MAX_LATITUDE = 85.05112878
+
+
+def mercator(lat, lon):
+    """
+    Web Mercator position of lat/lon, as fractions of the world width
+    (x from the antimeridian eastwards, y from the north edge southwards).
+    """
+    lat = np.radians(np.clip(np.asarray(lat, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE))
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0
+    return np.clip(x, 0.0, np.nextafter(1.0, 0.0)), np.clip(y, 0.0, np.nextafter(1.0, 0.0))
+
+
+def tile_bounds(z, x, y):
+    """
+    (west, south, east, north) of a tile in degrees.
+    """
+    n = 2.0 ** z
+
+    def lat(row):
+        return float(np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * row / n)))))
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+class _Level:
+    """
+    The non-empty cells of one zoom level, sorted by tile then cell, with
+    each cell's fire count, mean position and most common confidence slot.
+    """
+
+    def __init__(self, keys, lat, lon, confidence, n_confidence):
+        cells, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        self.keys = cells
+        self.counts = counts.astype(np.int32)
+        self.lat = (np.bincount(inverse, weights=lat, minlength=len(cells)) / counts).astype(np.float32)
+        self.lon = (np.bincount(inverse, weights=lon, minlength=len(cells)) / counts).astype(np.float32)
+
+        # Most common confidence per cell; ties go to the earlier slot
+        pairs, pair_counts = np.unique(inverse.astype(np.int64) * n_confidence + confidence, return_counts=True)
+        cell, slot = np.divmod(pairs, n_confidence)
+        order = np.lexsort((slot, -pair_counts, cell))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = cell[order][1:] != cell[order][:-1]
+        self.confidence = slot[order][first].astype(np.int16)
+
+    def tile(self, tile_key):
+        lo = np.searchsorted(self.keys, tile_key << (2 * CELL_BITS), "left")
+        hi = np.searchsorted(self.keys, (tile_key + 1) << (2 * CELL_BITS), "left")
+        return lo, hi
+
+
+class TilePyramid:
+    """
+    Fire counts per cell for every zoom level up to MAX_CELL_ZOOM, built
+    once from the cached dataset, plus the rows sorted by their POINTS_ZOOM
+    tile for the point tiles.
+    """
+
+    def __init__(self, lat, lon, confidence_codes, confidence_levels):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        self.located = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+        self.lat, self.lon = lat[self.located], lon[self.located]
+        self.mx, self.my = mercator(self.lat, self.lon)
+        self.confidence_levels = list(confidence_levels) + [None]
+        confidence = np.asarray(confidence_codes, dtype=np.int64)[self.located]
+
+        # Cell coordinates at the finest level; coarser levels drop low bits
+        shift = MAX_CELL_ZOOM + CELL_BITS
+        gx = (self.mx * (1 << shift)).astype(np.int64)
+        gy = (self.my * (1 << shift)).astype(np.int64)
+        self.levels = []
+        for z in range(MAX_CELL_ZOOM + 1):
+            cx, cy = gx >> (MAX_CELL_ZOOM - z), gy >> (MAX_CELL_ZOOM - z)
+            tile = ((cy >> CELL_BITS) << z) | (cx >> CELL_BITS)
+            keys = (tile << (2 * CELL_BITS)) | ((cy & (CELLS - 1)) << CELL_BITS) | (cx & (CELLS - 1))
+            self.levels.append(_Level(keys, self.lat, self.lon, confidence, len(self.confidence_levels)))
+
+        tiles = self._tile_keys(POINTS_ZOOM, np.arange(len(self.located)))
+        self._by_tile = np.argsort(tiles, kind="stable")
+        self._sorted_tiles = tiles[self._by_tile]
+
+    def _tile_keys(self, z, rows):
+        n = 1 << z
+        return ((self.my[rows] * n).astype(np.int64) << z) | (self.mx[rows] * n).astype(np.int64)
+
+    def _point_rows(self, z, x, y):
+        """
+        Positions (in self.located) of the fires in a tile at zoom >= POINTS_ZOOM.
+        """
+        parent = ((y >> (z - POINTS_ZOOM)) << POINTS_ZOOM) | (x >> (z - POINTS_ZOOM))
+        lo = np.searchsorted(self._sorted_tiles, parent, "left")
+        hi = np.searchsorted(self._sorted_tiles, parent, "right")
+        rows = np.sort(self._by_tile[lo:hi])
+        return rows[self._tile_keys(z, rows) == ((y << z) | x)]
+
+    def cells(self, z, x, y):
+        level = self.levels[z]
+        lo, hi = level.tile((y << z) | x)
+        return [
+            {"lat": lat, "lon": lon, "count": count, "confidence": self.confidence_levels[slot]}
+            for lat, lon, count, slot in zip(level.lat[lo:hi].tolist(), level.lon[lo:hi].tolist(),
+                                             level.counts[lo:hi].tolist(), level.confidence[lo:hi].tolist())
+        ]
+
+    def tile(self, z, x, y, points=None):
+        """
+        The fires in tile z/x/y: per-cell aggregates, or, from POINTS_ZOOM
+        on and when there are few enough, the fires themselves. points(rows)
+        turns dataset row ids into point records.
+        """
+        if not (0 <= z <= MAX_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)):
+            raise ValueError(f"No tile {z}/{x}/{y}")
+        result = {"z": z, "x": x, "y": y, "bounds": tile_bounds(z, x, y)}
+        if z >= POINTS_ZOOM:
+            rows = self._point_rows(z, x, y)
+            if len(rows) <= MAX_TILE_POINTS or z > MAX_CELL_ZOOM:
+                shown = rows[:MAX_TILE_POINTS]
+                return {**result, "mode": "points", "count": int(len(rows)), "truncated": len(rows) > len(shown),
+                        "points": points(self.located[shown]) if points else self.located[shown].tolist()}
+        cells = self.cells(z, x, y)
+        return {**result, "mode": "cells", "count": sum(c["count"] for c in cells), "cells": cells}
+
+    def stats(self):
+        return {
+            "rows": int(len(self.located)),
+            "cells_per_level": [int(len(level.keys)) for level in self.levels],
+            "bytes": int(sum(level.keys.nbytes + level.counts.nbytes + level.lat.nbytes + level.lon.nbytes
+                             + level.confidence.nbytes for level in self.levels)),
+        }
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+from services.firms_client import FirmsError, firms
+
+# NRT data changes every few hours, so a fetched area stays fresh this long
+FIRMS_CACHE_TTL = float(os.getenv("FIRMS_CACHE_TTL", "600"))
+# Past the TTL an entry is still served, while one background fetch renews it
+FIRMS_STALE_TTL = float(os.getenv("FIRMS_STALE_TTL", "3600"))
+# How old an entry may be and still stand in for FIRMS when FIRMS fails
+FIRMS_STALE_IF_ERROR = float(os.getenv("FIRMS_STALE_IF_ERROR", "86400"))
+
+
+class FirmsCache:
+    """
+    FIRMS area CSVs by (sensor, bbox, days). A fresh entry is served as is;
+    a stale one is served while a background fetch replaces it; a missing
+    or expired one is fetched, with concurrent requests for the same key
+    waiting on a single upstream fetch. When a fetch fails, the last good
+    CSV is served if it is younger than stale_if_error.
+    """
+
+    def __init__(self, client=None, ttl=FIRMS_CACHE_TTL, stale_ttl=FIRMS_STALE_TTL,
+                 stale_if_error=FIRMS_STALE_IF_ERROR, max_entries=64):
+        self.client = client or firms
+        self.ttl = float(ttl)
+        self.stale_ttl = float(stale_ttl)
+        self.stale_if_error = float(stale_if_error)
+        self.max_entries = max(int(max_entries), 1)
+        # key -> (csv text, monotonic time fetched)
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._hits = self._stale_hits = self._misses = self._coalesced = 0
+        self._refreshes = self._errors = self._stale_on_error = 0
+
+    def _store(self, key, text):
+        self._entries[key] = (text, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _fetch_into(self, key):
+        try:
+            text = await self.client.area_csv(*key)
+            self._store(key, text)
+            return text
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    def _fetch(self, key):
+        """
+        The in-flight fetch for key, started if there is none on this loop.
+        """
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            return task, False
+        task = self._inflight[key] = asyncio.ensure_future(self._fetch_into(key))
+        return task, True
+
+    def peek(self, sensor, bbox, days):
+        """
+        The stored CSV for the key if it may still be served without a fetch, else None.
+        """
+        entry = self._entries.get((sensor, bbox, days))
+        if entry is not None and time.monotonic() - entry[1] < self.ttl + self.stale_ttl:
+            return entry[0]
+        return None
+
+    async def area_csv(self, sensor, bbox, days):
+        """
+        (csv text, how it was served): "hit", "stale", "miss", "coalesced"
+        or "stale-error". Raises FirmsError when FIRMS fails and nothing
+        recent enough is stored.
+        """
+        key = (sensor, bbox, days)
+        entry = self._entries.get(key)
+        age = None if entry is None else time.monotonic() - entry[1]
+        if age is not None and age < self.ttl:
+            self._hits += 1
+            return entry[0], "hit"
+        if age is not None and age < self.ttl + self.stale_ttl:
+            self._stale_hits += 1
+            task, started = self._fetch(key)
+            if started:
+                self._refreshes += 1
+                task.add_done_callback(self._refreshed)
+            return entry[0], "stale"
+
+        task, started = self._fetch(key)
+        if started:
+            self._misses += 1
+        else:
+            self._coalesced += 1
+        try:
+            # A waiter going away doesn't cancel the fetch the others wait on
+            return await asyncio.shield(task), "miss" if started else "coalesced"
+        except FirmsError:
+            self._errors += 1
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] >= self.stale_if_error:
+                raise
+            self._stale_on_error += 1
+            return entry[0], "stale-error"
+
+    def _refreshed(self, task):
+        # Nobody awaits a background refresh; a failure just leaves the old entry
+        if not task.cancelled() and task.exception() is not None:
+            self._errors += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self._hits + self._stale_hits + self._misses + self._coalesced
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "stale_ttl_seconds": self.stale_ttl,
+            "stale_if_error_seconds": self.stale_if_error,
+            "hits": self._hits,
+            "stale_hits": self._stale_hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "hit_rate": (self._hits + self._stale_hits) / lookups if lookups else 0.0,
+            "refreshes": self._refreshes,
+            "in_flight": len(self._inflight),
+            "errors": self._errors,
+            "served_stale_on_error": self._stale_on_error,
+            "upstream": self.client.stats(),
+        }
+
+
+firms_cache = FirmsCache()
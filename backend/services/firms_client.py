@@ -0,0 +1,162 @@
+import asyncio
+import os
+import random
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FIRMS_BASE_URL = os.getenv("FIRMS_BASE_URL", "https://firms.modaps.eosdis.nasa.gov")
+FIRMS_MAP_KEY = os.getenv("FIRMS_MAP_KEY", "afb7fe414fb31747d4bc922176e7f96d")
+CONNECT_TIMEOUT = float(os.getenv("FIRMS_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("FIRMS_READ_TIMEOUT", "30"))
+# Upstream requests in flight at once; the rest wait up to POOL_TIMEOUT for a connection
+MAX_CONNECTIONS = int(os.getenv("FIRMS_MAX_CONNECTIONS", "8"))
+POOL_TIMEOUT = float(os.getenv("FIRMS_POOL_TIMEOUT", "10"))
+RETRIES = int(os.getenv("FIRMS_RETRIES", "2"))
+BACKOFF = float(os.getenv("FIRMS_BACKOFF", "0.5"))
+MAX_BACKOFF = 8.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class FirmsError(Exception):
+    """
+    FIRMS couldn't be reached or answered with an error. status_code is
+    what the API should answer with; details is FIRMS's own message, if any.
+    """
+
+    def __init__(self, status_code, message, details=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.details = details
+
+    def content(self):
+        content = {"error": self.message}
+        if self.details is not None:
+            content["details"] = self.details
+        return content
+
+
+def _discard(client, loop):
+    """
+    Close a client whose connections were opened on another loop. They can
+    only be closed on that loop, and only while it runs; otherwise the
+    client is just dropped and its transports are closed as they are freed.
+    """
+    if loop.is_running():
+        try:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        except RuntimeError:
+            pass
+
+
+class FirmsClient:
+    """
+    Async client for the FIRMS area API. Connections are pooled and kept
+    alive across requests, at most max_connections at a time; timeouts,
+    connection errors and 429/5xx answers are retried with jittered
+    exponential backoff. transport replaces the network (for tests).
+    """
+
+    def __init__(self, base_url=None, map_key=None, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 max_connections=MAX_CONNECTIONS, pool_timeout=POOL_TIMEOUT, retries=RETRIES, backoff=BACKOFF,
+                 transport=None):
+        self.base_url = (base_url or FIRMS_BASE_URL).rstrip("/")
+        self.map_key = map_key or FIRMS_MAP_KEY
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout, pool=pool_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.retries = retries
+        self.backoff = backoff
+        self.transport = transport
+        self._client = None
+        self._loop = None
+        self.requests = 0
+        self.retried = 0
+
+    def _http(self):
+        # Pooled connections belong to the event loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._loop is not loop:
+            _discard(self._client, self._loop)
+            self._client = None
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits,
+                                             transport=self.transport)
+            self._loop = loop
+        return self._client
+
+    def area_path(self, sensor, bbox, days):
+        return f"/api/area/csv/{self.map_key}/{sensor}/{bbox}/{days}"
+
+    def _delay(self, attempt):
+        return random.uniform(0, min(MAX_BACKOFF, self.backoff * 2 ** attempt))
+
+    async def _send(self, path, stream):
+        """
+        A 200 response for path, retried as needed. A streamed response
+        must be closed by the caller.
+        """
+        client = self._http()
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            self.requests += 1
+            try:
+                response = await client.send(client.build_request("GET", path), stream=stream)
+            except httpx.TimeoutException:
+                if last:
+                    raise FirmsError(504, "Request to NASA FIRMS API timed out")
+            except httpx.TransportError as e:
+                if last:
+                    raise FirmsError(502, "Failed to fetch fire data", str(e))
+            else:
+                if response.status_code == 200:
+                    return response
+                if response.status_code not in RETRY_STATUSES or last:
+                    details = (await response.aread()).decode(response.encoding or "utf-8", "replace")
+                    await response.aclose()
+                    raise FirmsError(response.status_code, f"FIRMS API returned status {response.status_code}",
+                                     details)
+                await response.aclose()
+            self.retried += 1
+            await asyncio.sleep(self._delay(attempt))
+
+    async def area_csv(self, sensor, bbox, days):
+        """
+        The area API's CSV for sensor over bbox ("west,south,east,north")
+        for the last days days.
+        """
+        response = await self._send(self.area_path(sensor, bbox, days), stream=False)
+        return response.text
+
+    async def area_lines(self, sensor, bbox, days):
+        """
+        An async iterator over the CSV's lines as FIRMS sends them. The
+        request is made (and retried) here, so errors raise before the
+        first line; the iterator closes the response once exhausted or closed.
+        """
+        response = await self._send(self.area_path(sensor, bbox, days), stream=True)
+
+        async def lines():
+            try:
+                async for line in response.aiter_lines():
+                    yield line
+            finally:
+                await response.aclose()
+        return lines()
+
+    async def aclose(self):
+        if self._client is not None:
+            client, self._client = self._client, None
+            if self._loop is asyncio.get_running_loop():
+                await client.aclose()
+            else:
+                _discard(client, self._loop)
+
+    def stats(self):
+        return {"base_url": self.base_url, "requests": self.requests, "retried": self.retried,
+                "max_connections": self.limits.max_connections, "retries": self.retries}
+
+
+firms = FirmsClient()
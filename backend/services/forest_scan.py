@@ -0,0 +1,114 @@
+import os
+import threading
+
+import numpy as np
+
+from utils.columnar import iter_column_chunks, read_columns
+from utils.hashing import file_sha256
+from utils.http_cache import CachedBody, make_etag
+from utils.streaming import CHUNK_RECORDS, frame_lines
+from utils.wire import FORMATS, encode_frame
+
+SCAN_FEATURES = ["temperature", "humidity", "rainfall", "wind_speed"]
+SCAN_COLUMNS = ["forest_name", "district", "latitude", "longitude"]
+# Rows scored per predict call, so memory stays flat on very large datasets
+CHUNK_ROWS = 200_000
+
+
+def score_forests(df, nb):
+    """
+    Naive Bayes risk class for every row of the forest dataset.
+    """
+    X = df[SCAN_FEATURES]
+    if len(X) == 0:
+        return np.empty(0, dtype=nb.model.classes_.dtype)
+    return np.concatenate([nb.model.predict(nb.scaler.transform(X.iloc[i:i + CHUNK_ROWS]))
+                           for i in range(0, len(X), CHUNK_ROWS)])
+
+
+def scan_frame(df, nb):
+    out = df[SCAN_COLUMNS].copy()
+    out["predicted_risk"] = score_forests(df, nb)
+    return out
+
+
+def render_scan(frame):
+    """
+    The records JSON for a scan frame, byte for byte what JSONResponse
+    produces for frame.to_dict(orient="records").
+    """
+    return ("[" + ",".join(frame_lines(frame)) + "]").encode("utf-8")
+
+
+def iter_scan_frames(dataset_path, nb, chunk_rows=CHUNK_RECORDS):
+    """
+    Scan results chunk by chunk, reading and scoring only chunk_rows rows
+    of the dataset at a time.
+    """
+    for chunk in iter_column_chunks(dataset_path, SCAN_COLUMNS + SCAN_FEATURES, chunk_rows):
+        yield scan_frame(chunk, nb)
+
+
+class ScanResult:
+    def __init__(self, frame, body, etag, dataset_sha256, model_version):
+        self.frame = frame
+        self.body = body
+        self.etag = etag
+        self.n_rows = len(frame)
+        self.dataset_sha256 = dataset_sha256
+        self.model_version = model_version
+        self._bodies = {"json": CachedBody(body, FORMATS["json"], etag)}
+
+    def cached(self, fmt="json"):
+        """
+        The response body in a wire format, encoded on first request.
+        """
+        if fmt not in self._bodies:
+            self._bodies[fmt] = CachedBody(encode_frame(self.frame, fmt), FORMATS[fmt], self.etag[:-1] + f'-{fmt}"')
+        return self._bodies[fmt]
+
+
+class ForestScanCache:
+    """
+    The /scan-forests response, computed once and kept as ready-to-send JSON
+    bytes. It is rebuilt only when the dataset's content or the Naive Bayes
+    model version changes; a touched but unchanged file only costs a hash.
+    """
+
+    def __init__(self, dataset_path):
+        self.dataset_path = dataset_path
+        self._result = None
+        self._stat = None
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def _current(self, stat, model_version):
+        result = self._result
+        if result is None or result.model_version != model_version:
+            return None
+        if self._stat == stat:
+            return result
+        if file_sha256(self.dataset_path) == result.dataset_sha256:
+            self._stat = stat
+            return result
+        return None
+
+    def get(self, nb):
+        st = os.stat(self.dataset_path)
+        stat = (st.st_mtime_ns, st.st_size)
+        result = self._current(stat, nb.version)
+        if result is not None:
+            return result
+        with self._lock:
+            result = self._current(stat, nb.version)
+            if result is not None:
+                return result
+            dataset_sha256 = file_sha256(self.dataset_path)
+            df = read_columns(self.dataset_path, SCAN_COLUMNS + SCAN_FEATURES)
+            frame = scan_frame(df, nb)
+            body = render_scan(frame)
+            self._result = ScanResult(frame, body, make_etag(body), dataset_sha256, nb.version)
+            self._stat = stat
+            self.builds += 1
+            return self._result
+
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class InferenceBatcher:
+    """
+    Collects rows submitted from concurrent requests and scores them together.
+
+    The worker thread takes the first waiting row, keeps collecting for up to
+    window_ms (or until max_rows are queued), then calls score_fn(X, context)
+    once per distinct context on the stacked matrix and hands each caller its
+    own row of the result. The context is whatever the caller scored with
+    (e.g. the model version it picked up), so rows are never scored by a
+    model other than their own.
+    """
+
+    def __init__(self, score_fn, window_ms=2.0, max_rows=256):
+        self.score_fn = score_fn
+        self.window = max(float(window_ms), 0.0) / 1000.0
+        self.max_rows = max(int(max_rows), 1)
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._requests = 0
+        self._batches = 0
+        self._rows = 0
+        self._errors = 0
+        self._max_queue_depth = 0
+        self._max_batch_size = 0
+        self._last_batch_size = 0
+        self._batch_sizes = {}
+        self._wait_seconds = 0.0
+        self._score_seconds = 0.0
+
+    # ---------------- CALLER SIDE ---------------- #
+    def submit(self, row, context=None):
+        """
+        Queue one feature row; returns a Future resolving to score_fn's output for it.
+        """
+        future = Future()
+        with self._cond:
+            self._ensure_worker()
+            self._queue.append((np.asarray(row, dtype=np.float64), context, future, time.perf_counter()))
+            depth = len(self._queue)
+            self._cond.notify()
+        with self._stats_lock:
+            self._requests += 1
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+        return future
+
+    def predict(self, row, context=None, timeout=None):
+        return self.submit(row, context).result(timeout)
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+            self._thread.start()
+
+    # ---------------- WORKER SIDE ---------------- #
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = time.perf_counter() + self.window
+            while len(self._queue) < self.max_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            take = min(len(self._queue), self.max_rows)
+            return [self._queue.popleft() for _ in range(take)]
+
+    def _score_group(self, group):
+        try:
+            results = self.score_fn(np.vstack([item[0] for item in group]), group[0][1])
+        except Exception as e:
+            with self._stats_lock:
+                self._errors += 1
+            for item in group:
+                item[2].set_exception(e)
+            return
+        for item, result in zip(group, results):
+            item[2].set_result(result)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            groups = {}
+            for item in batch:
+                groups.setdefault(id(item[1]), []).append(item)
+            for group in groups.values():
+                self._score_group(group)
+            finished = time.perf_counter()
+
+            size = len(batch)
+            with self._stats_lock:
+                self._batches += 1
+                self._rows += size
+                self._last_batch_size = size
+                self._max_batch_size = max(self._max_batch_size, size)
+                self._batch_sizes[size] = self._batch_sizes.get(size, 0) + 1
+                self._wait_seconds += sum(started - item[3] for item in batch)
+                self._score_seconds += finished - started
+
+    # ---------------- METRICS ---------------- #
+    def queue_depth(self):
+        with self._cond:
+            return len(self._queue)
+
+    def stats(self):
+        with self._stats_lock:
+            batches = self._batches
+            return {
+                "window_ms": self.window * 1000.0,
+                "max_rows": self.max_rows,
+                "queue_depth": self.queue_depth(),
+                "max_queue_depth": self._max_queue_depth,
+                "requests": self._requests,
+                "batches": batches,
+                "rows": self._rows,
+                "errors": self._errors,
+                "last_batch_size": self._last_batch_size,
+                "max_batch_size": self._max_batch_size,
+                "mean_batch_size": self._rows / batches if batches else 0.0,
+                "batch_size_counts": dict(sorted(self._batch_sizes.items())),
+                "mean_queue_wait_ms": 1000.0 * self._wait_seconds / self._rows if self._rows else 0.0,
+                "mean_score_ms": 1000.0 * self._score_seconds / batches if batches else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._reset_stats()
@@ -1,14 +1,286 @@
+import datetime
+import hashlib
+import os
+import threading
 
-import joblib, os
-from functools import lru_cache
+import joblib
+import numpy as np
+
+from custom_rf import RandomForest, load_forest, read_forest_header
+from services.fast_predict import FusedForest, FusedGaussianNB
+from utils.hashing import file_sha256
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-MODEL_STORE = os.path.join(BASE_DIR, "models_store")
+MODEL_DIR = os.getenv("MODEL_DIR") or os.path.join(BASE_DIR, "model")
+
+# Feature order each model was trained on
+RF_FEATURES = ['latitude', 'longitude', 'temperature', 'humidity',
+               'wind_speed', 'precipitation', 'elevation', 'vpd']
+NB_FEATURES = ['temperature', 'humidity', 'rainfall', 'wind_speed']
+
+
+class ModelUnavailable(RuntimeError):
+    pass
+
+
+class LoadedModel:
+    """
+    One loaded version of a model and everything scored with it. Never
+    mutated after loading: a reload builds a new LoadedModel and swaps the
+    registry's reference, so a request holding this one keeps using it.
+    """
+    def __init__(self, name, version, files, features, model, scaler, fused):
+        self.name = name
+        self.version = version
+        self.files = files
+        self.features = features
+        self.model = model
+        self.scaler = scaler
+        self.fused = fused
+        self.loaded_at = datetime.datetime.utcnow()
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "loaded_at": self.loaded_at.isoformat() + "Z",
+            "features": self.features,
+            "files": self.files,
+        }
+
+
+# ---------------- FILES ---------------- #
+def _file_signature(path):
+    st = os.stat(path)
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+def _rf_paths(model_dir):
+    # The flat model file wins over the pickle once it has been converted;
+    # a delta file also depends on every file under it
+    rff = os.path.join(model_dir, "random_forest_final_model.rff")
+    paths = []
+    if os.path.exists(rff):
+        path = rff
+        while path is not None:
+            paths.append(path)
+            base = read_forest_header(path).get("base")
+            path = os.path.join(os.path.dirname(path), base) if base else None
+    else:
+        paths.append(os.path.join(model_dir, "random_forest_final_model.pkl"))
+    return paths + [os.path.join(model_dir, "scaler.pkl")]
+
+
+def _nb_paths(model_dir):
+    return [os.path.join(model_dir, "naive_bayes.pkl"), os.path.join(model_dir, "naive_bayes_scaler.pkl")]
+
+
+# ---------------- SCHEMA CHECKS ---------------- #
+def _check_scaler(name, scaler, features):
+    n = getattr(scaler, "n_features_in_", len(features))
+    if n != len(features):
+        raise ValueError(f"{name}: scaler expects {n} features, model uses {len(features)}")
+    names = getattr(scaler, "feature_names_in_", None)
+    if names is not None and list(names) != features:
+        raise ValueError(f"{name}: scaler was fitted on {list(names)}, expected {features}")
+
+
+def _load_rf(paths, compile_code):
+    *forest_paths, scaler_path = paths
+    forest_path = forest_paths[0]
+    forest = load_forest(forest_path) if forest_path.endswith(".rff") else joblib.load(forest_path)
+    if isinstance(forest, RandomForest):
+        forest = forest.flatten()
+    scaler = joblib.load(scaler_path)
+
+    _check_scaler("random forest", scaler, RF_FEATURES)
+    if forest.feature_names and list(forest.feature_names) != RF_FEATURES:
+        raise ValueError(f"random forest: trained on {forest.feature_names}, expected {RF_FEATURES}")
+    if len(forest.feature) and int(np.max(forest.feature)) >= len(RF_FEATURES):
+        raise ValueError("random forest: splits on a feature index beyond the feature list")
+    if forest.scaler_mean is not None and not (
+        np.allclose(forest.scaler_mean, scaler.mean_) and np.allclose(forest.scaler_scale, scaler.scale_)
+    ):
+        raise ValueError("random forest: scaler.pkl differs from the scaler saved with the model")
+
+    fused = FusedForest(forest, scaler, n_features=len(RF_FEATURES))
+    if compile_code:
+        try:
+            fused.compile()
+        except Exception as e:
+            print(f"[WARN] Could not compile RandomForest, using the interpreted model: {e}")
+    return forest, scaler, fused
+
+
+def _load_nb(paths, compile_code):
+    model_path, scaler_path = paths
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    _check_scaler("naive bayes", scaler, NB_FEATURES)
+    if model.theta_.shape[1] != len(NB_FEATURES):
+        raise ValueError(f"naive bayes: model has {model.theta_.shape[1]} features, expected {len(NB_FEATURES)}")
+    return model, scaler, FusedGaussianNB(model, scaler)
+
+
+# name -> (files to watch, loader, feature list)
+MODEL_SPECS = {
+    "rf": (_rf_paths, _load_rf, RF_FEATURES),
+    "nb": (_nb_paths, _load_nb, NB_FEATURES),
+}
+
+
+# ---------------- REGISTRY ---------------- #
+class ModelRegistry:
+    """
+    Single owner of the model artifacts under model_dir.
+
+    Models load on first use. reload() re-reads any model whose files
+    changed, validates it and only then swaps it in; if loading fails the
+    current version stays. Listeners are called with (name, old, new) after
+    every swap.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, compile_code=None):
+        self.model_dir = model_dir
+        self.compile_code = os.getenv("RF_CODEGEN", "1") != "0" if compile_code is None else compile_code
+        self._models = {}
+        self._signatures = {}
+        self._errors = {}
+        self._listeners = []
+        self._lock = threading.RLock()
+        self._watcher = None
+        self._stop = threading.Event()
+
+    def _paths(self, name):
+        return MODEL_SPECS[name][0](self.model_dir)
+
+    def _signature(self, name):
+        try:
+            return tuple(_file_signature(p) for p in self._paths(name))
+        except (OSError, ValueError) as e:
+            return ("missing", str(e))
+
+    def _load(self, name):
+        paths_fn, loader, features = MODEL_SPECS[name]
+        paths = paths_fn(self.model_dir)
+        signature = tuple(_file_signature(p) for p in paths)
+        hashes = {os.path.basename(p): file_sha256(p) for p in paths}
+        model, scaler, fused = loader(paths, self.compile_code)
+        version = hashlib.sha256("".join(hashes[k] for k in sorted(hashes)).encode()).hexdigest()[:16]
+        files = [{"path": p, "mtime": sig[1] / 1e9, "size": sig[2], "sha256": hashes[os.path.basename(p)]}
+                 for p, sig in zip(paths, signature)]
+        return signature, LoadedModel(name, version, files, features, model, scaler, fused)
+
+    def _swap(self, name, signature, loaded):
+        old = self._models.get(name)
+        self._models[name] = loaded
+        self._signatures[name] = signature
+        self._errors.pop(name, None)
+        if old is None or old.version != loaded.version:
+            for listener in list(self._listeners):
+                try:
+                    listener(name, old, loaded)
+                except Exception as e:
+                    print(f"[WARN] Model swap listener failed: {e}")
+
+    def get(self, name):
+        """
+        Current version of a model, loading it on first use.
+        Raises ModelUnavailable if it can't be loaded.
+        """
+        loaded = self._models.get(name)
+        if loaded is not None:
+            return loaded
+        with self._lock:
+            loaded = self._models.get(name)
+            if loaded is not None:
+                return loaded
+            signature = self._signature(name)
+            failed = self._errors.get(name)
+            # Don't re-read broken files on every request; retry once they change
+            if failed is not None and failed[0] == signature:
+                raise ModelUnavailable(failed[1])
+            try:
+                signature, loaded = self._load(name)
+            except Exception as e:
+                self._errors[name] = (signature, f"Could not load {name} model: {e}")
+                print(f"[ERROR] {self._errors[name][1]}")
+                raise ModelUnavailable(self._errors[name][1]) from e
+            self._swap(name, signature, loaded)
+            return loaded
+
+    def get_or_none(self, name):
+        try:
+            return self.get(name)
+        except ModelUnavailable:
+            return None
+
+    def reload(self, names=None, force=False):
+        """
+        Reload models whose files changed (all of them with force).
+        Returns {name: {"status": "reloaded" | "unchanged" | "failed", ...}}.
+        """
+        report = {}
+        for name in names or MODEL_SPECS:
+            with self._lock:
+                current = self._models.get(name)
+                signature = self._signature(name)
+                failed = self._errors.get(name)
+                if not force and current is not None and self._signatures.get(name) == signature:
+                    report[name] = {"status": "unchanged", "version": current.version}
+                    continue
+                if not force and failed is not None and failed[0] == signature:
+                    report[name] = {"status": "failed", "error": failed[1],
+                                    "version": current.version if current else None}
+                    continue
+                try:
+                    signature, loaded = self._load(name)
+                except Exception as e:
+                    self._errors[name] = (signature, f"Could not load {name} model: {e}")
+                    report[name] = {"status": "failed", "error": self._errors[name][1],
+                                    "version": current.version if current else None}
+                    continue
+                self._swap(name, signature, loaded)
+                report[name] = {"status": "reloaded", "version": loaded.version,
+                                "previous": current.version if current else None}
+        return report
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def status(self):
+        with self._lock:
+            return {
+                name: {
+                    "loaded": name in self._models,
+                    **(self._models[name].describe() if name in self._models else {}),
+                    "error": self._errors[name][1] if name in self._errors else None,
+                }
+                for name in MODEL_SPECS
+            }
+
+    # ---------------- FILE WATCH ---------------- #
+    def start_watching(self, interval=5.0):
+        """
+        Poll the model files every interval seconds and reload what changed.
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+
+        def watch():
+            while not self._stop.wait(interval):
+                loaded = [name for name in MODEL_SPECS if name in self._models]
+                if loaded:
+                    for name, result in self.reload(loaded).items():
+                        if result["status"] != "unchanged":
+                            print(f"[INFO] Model {name}: {result}")
+
+        self._watcher = threading.Thread(target=watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
 
-@lru_cache(maxsize=1)
-def get_rf():
-    return joblib.load(os.path.join(MODEL_STORE, "random_forest_fire.joblib"))
 
-@lru_cache(maxsize=1)
-def get_nb():
-    return joblib.load(os.path.join(MODEL_STORE, "naive_bayes_risk.joblib"))
+registry = ModelRegistry()
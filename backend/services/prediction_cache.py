@@ -0,0 +1,132 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# Step per feature: inputs closer together than this share one cached prediction
+DEFAULT_PRECISION = {
+    "latitude": 0.01,
+    "longitude": 0.01,
+    "temperature": 0.1,
+    "humidity": 1.0,
+    "wind_speed": 0.1,
+    "precipitation": 0.1,
+    "elevation": 1.0,
+}
+
+
+def parse_precision(spec):
+    """
+    "latitude=0.01,temperature=0.1" -> {"latitude": 0.01, "temperature": 0.1}
+    """
+    precision = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        name, _, step = part.partition("=")
+        precision[name.strip()] = float(step)
+    return precision
+
+
+class PredictionCache:
+    """
+    LRU cache of model outputs keyed on inputs quantized to a per-feature step.
+
+    snap() moves an input onto its grid point; callers score the snapped
+    input on a miss, so a hit returns exactly what a miss would have,
+    whichever request filled the entry. Entries expire after ttl seconds
+    (0 keeps them until evicted) and the whole cache is dropped when the
+    model version changes.
+    """
+
+    def __init__(self, fields, precision=None, max_entries=4096, ttl=300.0):
+        self.fields = list(fields)
+        self.precision = dict(DEFAULT_PRECISION if precision is None else precision)
+        self.max_entries = max(int(max_entries), 1)
+        self.ttl = float(ttl)
+        self.model_version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = self._misses = self._evictions = self._expired = self._invalidations = 0
+
+    def _grid(self, name, value):
+        step = self.precision.get(name)
+        value = float(value)
+        if not step or not math.isfinite(value):
+            return value, None
+        index = math.floor(value / step + 0.5)
+        return index * step, index
+
+    def key(self, values):
+        return tuple(
+            index if index is not None else snapped
+            for snapped, index in (self._grid(name, values[name]) for name in self.fields)
+        )
+
+    def snap(self, values):
+        snapped = dict(values)
+        for name in self.fields:
+            snapped[name] = self._grid(name, values[name])[0]
+        return snapped
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            value, expires = entry
+            if expires and expires <= now:
+                del self._entries[key]
+                self._expired += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value, model_version=None):
+        """
+        Store value unless it was computed with a model other than the current one.
+        """
+        expires = time.monotonic() + self.ttl if self.ttl > 0 else 0
+        with self._lock:
+            if model_version is not None and model_version != self.model_version:
+                return
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def set_model_version(self, version):
+        # A different model means every stored prediction is stale
+        with self._lock:
+            if version != self.model_version:
+                if self.model_version is not None:
+                    self._invalidations += 1
+                self._entries.clear()
+                self.model_version = version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expired": self._expired,
+                "invalidations": self._invalidations,
+                "model_version": self.model_version,
+                "precision": self.precision,
+            }
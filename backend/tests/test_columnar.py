@@ -0,0 +1,117 @@
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import columnar
+from utils.columnar import iter_column_chunks, read_columns, sidecar_dir
+
+
+def _csv(path, seed=0, n=50):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        "district": rng.choice(["Chitwan", "Kaski", None], n),
+        "acq_date": rng.choice(["2021-03-01", "2022-04-15"], n),
+        "latitude": rng.uniform(26, 30, n).round(4),
+        "frp": np.where(rng.random(n) < 0.2, np.nan, rng.random(n)),
+        "bright": rng.integers(300, 400, n),
+        "flag": rng.random(n) < 0.5,
+    }).to_csv(path, index=False)
+
+
+def _age(path):
+    # Move the CSV's mtime out of the window where its sidecar isn't trusted
+    os.utime(path, ns=(10**9, 10**9))
+
+
+def test_sidecar_matches_read_csv(tmp_path):
+    path = str(tmp_path / "data.csv")
+    _csv(path)
+    _age(path)
+    expected = pd.read_csv(path)
+
+    pd.testing.assert_frame_equal(read_columns(path), expected)
+    assert os.path.exists(os.path.join(sidecar_dir(path), "current.json"))
+    # Served from the sidecar now, with and without projection
+    pd.testing.assert_frame_equal(read_columns(path), expected)
+    pd.testing.assert_frame_equal(read_columns(path, ["latitude", "district"]),
+                                  pd.read_csv(path, usecols=["latitude", "district"]))
+    pd.testing.assert_frame_equal(pd.concat(list(iter_column_chunks(path, chunk_rows=7))), expected)
+
+    district = read_columns(path, ["district"], categorical=["district"])["district"]
+    assert isinstance(district.dtype, pd.CategoricalDtype)
+    assert district.astype(object).tolist() == expected["district"].astype(object).tolist()
+
+
+def test_sidecar_is_rebuilt_when_the_csv_changes(tmp_path, monkeypatch):
+    path = str(tmp_path / "data.csv")
+    _csv(path)
+    _age(path)
+    read_columns(path)
+
+    writes = []
+    real_write = columnar.write_sidecar
+    monkeypatch.setattr(columnar, "write_sidecar", lambda *a, **k: writes.append(a) or real_write(*a, **k))
+    read_columns(path)
+    assert writes == []
+
+    _csv(path, seed=1, n=80)
+    _age(path)
+    pd.testing.assert_frame_equal(read_columns(path), pd.read_csv(path))
+    assert len(writes) == 1
+    # Only the latest build is kept
+    builds = [e for e in os.listdir(sidecar_dir(path)) if os.path.isdir(os.path.join(sidecar_dir(path), e))]
+    assert len(builds) == 1
+
+
+def test_future_mtime_is_built_once(tmp_path, monkeypatch):
+    path = str(tmp_path / "data.csv")
+    _csv(path)
+    future = time.time_ns() + 3600 * 10**9
+    os.utime(path, ns=(future, future))
+    read_columns(path)
+
+    writes = []
+    real_write = columnar.write_sidecar
+    monkeypatch.setattr(columnar, "write_sidecar", lambda *a, **k: writes.append(a) or real_write(*a, **k))
+    pd.testing.assert_frame_equal(read_columns(path), pd.read_csv(path))
+    assert writes == []
+
+
+def test_falls_back_to_the_csv_when_the_sidecar_cannot_be_written(tmp_path, monkeypatch):
+    path = str(tmp_path / "data.csv")
+    _csv(path)
+    expected = pd.read_csv(path, usecols=["bright", "district"])
+    monkeypatch.setattr(columnar, "sidecar_dir", lambda p: os.path.join(path, "not-a-dir"))
+    parses, writes = [], []
+    real_read, real_write = columnar.pd.read_csv, columnar.write_sidecar
+    monkeypatch.setattr(columnar.pd, "read_csv", lambda *a, **k: parses.append(a) or real_read(*a, **k))
+    monkeypatch.setattr(columnar, "write_sidecar", lambda *a, **k: writes.append(a) or real_write(*a, **k))
+
+    pd.testing.assert_frame_equal(read_columns(path, ["district", "bright"]), expected)
+    # The failed build's parse is served, and the write isn't retried
+    assert len(parses) == 1 and len(writes) == 1
+    pd.testing.assert_frame_equal(read_columns(path, ["district", "bright"]), expected)
+    assert len(parses) == 2 and len(writes) == 1
+
+
+def test_concurrent_writers_in_separate_processes(tmp_path):
+    path = str(tmp_path / "data.csv")
+    _csv(path, n=20000)
+    _age(path)
+    backend = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    script = (
+        "import sys; sys.path.insert(0, sys.argv[1])\n"
+        "from utils.columnar import write_sidecar\n"
+        "failed = sum(write_sidecar(sys.argv[2]) is None for _ in range(5))\n"
+        "sys.exit(failed)\n"
+    )
+    workers = [subprocess.Popen([sys.executable, "-c", script, backend, path]) for _ in range(4)]
+    # No writer deletes a build another is still writing
+    assert [w.wait(60) for w in workers] == [0, 0, 0, 0]
+    pd.testing.assert_frame_equal(read_columns(path), pd.read_csv(path))
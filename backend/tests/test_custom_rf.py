@@ -0,0 +1,245 @@
+# tests/test_custom_rf.py
+
+import sys
+import os
+from collections import Counter
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from custom_rf import (
+    RandomForest, best_split, bin_data, build_tree, compute_bin_edges, gini, most_common_label,
+    FOREST_FORMAT_VERSION, load_forest, predict_tree, read_forest_header, save_forest,
+    save_forest_delta,
+)
+
+
+def _reference_gini(y):
+    counts = Counter(y)
+    return 1 - sum((c / len(y)) ** 2 for c in counts.values())
+
+
+def _reference_best_split(X, y, features):
+    # Brute-force split search the vectorized engine has to agree with
+    best_gain = 0
+    best_feature, best_threshold = None, None
+    current_gini = _reference_gini(y)
+    for feature_idx in features:
+        for t in np.unique(X[:, feature_idx]):
+            left = y[X[:, feature_idx] <= t]
+            right = y[X[:, feature_idx] > t]
+            if len(left) == 0 or len(right) == 0:
+                continue
+            gain = current_gini - (
+                (len(left) / len(y)) * _reference_gini(left) +
+                (len(right) / len(y)) * _reference_gini(right)
+            )
+            if gain > best_gain:
+                best_gain = gain
+                best_feature = feature_idx
+                best_threshold = t
+    return best_feature, best_threshold
+
+
+def _make_data(n=300, n_features=6, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, n_features))
+    # Coarse columns create plenty of tied values and tied gains
+    X[:, 1] = np.round(X[:, 1])
+    X[:, 2] = rng.integers(0, 4, size=n)
+    y = ((X[:, 0] + X[:, 2] + rng.normal(scale=0.8, size=n)) > 1).astype(int)
+    return X, y
+
+
+def test_gini_matches_counter_version():
+    y = np.array([0, 1, 1, 0, 1, 1, 1])
+    assert gini(y) == _reference_gini(y)
+
+
+def test_most_common_label_breaks_ties_by_first_occurrence():
+    y = np.array([1, 0, 0, 1])
+    assert most_common_label(y) == Counter(y).most_common(1)[0][0] == 1
+
+
+def test_best_split_matches_brute_force():
+    for seed in range(5):
+        X, y = _make_data(seed=seed)
+        features = np.arange(X.shape[1])
+        assert best_split(X, y, features) == _reference_best_split(X, y, features)
+        sub = X[:37], y[:37]
+        assert best_split(*sub, features[::-1]) == _reference_best_split(*sub, features[::-1])
+
+
+def test_best_split_without_any_split():
+    X = np.ones((10, 3))
+    y = np.array([0, 1] * 5)
+    assert best_split(X, y, [0, 1, 2]) == (None, None)
+
+
+def test_build_tree_splits_separable_data():
+    X, y = _make_data()
+    np.random.seed(0)
+    tree = build_tree(X, y, max_depth=3)
+    assert not tree.is_leaf()
+    assert tree.feature in range(X.shape[1])
+
+
+def test_flat_forest_matches_recursive_walk():
+    X, y = _make_data(n=400)
+    np.random.seed(3)
+    forest = RandomForest(n_trees=9, max_depth=6)
+    forest.fit(X, y)
+    X_test, _ = _make_data(n=200, seed=9)
+    X_test[::5, 0] = np.nan
+
+    tree_preds = np.array([[predict_tree(x, tree) for tree in forest.trees] for x in X_test])
+    expected_labels = [Counter(row).most_common(1)[0][0] for row in tree_preds]
+    expected_proba = np.array([[np.mean(row == 0), np.mean(row == 1)] for row in tree_preds])
+
+    assert np.array_equal(forest.flatten().apply(X_test), tree_preds)
+    assert forest.predict(X_test) == expected_labels
+    assert np.array_equal(forest.predict_proba(X_test), expected_proba)
+
+
+def _same_forest(a, b):
+    fa, fb = a.flatten(), b.flatten()
+    return all(
+        np.array_equal(getattr(fa, name), getattr(fb, name))
+        for name in ("feature", "threshold", "left", "right", "value", "roots")
+    )
+
+
+def test_fit_is_reproducible_across_worker_counts():
+    X, y = _make_data(n=300)
+    serial = RandomForest(n_trees=6, max_depth=5, random_state=7).fit(X, y)
+    parallel = RandomForest(n_trees=6, max_depth=5, random_state=7, n_jobs=2).fit(X, y)
+    other_seed = RandomForest(n_trees=6, max_depth=5, random_state=8).fit(X, y)
+
+    assert _same_forest(serial, parallel)
+    assert not _same_forest(serial, other_seed)
+
+
+def test_histogram_mode_matches_exact_mode_on_few_distinct_values():
+    X, y = _make_data(n=400)
+    X = np.round(X * 4) / 4  # every column has far fewer than 64 distinct values
+    exact = RandomForest(n_trees=4, max_depth=6, random_state=3).fit(X, y)
+    binned = RandomForest(n_trees=4, max_depth=6, random_state=3, max_bins=64).fit(X, y)
+    assert _same_forest(exact, binned)
+
+
+def test_bin_codes_follow_thresholds():
+    X, _ = _make_data(n=500)
+    edges = compute_bin_edges(X, max_bins=16)
+    codes = bin_data(X, edges)
+    assert codes.dtype == np.uint8 and codes.max() < 16
+    for f, cuts in enumerate(edges):
+        for b, t in enumerate(cuts):
+            assert np.array_equal(codes[f] <= b, X[:, f] <= t)
+
+
+def test_model_file_round_trip(tmp_path):
+    X, y = _make_data(n=300)
+    forest = RandomForest(n_trees=5, max_depth=5, random_state=1).fit(X, y)
+    path = str(tmp_path / "forest.rff")
+    save_forest(path, forest, feature_names=[f"f{i}" for i in range(X.shape[1])],
+                metadata={"note": "test"})
+
+    loaded = load_forest(path)
+    assert isinstance(loaded.threshold, np.memmap)
+    assert loaded.feature_names[0] == "f0" and loaded.metadata == {"note": "test"}
+    assert np.array_equal(loaded.predict_proba(X), forest.predict_proba(X))
+    assert loaded.predict(X) == forest.predict(X)
+    assert read_forest_header(path)["version"] == FOREST_FORMAT_VERSION
+
+
+def test_fit_reports_oob_score_and_feature_importances():
+    X, y = _make_data(n=400)
+    forest = RandomForest(n_trees=15, max_depth=5, random_state=4, oob_score=True).fit(X, y)
+
+    assert forest.oob_decision_function_.shape == (len(y), 2)
+    seen = ~np.isnan(forest.oob_decision_function_[:, 0])
+    assert seen.mean() > 0.9
+    assert np.allclose(forest.oob_decision_function_[seen].sum(axis=1), 1)
+    assert 0.5 < forest.oob_score_ <= 1
+
+    assert np.isclose(forest.feature_importances_.sum(), 1)
+    # The label is driven by columns 0 and 2
+    assert set(np.argsort(forest.feature_importances_)[-2:]) == {0, 2}
+
+
+def test_oob_scoring_is_opt_in():
+    X, y = _make_data(n=200)
+    forest = RandomForest(n_trees=3, max_depth=4, random_state=4).fit(X, y)
+    assert not hasattr(forest, "oob_score_") and forest._flat is None
+
+
+def test_partial_fit_appends_and_retires_trees():
+    X, y = _make_data(n=300)
+    X_new, y_new = _make_data(n=200, seed=5)
+    forest = RandomForest(n_trees=6, max_depth=4, random_state=2, oob_score=True).fit(X, y)
+    first_trees = list(forest.trees)
+
+    forest.partial_fit(X_new, y_new, n_new_trees=3, max_trees=7)
+    assert len(forest.trees) == 7
+    assert forest.trees[:4] == first_trees[2:]
+    assert forest.n_trees_built_ == 9 and forest.flatten().first_tree_id == 2
+    assert forest.oob_decision_function_.shape == (len(y_new), 2)
+
+    # Same seed, same history: same trees
+    again = RandomForest(n_trees=6, max_depth=4, random_state=2).fit(X, y)
+    again.partial_fit(X_new, y_new, n_new_trees=3, max_trees=7)
+    assert _same_forest(forest, again)
+
+
+def test_delta_file_rebuilds_warm_started_forest(tmp_path):
+    X, y = _make_data(n=300)
+    forest = RandomForest(n_trees=5, max_depth=4, random_state=6).fit(X, y)
+    base_path = str(tmp_path / "base.rff")
+    save_forest(base_path, forest, feature_names=["a", "b", "c", "d", "e", "f"])
+
+    forest.partial_fit(*_make_data(n=200, seed=8), n_new_trees=2, max_trees=6)
+    delta_path = str(tmp_path / "day1.rff")
+    save_forest_delta(delta_path, forest, base_path)
+    forest.partial_fit(*_make_data(n=200, seed=9), n_new_trees=2, max_trees=6)
+    delta2_path = str(tmp_path / "day2.rff")
+    save_forest_delta(delta2_path, forest, delta_path)
+
+    assert read_forest_header(delta2_path)["n_trees"] == 2
+    loaded = load_forest(delta2_path)
+    assert loaded.n_trees == 6 and loaded.first_tree_id == 3
+    assert loaded.feature_names[0] == "a"
+    assert np.array_equal(loaded.predict_proba(X), forest.predict_proba(X))
+
+
+def test_delta_file_retiring_the_whole_base(tmp_path):
+    X, y = _make_data(n=300)
+    forest = RandomForest(n_trees=3, max_depth=4, random_state=6).fit(X, y)
+    base_path = str(tmp_path / "base.rff")
+    save_forest(base_path, forest)
+
+    # Trees 0-2 are in the base, 3 is grown and retired, 4-6 remain
+    forest.partial_fit(*_make_data(n=200, seed=8), n_new_trees=4, max_trees=3)
+    delta_path = str(tmp_path / "day1.rff")
+    save_forest_delta(delta_path, forest, base_path)
+
+    loaded = load_forest(delta_path)
+    assert loaded.n_trees == 3 and loaded.first_tree_id == 4
+    assert np.array_equal(loaded.predict_proba(X), forest.predict_proba(X))
+
+
+def test_generated_module_matches_forest(tmp_path):
+    from rf_codegen import compile_forest
+
+    X, y = _make_data(n=300)
+    forest = RandomForest(n_trees=7, max_depth=5, random_state=5).fit(X, y)
+    module = compile_forest(forest, cache_dir=str(tmp_path), n_features=X.shape[1])
+    X_test, _ = _make_data(n=100, seed=11)
+    X_test[::4, 2] = np.nan
+
+    assert np.array_equal(module.predict_proba(X_test), forest.predict_proba(X_test))
+    assert module.predict_proba_row(list(X_test[0])) == list(forest.predict_proba(X_test[:1])[0])
+    # Second call imports the cached file instead of regenerating it
+    assert len(list(tmp_path.glob("rf_*.py"))) == 1
+    compile_forest(forest, cache_dir=str(tmp_path), n_features=X.shape[1])
+    assert len(list(tmp_path.glob("rf_*.py"))) == 1
@@ -0,0 +1,71 @@
+# tests/test_fast_predict.py
+
+import sys
+import os
+
+import numpy as np
+from sklearn.naive_bayes import GaussianNB
+from sklearn.preprocessing import StandardScaler
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from custom_rf import RandomForest
+from services.fast_predict import FusedForest, FusedGaussianNB, fold_thresholds
+
+
+def _data(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([rng.normal(25, 8, n), rng.normal(50, 20, n), rng.exponential(2, n), rng.normal(0, 1e-3, n)])
+    y = ((X[:, 0] > 28) & (X[:, 1] < 55)).astype(int)
+    return X, y
+
+
+def test_fold_thresholds_is_exact():
+    mean = np.array([1811.56, 0.0])
+    scale = np.array([1888.35, 3.0])
+    feature = np.array([0, 0, 1, -1])
+    threshold = np.array([-0.2626652666002426, 0.731, 0.1, np.inf])
+    folded = fold_thresholds(feature, threshold, mean, scale)
+    split = feature >= 0
+    f = feature[split]
+    assert np.all((folded[split] - mean[f]) / scale[f] <= threshold[split])
+    assert np.all((np.nextafter(folded[split], np.inf) - mean[f]) / scale[f] > threshold[split])
+    assert folded[3] == np.inf
+
+
+def test_fused_forest_matches_scaled_forest():
+    X, y = _data()
+    scaler = StandardScaler().fit(X)
+    forest = RandomForest(n_trees=7, max_depth=6, random_state=0).fit(scaler.transform(X), y)
+    fused = FusedForest(forest, scaler)
+
+    rng = np.random.default_rng(1)
+    probe = X + rng.normal(0, 0.5, X.shape)
+    np.testing.assert_array_equal(fused.predict_proba(probe), forest.predict_proba(scaler.transform(probe)))
+    for row, expected in zip(probe[:50], forest.predict_proba(scaler.transform(probe[:50]))):
+        assert fused.predict_proba_one(row) == list(expected)
+
+
+def test_fused_forest_keeps_features_it_never_splits_on(tmp_path):
+    X, y = _data()
+    X[:, 3] = 1.0
+    scaler = StandardScaler().fit(X)
+    forest = RandomForest(n_trees=5, max_depth=5, random_state=0).fit(scaler.transform(X), y).flatten()
+    assert not forest.feature_names and int(np.max(forest.feature)) < 3
+
+    fused = FusedForest(forest, scaler).compile(cache_dir=str(tmp_path))
+    assert fused.n_features == 4
+    for row, expected in zip(X[:20], forest.predict_proba(scaler.transform(X[:20]))):
+        assert fused.predict_proba_one(row) == list(expected)
+
+
+def test_fused_naive_bayes_matches_sklearn():
+    X, y = _data()
+    scaler = StandardScaler().fit(X[:, :3])
+    model = GaussianNB().fit(scaler.transform(X[:, :3]), y)
+    fused = FusedGaussianNB(model, scaler)
+
+    expected = model.predict_proba(scaler.transform(X[:, :3]))
+    np.testing.assert_allclose(fused.predict_proba(X[:, :3]), expected, rtol=1e-9, atol=1e-12)
+    for row, p in zip(X[:50, :3], expected[:50]):
+        np.testing.assert_allclose(fused.predict_proba_one(row), p, rtol=1e-9, atol=1e-12)
@@ -0,0 +1,210 @@
+# tests/test_fire_stats.py
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services import fire_stats
+from services.fire_stats import FireDataCache
+
+
+def _fire_csv(path, n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.to_datetime("2016-01-01") + pd.to_timedelta(rng.integers(0, 2500, n), unit="D")
+    df = pd.DataFrame({
+        "latitude": np.round(rng.uniform(26.3, 30.4, n), 4),
+        "longitude": np.round(rng.uniform(80.1, 88.2, n), 4),
+        "brightness": np.round(rng.normal(320, 10, n), 1),
+        "acq_date": dates.strftime("%Y-%m-%d"),
+        "confidence": rng.choice(["h", "n", "l"], n, p=[0.2, 0.5, 0.3]),
+        "district": rng.choice([f"District {i}" for i in range(30)], n),
+        "province": rng.choice(["Bagmati", "Koshi", "Lumbini"], n),
+        "elevation": rng.uniform(50, 5000, n).round(0),
+    })
+    df.loc[::37, "district"] = None
+    df.to_csv(path, index=False)
+
+
+@pytest.fixture
+def fire_csv(tmp_path, monkeypatch):
+    path = str(tmp_path / "fires.csv")
+    _fire_csv(path)
+    monkeypatch.setattr(fire_stats, "fire_data", FireDataCache([path]))
+    return path
+
+
+def test_stats_match_a_fresh_csv_parse(fire_csv):
+    raw = pd.read_csv(fire_csv)
+    dates = pd.to_datetime(raw["acq_date"], errors="coerce")
+
+    assert fire_stats.get_yearly_fire_counts() == \
+        raw.assign(year=dates.dt.year).groupby("year").size().reset_index(name="count").to_dict(orient="records")
+    assert fire_stats.get_monthly_fire_counts() == \
+        raw.assign(month=dates.dt.month).groupby("month").size().reset_index(name="count").to_dict(orient="records")
+    assert fire_stats.get_confidence_level_counts() == \
+        raw["confidence"].value_counts().reset_index(name="count").to_dict(orient="records")
+    top = raw["district"].fillna("Unknown").value_counts().head(10).reset_index()
+    top.columns = ["district", "count"]
+    assert fire_stats.get_top_districts() == top.to_dict(orient="records")
+
+    sample = raw[["latitude", "longitude", "confidence", "acq_date", "district", "province"]].dropna()
+    sample = sample.sample(n=min(3000, len(sample)), random_state=42)
+    sample["acq_date"] = pd.to_datetime(sample["acq_date"]).dt.strftime("%Y-%m-%d")
+    assert fire_stats.get_geo_sample() == sample.to_dict(orient="records")
+
+    heatmap = fire_stats.get_year_month_matrix()
+    assert sum(map(sum, heatmap["matrix"])) == len(raw)
+
+
+def test_dataset_is_parsed_once_until_the_file_changes(fire_csv):
+    fire_stats.get_yearly_fire_counts()
+    fire_stats.get_monthly_fire_counts()
+    fire_stats.get_top_districts()
+    stats = fire_stats.fire_data.stats()
+    assert stats["loads"] == 1 and stats["hits"] == 2
+    assert stats["dtypes"]["district"] == "category" and stats["dtypes"]["latitude"] == "float32"
+    assert stats["memory_bytes"] > 0 and stats["load_seconds"] is not None
+
+    _fire_csv(fire_csv, n=300, seed=1)
+    os.utime(fire_csv, ns=(10**18, 10**18))
+    assert len(fire_stats.load_fire_data()) == 300
+    assert fire_stats.fire_data.stats()["loads"] == 2
+
+
+def test_cube_answers_elevation_heatmap_and_cross_filters(fire_csv):
+    raw = pd.read_csv(fire_csv)
+    dates = pd.to_datetime(raw["acq_date"], errors="coerce")
+    raw["year"], raw["month"] = dates.dt.year, dates.dt.month
+    labels = ["0-500m", "500-1000m", "1000-2000m", "2000-3000m", "3000-4000m", "4000m+"]
+    raw["elevation_bin"] = pd.cut(raw["elevation"], bins=[0, 500, 1000, 2000, 3000, 4000, 9000],
+                                  labels=labels, include_lowest=True)
+
+    assert fire_stats.get_elevation_fire_counts() == \
+        raw.groupby("elevation_bin").size().reset_index(name="count").to_dict(orient="records")
+
+    heatmap = fire_stats.get_year_month_matrix()
+    pivot = raw.pivot_table(index="year", columns="month", values="acq_date", aggfunc="count", fill_value=0)
+    assert heatmap["years"] == pivot.index.tolist()
+    assert heatmap["matrix"] == pivot.reindex(columns=range(1, 13), fill_value=0).values.tolist()
+
+    # Monthly counts for two districts above 2000 m
+    high = labels[3:]
+    result = fire_stats.get_fire_counts("month", district=["District 3", "District 7"], elevation_bin=high)
+    rows = raw[raw["district"].isin(["District 3", "District 7"]) & raw["elevation_bin"].isin(high)]
+    assert result["counts"] == rows.groupby("month").size().reset_index(name="count").to_dict(orient="records")
+    assert result["total"] == len(rows)
+    assert fire_stats.get_fire_counts("year", year=["2017"], confidence=["h"])["total"] == \
+        int(((raw["year"] == 2017) & (raw["confidence"] == "h")).sum())
+    assert fire_stats.get_fire_counts("district", district=["Nowhere"]) == {"by": "district", "total": 0, "counts": []}
+
+
+def test_fire_counts_route(fire_csv):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    client = TestClient(app)
+    response = client.get("/fires/counts", params={"by": "month", "district": "District 3", "min_elevation": 2000})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["filters"] == {"district": ["District 3"], "elevation_bin": ["2000-3000m", "3000-4000m", "4000m+"]}
+    assert body == {**fire_stats.get_fire_counts("month", district=["District 3"],
+                                                 elevation_bin=["2000-3000m", "3000-4000m", "4000m+"]),
+                    "filters": body["filters"]}
+    assert client.get("/fires/counts", params={"by": "nope"}).status_code == 422
+
+
+def test_filtered_stats_match_masked_rows(fire_csv):
+    raw = pd.read_csv(fire_csv)
+    dates = pd.to_datetime(raw["acq_date"])
+    ranks = raw["confidence"].map({"l": 0, "n": 1, "h": 2})
+    cases = [
+        ({"start": "2018-01-01", "end": "2019-06-30"}, (dates >= "2018-01-01") & (dates <= "2019-06-30")),
+        ({"bbox": "82,27,85.5,29"}, raw["latitude"].between(27, 29) & raw["longitude"].between(82, 85.5)),
+        ({"district": ["District 3", "District 9"], "min_confidence": "n"},
+         raw["district"].isin(["District 3", "District 9"]) & (ranks >= 1)),
+        ({"start": "2017-03-01", "bbox": "80,26,88.2,30.4", "min_confidence": "h"},
+         (dates >= "2017-03-01") & (ranks == 2)),
+        ({"min_confidence": "n"}, ranks >= 1),
+        ({"district": ["Nowhere"]}, raw["district"].isin([])),
+    ]
+    for filters, mask in cases:
+        rows = raw[mask]
+        assert fire_stats.get_monthly_fire_counts(**filters) == rows.assign(month=dates[mask].dt.month) \
+            .groupby("month").size().reset_index(name="count").to_dict(orient="records"), filters
+        top = rows["district"].fillna("Unknown").value_counts().head(10).reset_index()
+        top.columns = ["district", "count"]
+        assert fire_stats.get_top_districts(**filters) == top.to_dict(orient="records"), filters
+        assert sum(map(sum, fire_stats.get_year_month_matrix(**filters)["matrix"])) == len(rows)
+        sample = rows[["latitude", "longitude", "confidence", "acq_date", "district", "province"]].dropna()
+        assert len(fire_stats.get_geo_sample(**filters)) == len(sample)
+
+    # A confidence-only query starts from the rows at or above the floor
+    index = fire_stats.fire_data.indexed()[2]
+    assert index._confidence_candidates(2.0)[0] == (ranks == 2).sum()
+
+    with pytest.raises(ValueError):
+        fire_stats.get_yearly_fire_counts(bbox="85,27")
+    with pytest.raises(ValueError):
+        fire_stats.get_yearly_fire_counts(min_confidence="extreme")
+
+
+def test_filters_on_stats_routes(fire_csv):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    client = TestClient(app)
+    params = {"start": "2018-01-01", "district": ["District 3", "District 4"], "min_confidence": "n"}
+    expected = fire_stats.get_yearly_fire_counts(start=pd.Timestamp("2018-01-01").date(),
+                                                 district=["District 3", "District 4"], min_confidence="n")
+    assert client.get("/fires/yearly", params=params).json() == expected
+    assert len(client.get("/fires/geo-sample", params={"bbox": "82,27,85,29"}).json()) > 0
+    assert client.get("/fires/heatmap", params={"bbox": "nope"}).status_code == 422
+
+
+def test_fire_tiles_count_every_fire(fire_csv):
+    from services.fire_tiles import MAX_TILE_POINTS, POINTS_ZOOM, mercator
+
+    raw = pd.read_csv(fire_csv)
+    world = fire_stats.get_fire_tile(0, 0, 0)
+    assert world["mode"] == "cells" and world["count"] == len(raw)
+    assert sum(c["count"] for c in world["cells"]) == len(raw)
+
+    # Every fire lands in exactly one tile per zoom
+    mx, my = mercator(raw["latitude"].astype(np.float32), raw["longitude"].astype(np.float32))
+    for z in (4, 7, POINTS_ZOOM, 14):
+        tiles = pd.Series(list(zip((mx * 2 ** z).astype(int), (my * 2 ** z).astype(int)))).value_counts()
+        (x, y), n = next(iter(tiles.items()))
+        tile = fire_stats.get_fire_tile(z, int(x), int(y))
+        assert tile["count"] == n
+        if z >= POINTS_ZOOM:
+            assert tile["mode"] == "points" and len(tile["points"]) == min(n, MAX_TILE_POINTS)
+            west, south, east, north = tile["bounds"]
+            assert all(south <= p["latitude"] <= north and west <= p["longitude"] <= east for p in tile["points"])
+        else:
+            assert tile["mode"] == "cells" and sum(c["count"] for c in tile["cells"]) == n
+
+    with pytest.raises(ValueError):
+        fire_stats.get_fire_tile(3, 8, 0)
+
+
+def test_stats_routes_are_conditional_and_follow_the_dataset(fire_csv):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    client = TestClient(app)
+    first = client.get("/fires/heatmap")
+    assert first.status_code == 200 and "stale-while-revalidate" in first.headers["cache-control"]
+    assert first.json() == fire_stats.get_year_month_matrix()
+    again = client.get("/fires/heatmap", headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304 and again.headers["etag"] == first.headers["etag"]
+    # Each query is its own entry
+    assert client.get("/fires/heatmap", params={"district": "District 3"}).headers["etag"] != first.headers["etag"]
+
+    _fire_csv(fire_csv, seed=1, n=200)
+    changed = client.get("/fires/heatmap", headers={"If-None-Match": first.headers["etag"]})
+    assert changed.status_code == 200 and changed.json() == fire_stats.get_year_month_matrix()
@@ -0,0 +1,100 @@
+# tests/test_firms_cache.py
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services import firms_cache as firms_cache_module
+from services.firms_cache import FirmsCache
+from services.firms_client import FirmsError
+
+KEY = ("VIIRS_SNPP_NRT", "80,26,88.2,30.4", 1)
+
+
+class FakeFirms:
+    """
+    Upstream stand-in: each fetch waits for release, then returns the next
+    CSV version or raises once failing is set.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.failing = False
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def area_csv(self, sensor, bbox, days):
+        self.calls += 1
+        await self.release.wait()
+        if self.failing:
+            raise FirmsError(503, "FIRMS API returned status 503")
+        return f"csv v{self.calls}"
+
+    def stats(self):
+        return {"requests": self.calls}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(firms_cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_concurrent_misses_share_one_fetch():
+    async def run():
+        upstream = FakeFirms()
+        cache = FirmsCache(upstream, ttl=60)
+        upstream.release.clear()
+        waiting = [asyncio.ensure_future(cache.area_csv(*KEY)) for _ in range(20)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        results = await asyncio.gather(*waiting)
+        return upstream, cache, results, await cache.area_csv(*KEY)
+
+    upstream, cache, results, again = asyncio.run(run())
+    assert upstream.calls == 1
+    assert {text for text, _ in results} == {"csv v1"}
+    assert sorted(served for _, served in results) == ["coalesced"] * 19 + ["miss"]
+    assert again == ("csv v1", "hit")
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["hits"], stats["in_flight"]) == (1, 19, 1, 0)
+
+
+def test_stale_entries_are_served_while_refreshing(clock):
+    async def run():
+        upstream = FakeFirms()
+        cache = FirmsCache(upstream, ttl=60, stale_ttl=600)
+        first = await cache.area_csv(*KEY)
+        clock[0] += 61
+        stale = await cache.area_csv(*KEY)
+        await asyncio.sleep(0)
+        return cache, first, stale, await cache.area_csv(*KEY)
+
+    cache, first, stale, refreshed = asyncio.run(run())
+    assert first == ("csv v1", "miss")
+    assert stale == ("csv v1", "stale")
+    assert refreshed == ("csv v2", "hit")
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_last_good_csv_stands_in_when_firms_fails(clock):
+    async def run():
+        upstream = FakeFirms()
+        cache = FirmsCache(upstream, ttl=60, stale_ttl=0, stale_if_error=3600)
+        await cache.area_csv(*KEY)
+        upstream.failing = True
+        clock[0] += 120
+        served = await cache.area_csv(*KEY)
+        clock[0] += 3600
+        with pytest.raises(FirmsError):
+            await cache.area_csv(*KEY)
+        return cache, served
+
+    cache, served = asyncio.run(run())
+    assert served == ("csv v1", "stale-error")
+    assert cache.stats()["served_stale_on_error"] == 1 and cache.stats()["errors"] == 2
@@ -0,0 +1,146 @@
+# tests/test_firms_client.py
+
+import asyncio
+import gc
+import os
+import sys
+import threading
+import time
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.firms_client import FirmsClient, FirmsError
+
+CSV = "latitude,longitude,confidence\n27.1,84.2,h\n28.0,85.0,n\n"
+
+
+class StubFirms(BaseHTTPRequestHandler):
+    """
+    Local FIRMS stand-in: answers each request with the next scripted
+    (status, body, delay), then with the last one.
+    """
+    protocol_version = "HTTP/1.1"
+    script = []
+    paths = []
+    connections = set()
+
+    def do_GET(self):
+        StubFirms.paths.append(self.path)
+        StubFirms.connections.add(self.client_address)
+        status, body, delay = StubFirms.script.pop(0) if len(StubFirms.script) > 1 else StubFirms.script[0]
+        time.sleep(delay)
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    StubFirms.script, StubFirms.paths, StubFirms.connections = [(200, CSV, 0)], [], set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubFirms)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _client(url, **kwargs):
+    return FirmsClient(base_url=url, map_key="KEY", backoff=0, **kwargs)
+
+
+def test_area_csv_reuses_connections(stub):
+    client = _client(stub)
+
+    async def run():
+        texts = [await client.area_csv("MODIS_NRT", "80,26,88.2,30.4", 2) for _ in range(3)]
+        await client.aclose()
+        return texts
+
+    assert asyncio.run(run()) == [CSV] * 3
+    assert StubFirms.paths[0] == "/api/area/csv/KEY/MODIS_NRT/80,26,88.2,30.4/2"
+    assert len(StubFirms.connections) == 1
+
+
+def test_retries_server_errors_but_not_client_errors(stub):
+    client = _client(stub, retries=2)
+    StubFirms.script = [(503, "busy", 0), (502, "busy", 0), (200, CSV, 0)]
+    assert asyncio.run(client.area_csv("MODIS_NRT", "80,26,88.2,30.4", 1)) == CSV
+    assert client.requests == 3 and client.retried == 2
+
+    StubFirms.script = [(400, "Invalid MAP_KEY.", 0)]
+    with pytest.raises(FirmsError) as e:
+        asyncio.run(client.area_csv("MODIS_NRT", "80,26,88.2,30.4", 1))
+    assert e.value.status_code == 400 and e.value.details == "Invalid MAP_KEY."
+    assert client.requests == 4
+
+
+def test_timeouts_and_unreachable_hosts(stub):
+    StubFirms.script = [(200, CSV, 0.5)]
+    client = _client(stub, read_timeout=0.1, retries=1)
+    with pytest.raises(FirmsError) as e:
+        asyncio.run(client.area_csv("MODIS_NRT", "80,26,88.2,30.4", 1))
+    assert e.value.status_code == 504 and client.requests == 2
+
+    with pytest.raises(FirmsError) as e:
+        asyncio.run(_client("http://127.0.0.1:1", retries=0).area_csv("MODIS_NRT", "80,26,88.2,30.4", 1))
+    assert e.value.status_code == 502
+
+
+def test_area_lines_streams_the_csv(stub):
+    client = _client(stub)
+
+    async def run():
+        return [line async for line in await client.area_lines("VIIRS_SNPP_NRT", "80,26,88.2,30.4", 1)]
+
+    assert asyncio.run(run()) == CSV.splitlines()
+
+
+def test_client_of_a_previous_loop_is_closed(stub):
+    client = _client(stub)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        asyncio.run_coroutine_threadsafe(client.area_csv("MODIS_NRT", "80,26,88.2,30.4", 1), loop).result(5)
+        first = client._client
+
+        async def run():
+            text = await client.area_csv("MODIS_NRT", "80,26,88.2,30.4", 1)
+            await client.aclose()
+            return text
+
+        assert asyncio.run(run()) == CSV
+        # Closed on its own loop rather than left holding its connections
+        for _ in range(50):
+            if first.is_closed:
+                break
+            time.sleep(0.01)
+        assert first.is_closed
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.close()
+
+
+def test_client_of_a_stopped_loop_is_dropped(stub):
+    client = _client(stub)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(client.area_csv("MODIS_NRT", "80,26,88.2,30.4", 1))
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        assert asyncio.run(client.area_csv("MODIS_NRT", "80,26,88.2,30.4", 1)) == CSV
+        # Nothing was left queued on the stopped loop to never run
+        loop.close()
+        gc.collect()
+    assert not [w for w in caught if "never awaited" in str(w.message)]
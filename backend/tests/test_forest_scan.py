@@ -0,0 +1,59 @@
+# tests/test_forest_scan.py
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse
+from sklearn.naive_bayes import GaussianNB
+from sklearn.preprocessing import StandardScaler
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.fast_predict import FusedGaussianNB
+from services.forest_scan import ForestScanCache, SCAN_COLUMNS, SCAN_FEATURES
+from services.model_registry import LoadedModel
+
+
+def _nb(version, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(100, 4)), columns=SCAN_FEATURES)
+    scaler = StandardScaler().fit(X)
+    model = GaussianNB().fit(scaler.transform(X), (X["humidity"] < 0).astype(int))
+    return LoadedModel("nb", version, [], SCAN_FEATURES, model, scaler, FusedGaussianNB(model, scaler))
+
+
+def _dataset(path, n=20, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "forest_name": [f"Forest \"{i}\" é" for i in range(n)],
+        "district": rng.choice(["Chitwan", "Kaski", "Dolpa"], n),
+        "latitude": rng.uniform(26, 30, n),
+        "longitude": rng.uniform(80, 88, n),
+        **{f: rng.normal(size=n) for f in SCAN_FEATURES},
+    })
+    df.to_csv(path, index=False)
+
+
+def test_scan_matches_dataframe_response_and_is_cached(tmp_path):
+    path = str(tmp_path / "forests.csv")
+    _dataset(path)
+    cache = ForestScanCache(path)
+    nb = _nb("v1")
+
+    result = cache.get(nb)
+    df = pd.read_csv(path)
+    df["predicted_risk"] = nb.model.predict(nb.scaler.transform(df[SCAN_FEATURES]))
+    expected = JSONResponse(content=df[SCAN_COLUMNS + ["predicted_risk"]].to_dict(orient="records")).body
+    assert result.body == expected
+
+    # Touching the file without changing it, or asking again, doesn't rebuild
+    os.utime(path, ns=(1, 1))
+    assert cache.get(nb) is result and cache.builds == 1
+
+    # New data or a new model does
+    _dataset(path, seed=1)
+    assert cache.get(nb).etag != result.etag and cache.builds == 2
+    cache.get(_nb("v2", seed=3))
+    assert cache.builds == 3
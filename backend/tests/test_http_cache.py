@@ -0,0 +1,70 @@
+import gzip
+import os
+import sys
+
+from starlette.requests import Request
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import http_cache
+from utils.http_cache import CachedBody, ResponseCache, accepted_encoding, cached_response, etag_matches
+
+
+def _request(**headers):
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"",
+                    "headers": [(k.replace("_", "-").lower().encode(), v.encode()) for k, v in headers.items()]})
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abd"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+def test_accepted_encoding():
+    assert accepted_encoding("gzip, deflate") == "gzip"
+    assert accepted_encoding("gzip;q=0, deflate") is None
+    assert accepted_encoding("*") == "gzip"
+    assert accepted_encoding(None) is None
+    assert accepted_encoding("br, gzip") == ("br" if http_cache.brotli is not None else "gzip")
+
+
+def test_cached_response_compresses_and_answers_304():
+    cached = CachedBody(b'{"values":[' + b"1," * 2000 + b'1]}')
+    plain = cached_response(_request(), cached, "public, max-age=60")
+    assert plain.body == cached.body and "content-encoding" not in plain.headers
+    assert plain.headers["etag"] == cached.etag and plain.headers["cache-control"] == "public, max-age=60"
+
+    zipped = cached_response(_request(accept_encoding="gzip"), cached, "public, max-age=60", vary="Accept")
+    assert zipped.headers["content-encoding"] == "gzip" and gzip.decompress(zipped.body) == cached.body
+    assert zipped.headers["etag"] != cached.etag and zipped.headers["vary"] == "Accept, Accept-Encoding"
+    # Compressed once, then reused
+    assert cached.encoded("gzip") is cached.encoded("gzip")
+
+    for tag in (cached.etag, zipped.headers["etag"], "W/" + cached.etag):
+        response = cached_response(_request(if_none_match=tag), cached, "public, max-age=60")
+        assert response.status_code == 304 and response.body == b""
+
+    small = CachedBody(b"[]")
+    assert "content-encoding" not in cached_response(_request(accept_encoding="gzip"), small, "no-cache").headers
+
+
+def test_response_cache_versions_ttl_and_size(monkeypatch):
+    cache = ResponseCache(ttl=10, max_entries=2)
+    cached = cache.put("a", 1, b"one")
+    assert cache.get("a", 1) is cached
+    assert cache.get("a", 2) is None
+
+    now = [http_cache.time.monotonic()]
+    monkeypatch.setattr(http_cache.time, "monotonic", lambda: now[0])
+    cache.put("a", 1, b"one")
+    now[0] += 11
+    assert cache.get("a", 1) is None
+
+    cache.put("b", 1, b"two")
+    cache.put("c", 1, b"three")
+    cache.put("d", 1, b"four")
+    assert cache.get("b", 1) is None and cache.get("d", 1) is not None
+    assert cache.stats()["entries"] == 2
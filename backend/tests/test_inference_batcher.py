@@ -0,0 +1,64 @@
+import os
+import sys
+import threading
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.inference_batcher import InferenceBatcher
+
+
+def test_concurrent_rows_are_scored_together():
+    calls = []
+
+    def score(X, context):
+        calls.append(len(X))
+        return X.sum(axis=1)
+
+    batcher = InferenceBatcher(score, window_ms=50, max_rows=8)
+    results = [None] * 8
+    start = threading.Barrier(8)
+
+    def worker(i):
+        start.wait()
+        results[i] = batcher.predict([i, 1.0], timeout=5)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == [i + 1.0 for i in range(8)]
+    assert sum(calls) == 8 and len(calls) < 8
+    stats = batcher.stats()
+    assert stats["rows"] == 8 and stats["batches"] == len(calls)
+    assert stats["max_batch_size"] == max(calls) and stats["queue_depth"] == 0
+
+
+def test_scoring_errors_reach_every_caller():
+    def score(X, context):
+        raise ValueError("bad input")
+
+    batcher = InferenceBatcher(score, window_ms=0)
+    future = batcher.submit(np.zeros(3))
+    try:
+        future.result(timeout=5)
+        assert False, "expected the scoring error"
+    except ValueError as e:
+        assert "bad input" in str(e)
+    assert batcher.stats()["errors"] == 1
+
+
+def test_rows_are_scored_with_their_own_context():
+    seen = []
+
+    def score(X, context):
+        seen.append((context, len(X)))
+        return X[:, 0] * context
+
+    batcher = InferenceBatcher(score, window_ms=50, max_rows=4)
+    futures = [batcher.submit([1.0], context=c) for c in (10, 20, 10, 20)]
+    assert [f.result(timeout=5) for f in futures] == [10.0, 20.0, 10.0, 20.0]
+    assert sorted(seen) == [(10, 2), (20, 2)]
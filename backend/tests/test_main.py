@@ -4,23 +4,76 @@ from fastapi.testclient import TestClient
 import sys
 import os
 
+import numpy as np
+
 # Ensure the backend folder is in the path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from backend.main import app  # Now this works
+from backend.main import app, compute_vpd  # Now this works
 
 client = TestClient(app)
 
 def test_health_endpoint():
-    response = client.get("/health")
+    response = client.get("/")
     assert response.status_code == 200
-    assert response.json()["status"] == "API is running!"
+    assert response.json()["message"] == "API is running!"
 
 def test_predict_fire():
-    response = client.get("/predict-fire", params={
-        "lat": 27.5,
-        "lon": 84.3,
-        "date": "2025-07-01"
+    response = client.post("/predict-manual", json={
+        "latitude": 27.5,
+        "longitude": 84.3,
+        "temperature": 32.0,
+        "humidity": 25.0,
+        "wind_speed": 8.0,
+        "precipitation": 0.0,
+        "elevation": 450.0
     })
     assert response.status_code == 200
     assert "fire_occurred" in response.json()
+
+SAMPLE = {
+    "latitude": 27.5,
+    "longitude": 84.3,
+    "temperature": 32.0,
+    "humidity": 25.0,
+    "wind_speed": 8.0,
+    "precipitation": 0.0,
+    "elevation": 450.0
+}
+
+def test_compute_vpd_is_nan_where_undefined():
+    assert compute_vpd(25, 50) == 1.584
+    vpd = compute_vpd([-237.3, 25], [50, 50])
+    assert np.isnan(vpd[0]) and vpd[1] == 1.584
+
+def test_predict_batch_matches_manual():
+    other = dict(SAMPLE, temperature=12.0, humidity=85.0, precipitation=4.0)
+    single = [client.post("/predict-manual", json=row).json() for row in (SAMPLE, other)]
+
+    response = client.post("/predict-batch", json={"inputs": [SAMPLE, other]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    for one, batched in zip(single, results):
+        assert batched["probability"] == one["probability"]
+        assert batched["risk_level"] == one["risk_level"]
+        assert batched["confidence"] == one["confidence"]
+
+    columns = {k: [SAMPLE[k], other[k]] for k in SAMPLE}
+    assert client.post("/predict-batch", json={"columns": columns}).json()["results"] == results
+
+def test_predict_batch_rejects_bad_columns():
+    assert client.post("/predict-batch", json={"columns": {"latitude": [27.5]}}).status_code == 422
+    assert client.post("/predict-batch", json={}).status_code == 422
+
+def test_inference_metrics():
+    client.post("/predict-manual", json=SAMPLE)
+    metrics = client.get("/metrics/inference").json()
+    if metrics["batching"]:
+        assert metrics["rows"] >= 1
+        assert metrics["queue_depth"] == 0
+
+def test_scan_forests_etag():
+    response = client.get("/scan-forests")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert client.get("/scan-forests", headers={"If-None-Match": etag}).status_code == 304
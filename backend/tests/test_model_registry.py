@@ -0,0 +1,76 @@
+# tests/test_model_registry.py
+
+import os
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.naive_bayes import GaussianNB
+from sklearn.preprocessing import StandardScaler
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from custom_rf import RandomForest, save_forest
+from services.model_registry import ModelRegistry, ModelUnavailable, NB_FEATURES, RF_FEATURES
+
+
+def _write_models(model_dir, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(200, len(RF_FEATURES)))
+    y = (X[:, 2] > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    forest = RandomForest(n_trees=3, max_depth=3, random_state=seed).fit(scaler.transform(X), y)
+    save_forest(os.path.join(model_dir, "random_forest_final_model.rff"), forest,
+                feature_names=RF_FEATURES, scaler=scaler)
+    joblib.dump(scaler, os.path.join(model_dir, "scaler.pkl"))
+
+    nb_X = pd.DataFrame(rng.normal(size=(200, len(NB_FEATURES))), columns=NB_FEATURES)
+    nb_scaler = StandardScaler().fit(nb_X)
+    nb = GaussianNB().fit(nb_scaler.transform(nb_X), (nb_X["humidity"] < 0).astype(int))
+    joblib.dump(nb, os.path.join(model_dir, "naive_bayes.pkl"))
+    joblib.dump(nb_scaler, os.path.join(model_dir, "naive_bayes_scaler.pkl"))
+
+
+def test_lazy_load_and_hot_swap(tmp_path):
+    _write_models(str(tmp_path))
+    registry = ModelRegistry(str(tmp_path), compile_code=False)
+    swaps = []
+    registry.add_listener(lambda name, old, new: swaps.append((name, old and old.version, new.version)))
+
+    assert registry.status()["rf"]["loaded"] is False
+    rf = registry.get("rf")
+    assert registry.get("rf") is rf
+    assert swaps == [("rf", None, rf.version)]
+    assert registry.reload(["rf"])["rf"]["status"] == "unchanged"
+
+    # New files on disk: a request still holding rf keeps scoring with it
+    _write_models(str(tmp_path), seed=1)
+    report = registry.reload(["rf"])
+    assert report["rf"]["status"] == "reloaded" and report["rf"]["previous"] == rf.version
+    assert registry.get("rf") is not rf and registry.get("rf").version != rf.version
+    assert rf.fused.predict_proba(np.zeros((1, len(RF_FEATURES)))).shape == (1, 2)
+    assert swaps[-1] == ("rf", rf.version, registry.get("rf").version)
+
+
+def test_schema_mismatch_keeps_current_model(tmp_path):
+    _write_models(str(tmp_path))
+    registry = ModelRegistry(str(tmp_path), compile_code=False)
+    nb = registry.get("nb")
+
+    wrong = StandardScaler().fit(pd.DataFrame(np.ones((3, 3)), columns=["a", "b", "c"]))
+    joblib.dump(wrong, os.path.join(str(tmp_path), "naive_bayes_scaler.pkl"))
+    report = registry.reload(["nb"])
+    assert report["nb"]["status"] == "failed"
+    assert registry.get("nb") is nb
+    assert registry.status()["nb"]["error"]
+
+
+def test_missing_files_raise_model_unavailable(tmp_path):
+    registry = ModelRegistry(str(tmp_path), compile_code=False)
+    try:
+        registry.get("nb")
+        assert False, "expected ModelUnavailable"
+    except ModelUnavailable:
+        pass
+    assert registry.get_or_none("rf") is None
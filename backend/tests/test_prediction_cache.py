@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.prediction_cache import PredictionCache, parse_precision
+
+FIELDS = ["latitude", "longitude", "temperature"]
+
+
+def test_nearby_inputs_share_a_key_and_grid_point():
+    cache = PredictionCache(FIELDS, precision={"latitude": 0.01, "longitude": 0.01, "temperature": 0.1})
+    a = {"latitude": 27.5012, "longitude": 84.3049, "temperature": 31.96}
+    b = {"latitude": 27.4988, "longitude": 84.2951, "temperature": 32.04}
+    assert cache.key(a) == cache.key(b)
+    assert cache.key(a) != cache.key(dict(a, temperature=32.2))
+    assert cache.snap(a) == cache.snap(b)
+
+    cache.put(cache.key(a), 0.42)
+    assert cache.get(cache.key(b)) == 0.42
+    assert cache.get(cache.key(dict(a, latitude=27.6))) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+
+def test_lru_bound_ttl_and_model_invalidation():
+    cache = PredictionCache(FIELDS, precision={}, max_entries=2, ttl=0.05)
+    cache.set_model_version("v1")
+    for i in range(3):
+        cache.put((i,), i)
+    assert cache.get((0,)) is None and cache.get((2,)) == 2
+    assert cache.stats()["evictions"] == 1
+
+    time.sleep(0.06)
+    assert cache.get((2,)) is None and cache.stats()["expired"] == 1
+
+    cache.put((5,), 5)
+    cache.set_model_version("v2")
+    assert cache.get((5,)) is None
+    # A result computed with the old model isn't stored after the swap
+    cache.put((6,), 6, model_version="v1")
+    assert cache.get((6,)) is None
+
+
+def test_parse_precision():
+    assert parse_precision("latitude=0.01, temperature = 0.5") == {"latitude": 0.01, "temperature": 0.5}
+    assert parse_precision(None) == {}
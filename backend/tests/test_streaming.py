@@ -0,0 +1,59 @@
+# tests/test_streaming.py
+
+import json
+import os
+import sys
+
+import httpx
+import pandas as pd
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.main import app
+from routes import fire_routes
+from services.firms_cache import FirmsCache
+from services.firms_client import FirmsClient
+from services import fire_stats
+from utils.streaming import frame_lines, ndjson_records
+
+client = TestClient(app)
+
+
+def test_frame_lines_match_json_records():
+    df = pd.DataFrame({"name": ['a"b', "é", "a\"b"], "lat": [27.5, 1e-7, -3.0], "n": [1, 2, 3]})
+    assert [json.loads(line) for line in frame_lines(df)] == df.to_dict(orient="records")
+    chunks = list(ndjson_records(({"i": i} for i in range(5)), chunk_records=2))
+    assert len(chunks) == 3 and b"".join(chunks).count(b"\n") == 5
+
+
+def test_scan_forests_streams_the_same_records():
+    full = client.get("/scan-forests").json()
+    response = client.get("/scan-forests", headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == full
+    assert client.get("/scan-forests?stream=1").text == response.text
+
+
+def test_geo_sample_stream(monkeypatch):
+    df = pd.DataFrame({"latitude": [27.1, 28.2, 29.3], "longitude": [84.0, 85.5, 86.1],
+                       "acq_date": ["2021-03-01", "2021-04-02", "2022-01-09"], "confidence": ["h", "n", "l"]})
+    monkeypatch.setattr(fire_stats, "load_fire_data", lambda: df.copy())
+    lines = client.get("/fires/geo-sample?stream=1").text.splitlines()
+    assert [json.loads(line) for line in lines] == client.get("/fires/geo-sample").json()
+
+
+def test_fires_stream(monkeypatch):
+    def handler(request):
+        return httpx.Response(200, text="latitude,longitude,confidence\n27.1,84.2,h\n28.0,85.0,n\n")
+
+    stub = FirmsClient(base_url="http://firms.test", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(fire_routes, "firms_cache", FirmsCache(stub))
+    response = client.get("/fires", params={"stream": 1, "sensor": "MODIS_NRT"})
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"latitude": "27.1", "longitude": "84.2", "confidence": "h"},
+        {"latitude": "28.0", "longitude": "85.0", "confidence": "n"},
+    ]
+    assert response.headers["x-fires-sensor"] == "MODIS_NRT"
+    assert stub.requests == 1
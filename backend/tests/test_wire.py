@@ -0,0 +1,79 @@
+# tests/test_wire.py
+
+import json
+import os
+import sys
+
+import httpx
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.main import app
+from routes import fire_routes
+from services.firms_cache import FirmsCache
+from services.firms_client import FirmsClient
+from utils.wire import COLUMNS_BINARY, columns_binary, columns_json, decode_binary
+
+client = TestClient(app)
+
+
+def _frame():
+    return pd.DataFrame({
+        "latitude": [27.1234, np.nan, 29.5],
+        "acq_time": [512, 1340, 2359],
+        "confidence": ["h", None, "h"],
+        "day": [True, False, True],
+    })
+
+
+def test_columns_round_trip():
+    df = _frame()
+    body = json.loads(columns_json(df, sensor="VIIRS"))
+    assert body == {"count": 3, "sensor": "VIIRS", "columns": {
+        "latitude": [27.1234, None, 29.5], "acq_time": [512, 1340, 2359],
+        "confidence": ["h", None, "h"], "day": [True, False, True]}}
+
+    header, columns = decode_binary(columns_binary(df, sensor="VIIRS"))
+    assert header["count"] == 3 and header["sensor"] == "VIIRS"
+    assert all(spec["offset"] % 8 == 0 for spec in header["columns"])
+    np.testing.assert_array_equal(columns["latitude"], df["latitude"].to_numpy(np.float32))
+    assert columns["acq_time"].dtype == np.dtype("<i4") and columns["acq_time"].tolist() == [512, 1340, 2359]
+    assert columns["confidence"] == ["h", None, "h"] and columns["day"].tolist() == [1, 0, 1]
+
+
+def test_fires_formats(monkeypatch):
+    csv_text = ("latitude,longitude,acq_date,acq_time,confidence,frp\n"
+                "27.1,84.2,2025-01-02,0512,h,3.5\n28.0,85.0,2025-01-02,1340,n,\n")
+
+    stub = FirmsClient(base_url="http://firms.test",
+                       transport=httpx.MockTransport(lambda r: httpx.Response(200, text=csv_text)))
+    monkeypatch.setattr(fire_routes, "firms_cache", FirmsCache(stub))
+    records = client.get("/fires").json()["fires"]
+    columns = client.get("/fires", params={"format": "columns"}).json()
+    assert columns["count"] == len(records) == 2
+    assert columns["columns"]["latitude"] == [27.1, 28.0] and columns["columns"]["frp"] == [3.5, None]
+    assert columns["columns"]["confidence"] == [r["confidence"] for r in records]
+    assert columns["columns"]["acq_time"] == [r["acq_time"] for r in records] == ["0512", "1340"]
+
+    response = client.get("/fires", headers={"Accept": COLUMNS_BINARY})
+    assert response.headers["content-type"] == COLUMNS_BINARY
+    header, binary = decode_binary(response.content)
+    assert header["sensor"] == "MODIS_NRT" and binary["acq_date"] == ["2025-01-02", "2025-01-02"]
+    assert binary["acq_time"] == ["0512", "1340"]
+    assert client.get("/fires", params={"format": "xml"}).status_code == 422
+    # One upstream fetch, then the cached CSV in every format
+    assert stub.requests == 1 and response.headers["x-fires-cache"] == "hit"
+
+
+def test_scan_forests_columns_match_records():
+    records = client.get("/scan-forests").json()
+    response = client.get("/scan-forests", params={"format": "columns"})
+    columns = response.json()["columns"]
+    assert [dict(zip(columns, row)) for row in zip(*columns.values())] == records
+    assert response.headers["etag"] != client.get("/scan-forests").headers["etag"]
+    again = client.get("/scan-forests", params={"format": "columns"},
+                       headers={"If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304
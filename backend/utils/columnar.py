@@ -0,0 +1,244 @@
+"""
+Binary columnar sidecars for CSV files.
+
+The first read of data.csv parses it once and writes data.csv.cols/: one
+.npy file per column plus meta.json. Text columns are stored as int32 codes
+with their distinct values in the metadata. Later reads memory-map only the
+requested columns, and the sidecar is rebuilt whenever the CSV's mtime or
+size changes.
+"""
+import contextlib
+import errno
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:
+    # No inter-process lock on Windows; builds are still published atomically
+    fcntl = None
+
+SIDECAR_VERSION = 1
+# A CSV modified this close to its sidecar build may have changed again
+# within the same mtime tick, so such a build is marked racy and replaced
+# on the next read
+RACY_NS = 1_000_000_000
+_build_lock = threading.Lock()
+# csv path -> signature of the version whose sidecar couldn't be written,
+# so a read-only deployment doesn't retry the write on every read
+_unwritable = {}
+# Errors that will happen again on the next try; anything else is retried
+_UNWRITABLE_ERRNOS = {errno.EACCES, errno.EPERM, errno.EROFS, errno.ENOTDIR, errno.ENOSPC, errno.EDQUOT}
+
+
+def sidecar_dir(csv_path):
+    return f"{csv_path}.cols"
+
+
+def _source_signature(csv_path):
+    st = os.stat(csv_path)
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def _read_meta(csv_path):
+    root = sidecar_dir(csv_path)
+    try:
+        with open(os.path.join(root, "current.json")) as fh:
+            current = json.load(fh)
+        with open(os.path.join(root, current["build"], "meta.json")) as fh:
+            meta = json.load(fh)
+    except (OSError, ValueError, KeyError):
+        return None
+    meta["dir"] = os.path.join(root, current["build"])
+    return meta
+
+
+def _fresh_meta(csv_path):
+    meta = _read_meta(csv_path)
+    if meta is None or meta.get("version") != SIDECAR_VERSION:
+        return None
+    if meta["source"] != _source_signature(csv_path) or meta.get("racy", True):
+        return None
+    return meta
+
+
+def write_sidecar(csv_path, df=None, source=None):
+    """
+    Parse csv_path (unless df is given) and write its sidecar. source is
+    the file's signature from before df was parsed. Returns the new
+    metadata, or None if the sidecar directory can't be written.
+
+    Writers in every process take root/.lock for the build, the publish and
+    the cleanup, so one never deletes a build another is still writing. A
+    writer that finds a fresh sidecar once it holds the lock uses that one.
+    """
+    built_ns = time.time_ns()
+    source = source or _source_signature(csv_path)
+    root = sidecar_dir(csv_path)
+    build = uuid.uuid4().hex[:12]
+    build_dir = os.path.join(root, build)
+    try:
+        with _locked(root):
+            meta = _fresh_meta(csv_path)
+            if meta is not None:
+                return meta
+            if df is None:
+                df = pd.read_csv(csv_path)
+            meta = _write_build(build_dir, df, source, built_ns)
+            # Readers follow current.json, so swapping it publishes the whole build at once
+            tmp = os.path.join(root, f"current.{build}.tmp")
+            with open(tmp, "w") as fh:
+                json.dump({"build": build}, fh)
+            os.replace(tmp, os.path.join(root, "current.json"))
+            _remove_old_builds(root, keep=build)
+    except OSError as e:
+        print(f"[WARN] Could not write columnar sidecar for {csv_path}: {e}")
+        shutil.rmtree(build_dir, ignore_errors=True)
+        if e.errno in _UNWRITABLE_ERRNOS:
+            _unwritable[csv_path] = source
+        return None
+    _unwritable.pop(csv_path, None)
+    meta["dir"] = build_dir
+    return meta
+
+
+@contextlib.contextmanager
+def _locked(root):
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, ".lock"), "a") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _write_build(build_dir, df, source, built_ns):
+    os.makedirs(build_dir)
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        spec = {"name": str(name), "dtype": str(series.dtype), "file": f"c{i}.npy"}
+        if series.dtype.kind in "biufcmM":
+            np.save(os.path.join(build_dir, spec["file"]), series.to_numpy())
+        else:
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            spec["categories"] = uniques.tolist()
+            np.save(os.path.join(build_dir, spec["file"]), codes.astype(np.int32))
+        columns.append(spec)
+    # Only a write just before the build is racy; an mtime far in the future
+    # (clock skew, extracted archives) is trusted like any other
+    racy = abs(source["mtime_ns"] - built_ns) < RACY_NS
+    meta = {"version": SIDECAR_VERSION, "source": source, "built_ns": built_ns, "racy": racy,
+            "rows": len(df), "columns": columns}
+    with open(os.path.join(build_dir, "meta.json"), "w") as fh:
+        json.dump(meta, fh)
+    return meta
+
+
+def _remove_old_builds(root, keep):
+    # Called with the lock held, so no other writer has a build in progress.
+    # Readers that already mapped an old build keep their open files
+    for entry in os.listdir(root):
+        path = os.path.join(root, entry)
+        if entry != keep and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _load(meta, spec, mmap):
+    return np.load(os.path.join(meta["dir"], spec["file"]), mmap_mode="r" if mmap else None)
+
+
+def _column(spec, values, categorical):
+    if "categories" not in spec:
+        return values
+    categories = pd.Index(spec["categories"], dtype=object)
+    column = pd.Categorical.from_codes(np.asarray(values), categories=categories)
+    # Same dtype pd.read_csv gives the column, unless a categorical was asked for
+    return column if categorical else pd.Series(column).astype(spec["dtype"]).array
+
+
+def _sidecar(csv_path, build):
+    """
+    (meta, None) for a fresh sidecar, built here if need be. (None, df)
+    when the build parsed the CSV but couldn't write it, and (None, None)
+    when there is nothing to serve from and the caller must parse the CSV.
+    """
+    meta = _fresh_meta(csv_path)
+    if meta is not None or not build:
+        return meta, None
+    source = _source_signature(csv_path)
+    if _unwritable.get(csv_path) == source:
+        return None, None
+    with _build_lock:
+        meta = _fresh_meta(csv_path)
+        if meta is not None:
+            return meta, None
+        df = pd.read_csv(csv_path)
+        meta = write_sidecar(csv_path, df, source)
+        return (None, df) if meta is None else (meta, None)
+
+
+def _usecols(df, columns):
+    # What pd.read_csv(usecols=columns) would have returned
+    if columns is None:
+        return df
+    missing = set(columns) - set(df.columns)
+    if missing:
+        raise ValueError(f"Usecols do not match columns, columns expected but not found: {sorted(missing)}")
+    return df[[c for c in df.columns if c in set(columns)]]
+
+
+def read_columns(csv_path, columns=None, categorical=(), mmap=True, build=True):
+    """
+    pd.read_csv(csv_path, usecols=columns) served from the columnar sidecar.
+
+    Only the requested columns are read. Text columns listed in categorical
+    come back as pandas categoricals, skipping the conversion to strings.
+    Falls back to parsing the CSV when no sidecar can be written.
+    """
+    meta, parsed = _sidecar(csv_path, build)
+    if parsed is not None:
+        return _usecols(parsed, columns)
+    if meta is None:
+        return pd.read_csv(csv_path, usecols=columns)
+    specs = meta["columns"]
+    if columns is not None:
+        wanted = set(columns)
+        missing = wanted - {s["name"] for s in specs}
+        if missing:
+            raise ValueError(f"Usecols do not match columns, columns expected but not found: {sorted(missing)}")
+        specs = [s for s in specs if s["name"] in wanted]
+    data = {s["name"]: _column(s, _load(meta, s, mmap), s["name"] in categorical) for s in specs}
+    return pd.DataFrame(data, index=pd.RangeIndex(meta["rows"]))
+
+
+def iter_column_chunks(csv_path, columns=None, chunk_rows=100_000, categorical=()):
+    """
+    Like read_columns, but yields chunk_rows rows at a time.
+    """
+    meta, parsed = _sidecar(csv_path, True)
+    if parsed is not None:
+        parsed = _usecols(parsed, columns)
+        for start in range(0, len(parsed), chunk_rows):
+            yield parsed.iloc[start:start + chunk_rows]
+        return
+    if meta is None:
+        with pd.read_csv(csv_path, usecols=columns, chunksize=chunk_rows) as reader:
+            yield from reader
+        return
+    specs = [s for s in meta["columns"] if columns is None or s["name"] in set(columns)]
+    mapped = [(s, _load(meta, s, True)) for s in specs]
+    for start in range(0, meta["rows"], chunk_rows):
+        stop = min(start + chunk_rows, meta["rows"])
+        data = {s["name"]: _column(s, values[start:stop], s["name"] in categorical) for s, values in mapped}
+        yield pd.DataFrame(data, index=pd.RangeIndex(start, stop))
@@ -1,7 +1,16 @@
+import hashlib
+
 from passlib.hash import bcrypt
 
 def hash_password(password: str) -> str:
     return bcrypt.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.verify(plain_password, hashed_password) 
\ No newline at end of file
+    return bcrypt.verify(plain_password, hashed_password) 
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
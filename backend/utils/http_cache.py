@@ -0,0 +1,158 @@
+"""
+Conditional, pre-compressed responses for read-mostly endpoints.
+
+A CachedBody is one rendered response: its bytes, a strong ETag from their
+hash, and gzip (and brotli, when the module is installed) copies made the
+first time a client asks for them. A ResponseCache keeps one per route and
+query, tagged with the version of whatever it was computed from (dataset
+stat, model version, collection counter), so a poll with a matching
+If-None-Match costs a dict lookup and a 304.
+"""
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this aren't worth compressing
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def make_etag(body):
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """
+    True when an If-None-Match header lists etag (weak or strong) or is "*".
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag == etag or (tag.startswith("W/") and tag[2:] == etag):
+            return True
+    return False
+
+
+def accepted_encoding(accept_encoding):
+    """
+    "br", "gzip" or None for identity, by the client's Accept-Encoding.
+    """
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", accepted.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+
+class CachedBody:
+    def __init__(self, body, media_type="application/json", etag=None):
+        self.body = body
+        self.media_type = media_type
+        self.etag = etag or make_etag(body)
+        self._encoded = {}
+
+    def etag_for(self, encoding):
+        # A compressed copy is a different representation, so it gets its own tag
+        return self.etag if encoding is None else self.etag[:-1] + f'-{encoding}"'
+
+    def encoded(self, encoding):
+        """
+        Body bytes in encoding ("gzip", "br" or None), compressed on first request.
+        """
+        if encoding is None:
+            return self.body
+        if encoding not in self._encoded:
+            if encoding == "br":
+                self._encoded[encoding] = brotli.compress(self.body, quality=BROTLI_QUALITY)
+            else:
+                self._encoded[encoding] = gzip.compress(self.body, compresslevel=GZIP_LEVEL, mtime=0)
+        return self._encoded[encoding]
+
+    def matches(self, if_none_match):
+        return any(etag_matches(if_none_match, self.etag_for(e)) for e in (None, "gzip", "br"))
+
+
+def cached_response(request, cached, cache_control, vary=None):
+    """
+    304 when the request's If-None-Match names any copy of cached, else
+    the body in the best encoding the client accepts.
+    """
+    encoding = None
+    if len(cached.body) >= MIN_COMPRESS_BYTES:
+        encoding = accepted_encoding(request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": cached.etag_for(encoding),
+        "Cache-Control": cache_control,
+        "Vary": ", ".join(v for v in (vary, "Accept-Encoding") if v),
+    }
+    if cached.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=cached.encoded(encoding), media_type=cached.media_type, headers=headers)
+
+
+class ResponseCache:
+    """
+    Rendered responses by key, each kept while its version is current and,
+    with a ttl, for at most ttl seconds. The least recently used entry goes
+    once there are more than max_entries.
+    """
+
+    def __init__(self, ttl=None, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version or (entry[1] is not None and entry[1] <= time.monotonic()):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, version, body, media_type="application/json"):
+        cached = CachedBody(body, media_type)
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (version, expires, cached)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cached
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "ttl": self.ttl,
+                "brotli": brotli is not None}
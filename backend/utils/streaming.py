@@ -0,0 +1,81 @@
+import json
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import StreamingResponse
+
+NDJSON = "application/x-ndjson"
+# Records per chunk written to the socket
+CHUNK_RECORDS = 1000
+
+
+def wants_ndjson(request, stream=False):
+    """
+    Streaming is opt-in: ?stream=1 or an Accept header asking for NDJSON.
+    """
+    return bool(stream) or NDJSON in request.headers.get("accept", "")
+
+
+def dumps(value):
+    # Same encoding as JSONResponse
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"))
+
+
+def encode_column(values):
+    """
+    Every value of a column as its JSON text. Floats and ints are formatted
+    directly; anything else is encoded once per distinct value.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind == "f":
+        if not np.isfinite(values).all():
+            raise ValueError("Out of range float values are not JSON compliant")
+        return list(map(float.__repr__, values.tolist()))
+    if values.dtype.kind in "iu":
+        return list(map(int.__repr__, values.tolist()))
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    encoded = [dumps(u) for u in uniques.tolist()]
+    return [encoded[c] for c in codes.tolist()]
+
+
+def frame_lines(df):
+    """
+    One JSON object per row of df, each byte for byte what json.dumps
+    would give for the row's to_dict(orient="records") entry.
+    """
+    names = [str(c) for c in df.columns]
+    row_format = "{" + ",".join(dumps(n).replace("%", "%%") + ":%s" for n in names) + "}"
+    columns = [encode_column(df[c].to_numpy()) for c in df.columns]
+    return [row_format % row for row in zip(*columns)]
+
+
+def ndjson_frames(frames):
+    """
+    NDJSON bytes for an iterable of DataFrame chunks, one chunk at a time.
+    """
+    for df in frames:
+        if len(df):
+            yield ("\n".join(frame_lines(df)) + "\n").encode("utf-8")
+
+
+def ndjson_records(records, chunk_records=CHUNK_RECORDS):
+    """
+    NDJSON bytes for an iterable of dicts, chunk_records at a time.
+    """
+    chunk = []
+    for record in records:
+        chunk.append(dumps(record))
+        if len(chunk) >= chunk_records:
+            yield ("\n".join(chunk) + "\n").encode("utf-8")
+            chunk = []
+    if chunk:
+        yield ("\n".join(chunk) + "\n").encode("utf-8")
+
+
+def frame_chunks(df, chunk_records=CHUNK_RECORDS):
+    for start in range(0, len(df), chunk_records):
+        yield df.iloc[start:start + chunk_records]
+
+
+def ndjson_response(chunks, headers=None):
+    return StreamingResponse(chunks, media_type=NDJSON, headers=headers)
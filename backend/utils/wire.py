@@ -0,0 +1,124 @@
+"""
+Compact encodings for point-heavy responses.
+
+columns: {"count": n, ..., "columns": {name: [values]}}, one array per
+field with numbers as numbers and null for missing values.
+
+binary: b"NWFC", uint32 version, uint32 header length, a JSON header,
+then one little-endian buffer per column, each starting on an 8-byte
+boundary. Floats are float32 (NaN when missing), integers int32 (float64
+past int32's range), booleans uint8, and text is dictionary-encoded: int16/int32 codes into the
+column's "dictionary" list, -1 when missing. Offsets in the header count
+from the first byte after it.
+"""
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+from fastapi import Response
+
+from utils.streaming import dumps
+
+COLUMNS_JSON = "application/vnd.nepal-fires.columns+json"
+COLUMNS_BINARY = "application/vnd.nepal-fires.columns"
+FORMATS = {"json": "application/json", "columns": COLUMNS_JSON, "binary": COLUMNS_BINARY}
+MAGIC = b"NWFC"
+WIRE_VERSION = 1
+_ALIGN = 8
+
+
+def wire_format(request, fmt=None):
+    """
+    "json", "columns" or "binary", from ?format= or else the Accept header.
+    """
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {sorted(FORMATS)}")
+        return fmt
+    accepted = {part.split(";")[0].strip() for part in request.headers.get("accept", "").split(",")}
+    if COLUMNS_BINARY in accepted:
+        return "binary"
+    if COLUMNS_JSON in accepted:
+        return "columns"
+    return "json"
+
+
+def _json_values(series):
+    if series.dtype.kind == "f":
+        values = series.to_numpy()
+        return [None if v != v else v for v in values.tolist()]
+    if series.dtype.kind in "iub":
+        return series.to_numpy().tolist()
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def columns_json(df, **meta):
+    columns = {str(c): _json_values(df[c]) for c in df.columns}
+    return dumps({"count": len(df), **meta, "columns": columns}).encode("utf-8")
+
+
+def _binary_column(series):
+    if series.dtype.kind == "b":
+        return {"type": "uint8"}, series.to_numpy().astype(np.uint8)
+    if series.dtype.kind in "iu":
+        values = series.to_numpy()
+        if len(values) == 0 or (values.min() >= -2**31 and values.max() < 2**31):
+            return {"type": "int32"}, values.astype("<i4")
+        return {"type": "float64"}, values.astype("<f8")
+    if series.dtype.kind == "f":
+        return {"type": "float32"}, series.to_numpy().astype("<f4")
+    codes, uniques = pd.factorize(series)
+    code_type = "<i2" if len(uniques) < 2**15 else "<i4"
+    dictionary = pd.Series(uniques).astype(object).tolist()
+    return {"type": "dictionary", "codeType": "int16" if code_type == "<i2" else "int32",
+            "dictionary": dictionary}, codes.astype(code_type)
+
+
+def columns_binary(df, **meta):
+    columns, buffers, offset = [], [], 0
+    for name in df.columns:
+        spec, values = _binary_column(df[name])
+        data = values.tobytes()
+        columns.append({"name": str(name), **spec, "offset": offset, "byteLength": len(data)})
+        pad = -len(data) % _ALIGN
+        buffers.append(data + b"\0" * pad)
+        offset += len(data) + pad
+    header = dumps({"count": len(df), **meta, "columns": columns}).encode("utf-8")
+    header += b" " * (-(len(header) + 12) % _ALIGN)
+    return MAGIC + struct.pack("<II", WIRE_VERSION, len(header)) + header + b"".join(buffers)
+
+
+def decode_binary(body):
+    """
+    Decode a binary body back into (header, {name: numpy array or list}).
+    """
+    if body[:4] != MAGIC:
+        raise ValueError("Not a columns body")
+    version, header_length = struct.unpack_from("<II", body, 4)
+    if version != WIRE_VERSION:
+        raise ValueError(f"Unsupported columns version {version}")
+    header = json.loads(body[12:12 + header_length])
+    start = 12 + header_length
+    columns = {}
+    for spec in header["columns"]:
+        raw = body[start + spec["offset"]:start + spec["offset"] + spec["byteLength"]]
+        if spec["type"] == "dictionary":
+            codes = np.frombuffer(raw, dtype="<i2" if spec["codeType"] == "int16" else "<i4")
+            dictionary = spec["dictionary"]
+            columns[spec["name"]] = [dictionary[c] if c >= 0 else None for c in codes.tolist()]
+        else:
+            dtype = {"uint8": "u1", "int32": "<i4", "float32": "<f4", "float64": "<f8"}[spec["type"]]
+            columns[spec["name"]] = np.frombuffer(raw, dtype=dtype)
+    return header, columns
+
+
+def encode_frame(df, fmt, **meta):
+    """
+    Body bytes of df in the "columns" or "binary" format.
+    """
+    return columns_binary(df, **meta) if fmt == "binary" else columns_json(df, **meta)
+
+
+def wire_response(df, fmt, headers=None, **meta):
+    return Response(content=encode_frame(df, fmt, **meta), media_type=FORMATS[fmt], headers=headers)